@@ -7,13 +7,111 @@ load_dotenv()
 
 class Settings:
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "")  # OpenAI-compatible server (e.g. benchmarks/mock_openai.py)
     CHROMA_DB_PATH: str = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+    # Chroma client: persistent (in-process, single worker) | http (shared Chroma server, any number of workers)
+    CHROMA_MODE: str = os.getenv("CHROMA_MODE", "persistent")
+    CHROMA_HOST: str = os.getenv("CHROMA_HOST", "localhost")
+    CHROMA_PORT: int = int(os.getenv("CHROMA_PORT", "8000"))
+    CHROMA_SSL: bool = os.getenv("CHROMA_SSL", "false").lower() == "true"
+    CHROMA_AUTH_TOKEN: str = os.getenv("CHROMA_AUTH_TOKEN", "")
+    CHROMA_HTTP_MAX_CONNECTIONS: int = int(os.getenv("CHROMA_HTTP_MAX_CONNECTIONS", "32"))  # Pooled keep-alive connections
+    CHROMA_HTTP_KEEPALIVE_SECS: float = float(os.getenv("CHROMA_HTTP_KEEPALIVE_SECS", "30"))
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "./uploads")
-    MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
+    MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", str(10 * 1024 * 1024)))  # 10MB, enforced while receiving
+    UPLOAD_MEMORY_LIMIT: int = int(os.getenv("UPLOAD_MEMORY_LIMIT", str(16 * 1024 * 1024)))  # Larger uploads spool to UPLOAD_DIR
     ALLOWED_EXTENSIONS: list = [".pdf"]
     DEFAULT_EMBEDDING_MODEL: str = "text-embedding-3-small"
+
+    # Embedding backend: openai | local (ONNX model on CPU) | hashing (deterministic, for tests)
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "openai")
+    EMBEDDING_MODEL_PATH: str = os.getenv("EMBEDDING_MODEL_PATH", "")
+    EMBEDDING_QUANTIZED: bool = os.getenv("EMBEDDING_QUANTIZED", "false").lower() == "true"
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    EMBEDDING_THREADS: int = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 = onnxruntime default
+    EMBEDDING_DIMENSIONS: int = int(os.getenv("EMBEDDING_DIMENSIONS", "384"))  # hashing backend
     DEFAULT_RETRIEVAL_K: int = 2  # Fewer docs = faster
 
+    # Vector backend: chroma | local (in-process, per-document partitions on disk)
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "chroma")
+    LOCAL_INDEX_DIR: str = os.getenv("LOCAL_INDEX_DIR", "./local_index")
+    LOCAL_INDEX_QUANTIZATION: str = os.getenv("LOCAL_INDEX_QUANTIZATION", "float32")  # float32 | int8
+    LOCAL_INDEX_EXACT_THRESHOLD: int = int(os.getenv("LOCAL_INDEX_EXACT_THRESHOLD", "4096"))  # Larger partitions (and corpora, for cross-document search) get IVF
+    LOCAL_INDEX_NPROBE: int = int(os.getenv("LOCAL_INDEX_NPROBE", "8"))
+
+    # Chroma partitioning: single | hash (VECTOR_HASH_SHARDS fixed collections) | tenant (collection per course)
+    # | document (collection per document; opt-in, the collection count grows with every upload)
+    VECTOR_PARTITIONING: str = os.getenv("VECTOR_PARTITIONING", "hash")
+    VECTOR_HASH_SHARDS: int = int(os.getenv("VECTOR_HASH_SHARDS", "16"))
+    VECTOR_FANOUT_WORKERS: int = int(os.getenv("VECTOR_FANOUT_WORKERS", "8"))  # Concurrent cross-partition queries
+    PARTITION_REGISTRY_PATH: str = os.getenv("PARTITION_REGISTRY_PATH", "./vector_partitions.db")
+
+    # Hybrid retrieval (BM25 inverted index persisted alongside Chroma)
+    LEXICAL_INDEX_DIR: str = os.getenv("LEXICAL_INDEX_DIR", os.path.join(CHROMA_DB_PATH, "lexical"))
+    LEXICAL_INDEX_CACHE_SIZE: int = int(os.getenv("LEXICAL_INDEX_CACHE_SIZE", "256"))  # Documents kept loaded (LRU)
+    HYBRID_CANDIDATES: int = 10  # Candidates per retriever before fusion
+    HYBRID_RRF_K: int = 60
+    HYBRID_LEXICAL_WEIGHT: float = 1.0
+    HYBRID_DENSE_WEIGHT: float = 1.0
+    KEYWORD_QUERY_MAX_WORDS: int = 3  # Short non-question queries skip the embedding call
+    QA_RETRIEVAL_K: int = int(os.getenv("QA_RETRIEVAL_K", "5"))  # Chunks retrieved before context packing
+    QA_CONTEXT_TOKENS: int = int(os.getenv("QA_CONTEXT_TOKENS", "1200"))  # Packed context budget (tiktoken tokens)
+    QA_BATCH_MAX_QUESTIONS: int = int(os.getenv("QA_BATCH_MAX_QUESTIONS", "50"))
+    QA_BATCH_CONCURRENCY: int = int(os.getenv("QA_BATCH_CONCURRENCY", "10"))  # LLM calls in flight per batch request
+    SUMMARY_CONCURRENCY: int = int(os.getenv("SUMMARY_CONCURRENCY", "8"))  # LLM calls in flight per course-pack summary
+    COURSE_PACK_MAX_DOCUMENTS: int = int(os.getenv("COURSE_PACK_MAX_DOCUMENTS", "50"))
+    CHUNK_SIZE: int = 1000
+    CHUNK_OVERLAP: int = 200
+
+    # Per-document artifacts built at ingestion (sentence offsets, chunk vectors)
+    DOCUMENT_INDEX_DIR: str = os.getenv("DOCUMENT_INDEX_DIR", "./document_index")
+
+    # Text-to-speech for read aloud
+    TTS_ENGINE: str = os.getenv("TTS_ENGINE", "openai")  # openai | offline
+    TTS_MODEL: str = os.getenv("TTS_MODEL", "tts-1")
+    TTS_VOICE: str = os.getenv("TTS_VOICE", "alloy")
+    TTS_WORKERS: int = int(os.getenv("TTS_WORKERS", "4"))
+    TTS_FIRST_SEGMENT_TIMEOUT: float = float(os.getenv("TTS_FIRST_SEGMENT_TIMEOUT", "30"))
+    AUDIO_CACHE_DIR: str = os.getenv("AUDIO_CACHE_DIR", "./audio_cache")
+    PDF_READ_AUDIO: bool = os.getenv("PDF_READ_AUDIO", "false").lower() == "true"
+
+    # Executors for blocking work (keeps the event loop responsive)
+    IO_THREAD_WORKERS: int = int(os.getenv("IO_THREAD_WORKERS", "16"))  # Chroma, network embeddings, file IO
+    CPU_PROCESS_WORKERS: int = int(os.getenv("CPU_PROCESS_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+    LOOP_STALL_DEBUG: bool = os.getenv("LOOP_STALL_DEBUG", "false").lower() == "true"
+    LOOP_STALL_THRESHOLD_MS: float = float(os.getenv("LOOP_STALL_THRESHOLD_MS", "100"))
+
+    # Request tracing: sampled by rate, or forced per request with the X-Trace header (off unless enabled)
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+    TRACE_HEADER_ENABLED: bool = os.getenv("TRACE_HEADER_ENABLED", "false").lower() == "true"
+    TRACE_EXPORTER: str = os.getenv("TRACE_EXPORTER", "json")  # json (files in TRACE_DIR) | otlp (OTLP/HTTP JSON)
+    TRACE_DIR: str = os.getenv("TRACE_DIR", "./traces")
+    TRACE_MAX_FILES: int = int(os.getenv("TRACE_MAX_FILES", "1000"))  # Oldest JSON traces are deleted beyond this
+    TRACE_OTLP_ENDPOINT: str = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    # Sampling profiler, triggered per request with the X-Profile header (off unless enabled)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "./profiles")
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+    # Startup warm-up: create clients (Chroma, embeddings, tiktoken, LLM) before /ready turns green
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "false").lower() == "true"
+    WARMUP_TIMEOUT: float = float(os.getenv("WARMUP_TIMEOUT", "120"))  # Per attempt of a step
+    WARMUP_RETRY_BACKOFF: float = float(os.getenv("WARMUP_RETRY_BACKOFF", "2"))  # First retry delay, doubles per attempt
+    WARMUP_RETRY_MAX_BACKOFF: float = float(os.getenv("WARMUP_RETRY_MAX_BACKOFF", "60"))
+    WARMUP_GIVE_UP_AFTER: float = float(os.getenv("WARMUP_GIVE_UP_AFTER", "900"))  # Seconds; 0 = retry forever
+    WARMUP_PRELOAD_DOCUMENTS: int = int(os.getenv("WARMUP_PRELOAD_DOCUMENTS", "0"))  # Most recent documents to preload
+    WARMUP_DOCUMENT_IDS: str = os.getenv("WARMUP_DOCUMENT_IDS", "")  # Comma-separated, overrides "most recent"
+
+    # Storage maintenance: orphan GC + compaction (POST /api/maintenance/run, or scheduled)
+    MAINTENANCE_INTERVAL_HOURS: float = float(os.getenv("MAINTENANCE_INTERVAL_HOURS", "0"))  # 0 = not scheduled
+    MAINTENANCE_GRACE_SECONDS: float = float(os.getenv("MAINTENANCE_GRACE_SECONDS", "3600"))  # Younger leftovers may be in-flight uploads
+    MAINTENANCE_VACUUM: bool = os.getenv("MAINTENANCE_VACUUM", "true").lower() == "true"
+    MAINTENANCE_VACUUM_TIMEOUT: int = int(os.getenv("MAINTENANCE_VACUUM_TIMEOUT", "60"))  # Seconds to wait for Chroma's lock
+
+    # Topic mastery aggregates (per user x document x topic)
+    MASTERY_DB_PATH: str = os.getenv("MASTERY_DB_PATH", "./mastery.db")
+    MASTERY_DECAY: float = float(os.getenv("MASTERY_DECAY", "0.2"))  # EWMA weight per graded answer
+
 
 
 settings = Settings()
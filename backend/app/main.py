@@ -1,14 +1,57 @@
 # FastAPI app initialization
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import asyncio
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.routes import read_aloud
 
-from app.routes import summarizer, qa, mcq, pdf
+from app.routes import summarizer, qa, mcq, pdf, usage, maintenance
+from app.config import settings
+from app.utils.executors import (
+    start_loop_monitor,
+    stop_loop_monitor,
+    get_loop_monitor,
+    shutdown_executors,
+    run_io
+)
+from app.utils.usage_tracker import start_request_usage, close_request_usage
+from app.utils.tracing import should_sample, start_trace, finish_trace, span
+from app.utils.profiler import try_start_profile, finish_profile
+from app.utils.warmup import run_warmup, mark_ready, is_ready, get_warmup_state
+from app.utils.maintenance import maintenance_loop
+from app.utils.metrics import (
+    HTTP_REQUESTS,
+    HTTP_LATENCY,
+    HTTP_IN_FLIGHT,
+    HTTP_ERRORS,
+    render_metrics
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_loop_monitor()
+    # Warm-up runs in the background: /health answers at once, /ready waits for it
+    warmup_task = asyncio.create_task(run_warmup()) if settings.WARMUP_ENABLED else None
+    if warmup_task is None:
+        mark_ready()
+    maintenance_task = asyncio.create_task(maintenance_loop()) if settings.MAINTENANCE_INTERVAL_HOURS > 0 else None
+    yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    if maintenance_task is not None:
+        maintenance_task.cancel()
+    stop_loop_monitor()
+    shutdown_executors()
+
 
 app = FastAPI(
     title="ScholarNet API",
     description="Backend API for ScholarNet - AI-powered learning assistant",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -20,12 +63,108 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def route_template(request: Request) -> str:
+    """
+    Matched route path (/api/documents/{document_id}), not the raw URL.
+    
+    Keeps metric labels low-cardinality; unmatched paths share one label.
+    """
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    path = route.path
+    # Newer FastAPI keeps the include_router prefix outside the route
+    included = request.scope.get("fastapi", {}).get("included_router")
+    prefix = getattr(getattr(included, "include_context", None), "prefix", "")
+    return path if path.startswith(prefix) else prefix + path
+
+
+@app.middleware("http")
+async def track_usage(request: Request, call_next):
+    """Scope token/cost accounting to each API request."""
+    if not request.url.path.startswith("/api/"):
+        return await call_next(request)
+    
+    usage = start_request_usage(request.url.path)
+    try:
+        return await call_next(request)
+    finally:
+        # Roll up under the route template, not the raw path
+        close_request_usage(usage, f"{request.method} {route_template(request)}")
+
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    """
+    Trace sampled requests and, when enabled, profile those sent with X-Profile.
+    
+    Traced responses carry X-Trace-Id; profiled ones X-Profile-Path.
+    """
+    if not request.url.path.startswith("/api/"):
+        return await call_next(request)
+    
+    profiler = None
+    if settings.PROFILING_ENABLED and request.headers.get("x-profile"):
+        profiler = try_start_profile()
+    
+    trace = None
+    if profiler or should_sample(request.headers.get("x-trace")):
+        trace = start_trace(f"{request.method} {request.url.path}")
+    
+    status = 500
+    try:
+        with span("http_request", method=request.method, path=request.url.path) as root:
+            response = await call_next(request)
+            status = response.status_code
+            if root:
+                root.set(status=status)
+    finally:
+        route = f"{request.method} {route_template(request)}"
+        if trace:
+            finish_trace(trace, {"route": route, "status": status})
+        profile_path = None
+        if profiler:
+            profile_path = await run_io(finish_profile, profiler, trace.trace_id, route)
+    
+    if trace:
+        response.headers["X-Trace-Id"] = trace.trace_id
+    if profile_path:
+        response.headers["X-Profile-Path"] = profile_path
+    return response
+
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    """Request count, latency, in-flight and error metrics per route."""
+    if request.url.path == "/metrics":
+        return await call_next(request)
+    
+    method = request.method
+    # The route is only known after routing, so in-flight is tracked per method
+    HTTP_IN_FLIGHT.inc(method=method)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = route_template(request)
+        HTTP_IN_FLIGHT.dec(method=method)
+        HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=route)
+        HTTP_REQUESTS.inc(method=method, route=route, status=status)
+        if status >= 500:
+            HTTP_ERRORS.inc(method=method, route=route)
+
+
 # Include routers
 app.include_router(summarizer.router, prefix="/api", tags=["Summarizer"])
 app.include_router(qa.router, prefix="/api", tags=["Q&A"])
 app.include_router(mcq.router, prefix="/api", tags=["MCQ"])
 app.include_router(pdf.router, prefix="/api", tags=["PDF"])
 app.include_router(read_aloud.router, prefix="/api", tags=["ReadAloud"])
+app.include_router(usage.router, prefix="/api", tags=["Usage"])
+app.include_router(maintenance.router, prefix="/api", tags=["Maintenance"])
 
 
 @app.get("/")
@@ -36,3 +175,24 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness for load balancers: 503 until startup warm-up has finished."""
+    state = get_warmup_state()
+    return JSONResponse(state, status_code=200 if is_ready() else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text-format metrics for this process."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+if settings.LOOP_STALL_DEBUG:
+    @app.get("/debug/loop-stalls")
+    async def loop_stalls():
+        """Event-loop stalls recorded by the debug monitor."""
+        monitor = get_loop_monitor()
+        return monitor.report() if monitor else {"total_stalls": 0, "recent": []}
@@ -1,6 +1,18 @@
 # Pydantic models for request/response
-from pydantic import BaseModel
-from typing import List, Optional, Literal
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Literal
+
+
+class UsageInfo(BaseModel):
+    """Tokens, latency and estimated cost of the model calls made for a request."""
+    llm_calls: int = 0
+    embedding_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    embedding_tokens: int = 0
+    llm_ms: float = 0.0
+    embedding_ms: float = 0.0
+    cost_usd: float = 0.0
 
 
 class SummarizeRequest(BaseModel):
@@ -9,6 +21,8 @@ class SummarizeRequest(BaseModel):
     max_length: Optional[int] = 500  # Default 500, but can go up to 5000+
     summary_type: Optional[Literal["concise", "explanatory"]] = "explanatory"  # ✅ Only 2 types now
     strategy: Optional[Literal["auto", "map-reduce", "refine", "direct"]] = "auto"
+    page_start: Optional[int] = Field(None, ge=1)  # 1-based, inclusive; needs document_id
+    page_end: Optional[int] = Field(None, ge=1)
 
 
 class ProcessingInfo(BaseModel):
@@ -24,6 +38,31 @@ class SummarizeResponse(BaseModel):
     summary_type: str
     source: Optional[str] = None
     processing_info: Optional[ProcessingInfo] = None  # ✅ NEW
+    usage: Optional[UsageInfo] = None
+
+
+class CoursePackSummarizeRequest(BaseModel):
+    document_ids: Optional[List[str]] = None
+    course_id: Optional[str] = None  # Every document uploaded with this course_id
+    max_length: Optional[int] = 800  # Course-pack summary
+    document_max_length: Optional[int] = 300  # Each document's summary
+    summary_type: Optional[Literal["concise", "explanatory"]] = "explanatory"
+    stream: Optional[bool] = False  # NDJSON progress events, one per finished document
+
+class DocumentSummary(BaseModel):
+    document_id: str
+    source: Optional[str] = None
+    status: str  # done | failed
+    summary: Optional[str] = None
+    error: Optional[str] = None
+    processing_info: Optional[ProcessingInfo] = None
+
+class CoursePackSummaryResponse(BaseModel):
+    summary: str
+    summary_type: str
+    documents: List[DocumentSummary]
+    processing_time_seconds: float
+    usage: Optional[UsageInfo] = None
 
 
 class QARequest(BaseModel):
@@ -32,11 +71,31 @@ class QARequest(BaseModel):
     document_id: Optional[str] = None
     session_id: Optional[str] = None
     use_history: Optional[bool] = True
+    page_start: Optional[int] = Field(None, ge=1)  # 1-based, inclusive; needs document_id
+    page_end: Optional[int] = Field(None, ge=1)
 
 class QAResponse(BaseModel):
     answer: str
     sources: Optional[List[str]] = None
     session_id: Optional[str] = None  
+    usage: Optional[UsageInfo] = None
+
+class BatchQARequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1)
+    document_id: Optional[str] = None
+    page_start: Optional[int] = Field(None, ge=1)
+    page_end: Optional[int] = Field(None, ge=1)
+
+class BatchQAAnswer(BaseModel):
+    question: str
+    answer: Optional[str] = None
+    sources: List[int] = []  # Indices into BatchQAResponse.sources
+    error: Optional[str] = None
+
+class BatchQAResponse(BaseModel):
+    answers: List[BatchQAAnswer]
+    sources: List[str]  # Each retrieved chunk once, however many questions used it
+    usage: Optional[UsageInfo] = None
 
 
 class MCQRequest(BaseModel):
@@ -63,6 +122,7 @@ class MCQResponse(BaseModel):
 class PDFResponse(BaseModel):
     text: str
     audio_url: Optional[str] = None
+    audio_segments: Optional[List[str]] = None
     pages: int
 
 
@@ -71,20 +131,35 @@ class DocumentUploadResponse(BaseModel):
     filename: str
     chunks: int
     message: str
+    content_sha256: Optional[str] = None
+    changes: Optional[Dict[str, int]] = None  # Revisions: chunks added (embedded), unchanged, removed
+    usage: Optional[UsageInfo] = None
+
+class BulkDeleteRequest(BaseModel):
+    document_ids: List[str] = Field(..., min_length=1, max_length=1000)
 
 # --- READ ALOUD SCHEMAS ---
 
 class ReadAloudRequest(BaseModel):
-    sentences: List[str]
-    num_clusters: Optional[int] = 5
+    sentences: Optional[List[str]] = None
+    document_id: Optional[str] = None  # Use stored embeddings instead of re-embedding sentences
+    num_clusters: Optional[int] = None  # None = pick segment count automatically
+    mode: Optional[Literal["similarity", "minibatch"]] = "similarity"
+    with_audio: Optional[bool] = False  # Render each chunk to speech in the background
+    voice: Optional[str] = None
 
 
 class ReadAloudChunk(BaseModel):
     chunk_id: int
     num_sentences: int
     text: str
+    start_sentence: Optional[int] = None
+    end_sentence: Optional[int] = None
+    audio_url: Optional[str] = None
+    audio_status: Optional[str] = None  # ready | pending
 
 class ReadAloudResponse(BaseModel):
     chunks: List[ReadAloudChunk]
+    usage: Optional[UsageInfo] = None
 
     
\ No newline at end of file
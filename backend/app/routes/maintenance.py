@@ -0,0 +1,29 @@
+# /api/maintenance endpoints (garbage collection, compaction, reports)
+from fastapi import APIRouter, HTTPException, Query
+from app.utils.executors import run_io
+from app.utils.maintenance import run_maintenance
+from app.utils.partitions import list_maintenance_reports
+
+router = APIRouter()
+
+
+@router.post("/maintenance/run")
+async def run_storage_maintenance(
+    dry_run: bool = Query(False, description="Report what would be removed without deleting anything")
+):
+    """
+    Remove orphaned uploads, indexes, chunks and segment files, then compact the stores.
+    
+    Returns store sizes before and after, bytes reclaimed per store and
+    what each step removed. 409 while another worker is running maintenance.
+    """
+    report = await run_io(run_maintenance, dry_run)
+    if report is None:
+        raise HTTPException(status_code=409, detail="Maintenance is already running")
+    return report
+
+
+@router.get("/maintenance/reports")
+async def maintenance_reports(limit: int = Query(10, ge=1, le=50)):
+    """Most recent maintenance reports (manual and scheduled), newest first."""
+    return {"reports": await run_io(list_maintenance_reports, limit)}
@@ -2,7 +2,11 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List, Dict
-from app.services.mcq_generator import generate_mcqs, evaluate_mcq_answers
+from app.services.mcq_generator import generate_mcqs, evaluate_mcq_answers, get_mastery_report
+from app.services.mastery_tracker import clear_user_mastery
+from app.utils.executors import run_io
+from app.utils.usage_tracker import tag_usage, usage_summary
+from app.models.schemas import UsageInfo
 
 router = APIRouter()
 
@@ -38,11 +42,14 @@ class MCQResponse(BaseModel):
     topics: List[TopicInfo]
     source: Optional[str] = None
     message: Optional[str] = None
+    usage: Optional[UsageInfo] = None
 
 
 class EvaluateRequest(BaseModel):
     questions: List[dict]
     user_answers: Dict[int, int]  # question_index -> selected_option_index
+    user_id: Optional[str] = None  # Enables history-based mastery tracking
+    document_id: Optional[str] = None
 
 
 class TopicAnalysis(BaseModel):
@@ -65,6 +72,30 @@ class EvaluateResponse(BaseModel):
     recommendations: List[str]
 
 
+class TopicMastery(BaseModel):
+    topic: str
+    total: int
+    correct: int
+    incorrect: int
+    percentage: int  # lifetime
+    rolling_percentage: int  # recency-weighted
+    attempts: int
+    performance: str
+    last_attempt: str
+
+
+class MasteryResponse(BaseModel):
+    user_id: str
+    document_id: Optional[str] = None
+    total_questions: int
+    total_correct: int
+    overall_percentage: int
+    topic_mastery: List[TopicMastery]
+    weak_topics: List[str]
+    strong_topics: List[str]
+    recommendations: List[str]
+
+
 @router.post("/mcq", response_model=MCQResponse)
 async def create_mcqs(request: MCQRequest):
     """
@@ -79,6 +110,7 @@ async def create_mcqs(request: MCQRequest):
                 detail="Either text or document_id must be provided"
             )
         
+        tag_usage(document_id=request.document_id)
         result = await generate_mcqs(
             text=request.text,
             document_id=request.document_id,
@@ -93,7 +125,8 @@ async def create_mcqs(request: MCQRequest):
             questions=result["questions"],
             total_questions=result["total_questions"],
             topics=[TopicInfo(**t) for t in result["topics"]],
-            source=result.get("source")
+            source=result.get("source"),
+            usage=usage_summary()
         )
     
     except HTTPException:
@@ -123,7 +156,9 @@ async def evaluate_answers(request: EvaluateRequest):
         
         result = await evaluate_mcq_answers(
             questions=request.questions,
-            user_answers=request.user_answers
+            user_answers=request.user_answers,
+            user_id=request.user_id,
+            document_id=request.document_id
         )
         
         return EvaluateResponse(**result)
@@ -144,6 +179,8 @@ async def get_document_topics(document_id: str):
     Useful for filtering or displaying topic categories.
     """
     try:
+        tag_usage(document_id=document_id)
+        
         # Generate a small set of MCQs to extract topics
         result = await generate_mcqs(
             document_id=document_id,
@@ -161,4 +198,35 @@ async def get_document_topics(document_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/mcq/mastery/{user_id}", response_model=MasteryResponse)
+async def get_user_mastery(user_id: str, document_id: Optional[str] = None):
+    """
+    Get a user's topic mastery across all evaluated attempts.
+    
+    Pass document_id to scope the report to quizzes from one document;
+    otherwise the rollup over every document is returned.
+    """
+    try:
+        report = await run_io(get_mastery_report, user_id, document_id)
+        
+        if not report["topic_mastery"]:
+            raise HTTPException(status_code=404, detail="No graded attempts found")
+        
+        return MasteryResponse(**report)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/mcq/mastery/{user_id}")
+async def reset_user_mastery(user_id: str, document_id: Optional[str] = None):
+    """Reset a user's mastery history (optionally for one document)."""
+    success = await run_io(clear_user_mastery, user_id, document_id)
+    if success:
+        return {"message": "Mastery history cleared"}
+    raise HTTPException(status_code=404, detail="No mastery history found")
@@ -1,40 +1,61 @@
 # /api/pdf endpoints
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from app.models.schemas import PDFResponse, DocumentUploadResponse
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from app.models.schemas import PDFResponse, DocumentUploadResponse, BulkDeleteRequest
 from app.services.pdf_processor import (
     process_pdf, 
-    save_uploaded_file, 
     process_pdf_for_vector_store,
     get_pdf_metadata
 )
-from app.utils.vector_store import add_documents_to_store, list_all_documents, delete_document_by_id
-from app.config import settings
+from app.utils.async_vector_store import (
+    aadd_documents_to_store,
+    adocument_exists,
+    arevise_document,
+    alist_all_documents,
+    adelete_document_by_id,
+    adelete_documents,
+    adelete_tenant_documents
+)
+from app.utils.document_index import (
+    chunk_starts_of,
+    index_document,
+    delete_document_index,
+    ensure_document_index,
+    get_sentence_count,
+    get_text_path,
+    load_sentences
+)
+from app.utils.lexical_index import build_lexical_index, delete_lexical_index
+from app.utils.helpers import is_valid_document_id, parse_range_header, iter_file_range
+from app.utils.uploads import receive_upload, PDF_UPLOAD_OPENAPI
+from app.utils.executors import run_io
+from app.utils.usage_tracker import tag_usage, usage_summary
+from typing import Optional
 import os
 
 router = APIRouter()
 
+MAX_SENTENCE_PAGE = 1000
+
+
+def check_document_id(document_id: str) -> None:
+    """Refuse ids that could not have been issued (they also name files on disk)."""
+    if not is_valid_document_id(document_id):
+        raise HTTPException(status_code=400, detail="Invalid document_id")
+
 
-@router.post("/pdf-read", response_model=PDFResponse)
-async def read_pdf(file: UploadFile = File(...)):
+@router.post("/pdf-read", response_model=PDFResponse, openapi_extra=PDF_UPLOAD_OPENAPI)
+async def read_pdf(request: Request):
     """Process PDF file and extract text (without storing in vector DB)."""
+    upload = None
     try:
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="Only PDF files are allowed")
-        
-        content = await file.read()
-        
-        if len(content) > settings.MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="File size exceeds limit")
-        
-        file_path = save_uploaded_file(content, file.filename)
-        result = await process_pdf(file_path)
-        
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        upload, _ = await receive_upload(request)
+        result = await process_pdf(upload.source)
 
         return PDFResponse(
             text=result["text"],
             audio_url=result["audio_url"],
+            audio_segments=result.get("audio_segments"),
             pages=result["pages"]
         )
     
@@ -42,56 +63,103 @@ async def read_pdf(file: UploadFile = File(...)):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if upload:
+            await run_io(upload.cleanup)
 
 
-@router.post("/pdf-upload", response_model=DocumentUploadResponse)
-async def upload_pdf_to_vector_store(file: UploadFile = File(...)):
-    """Upload PDF and store in vector database for Q&A and summarization."""
+@router.post("/pdf-upload", response_model=DocumentUploadResponse, openapi_extra=PDF_UPLOAD_OPENAPI)
+async def upload_pdf_to_vector_store(request: Request):
+    """
+    Upload PDF and store in vector database for Q&A and summarization.
+    
+    The multipart body is parsed as it streams in (see utils/uploads.py):
+    oversized uploads are refused early and small PDFs never touch disk.
+    Documents uploaded with the same course_id (form field) can be listed
+    and deleted together.
+    
+    With a document_id form field the upload is a revised version of that
+    document: only chunks whose content changed are embedded, chunks that
+    disappeared are deleted, and the document keeps its id and course.
+    """
+    upload = None
     try:
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="Only PDF files are allowed")
-        
-        content = await file.read()
-        
-        if len(content) > settings.MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="File size exceeds limit")
+        upload, fields = await receive_upload(request)
+        course_id = fields.get("course_id") or None
+        revise_id = fields.get("document_id") or None
+        if revise_id:
+            check_document_id(revise_id)
+        if revise_id and not await adocument_exists(revise_id):
+            raise HTTPException(status_code=404, detail="Document not found")
         
-        file_path = save_uploaded_file(content, file.filename)
-        result = await process_pdf_for_vector_store(file_path, file.filename)
-        
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        result = await process_pdf_for_vector_store(upload.source, upload.filename, upload.sha256, revise_id)
+        # The PDF itself is no longer needed; free it before embedding
+        await run_io(upload.cleanup)
         
         if result["status"] == "error":
             raise HTTPException(status_code=400, detail=result["message"])
         
-        success = add_documents_to_store(
-            texts=result["chunks"],
-            metadatas=result["metadatas"],
-            document_id=result["document_id"]
-        )
+        tag_usage(document_id=result["document_id"])
+        changes = None
+        if revise_id:
+            changes = await arevise_document(revise_id, result["chunks"], result["metadatas"])
+            if changes is None:
+                raise HTTPException(status_code=404, detail="Document not found")
+        else:
+            success = await aadd_documents_to_store(
+                texts=result["chunks"],
+                metadatas=result["metadatas"],
+                document_id=result["document_id"],
+                tenant_id=course_id
+            )
+            if not success:
+                raise HTTPException(status_code=500, detail="Failed to store document")
         
-        if not success:
-            raise HTTPException(status_code=500, detail="Failed to store document")
+        # BM25 index for hybrid retrieval, sentence offsets + chunk vectors
+        # for read aloud (both are rebuilt lazily if this fails). Rebuilding
+        # them also replaces a revised document's stale copies.
+        try:
+            await run_io(build_lexical_index, result["document_id"], result["chunks"], result["metadatas"])
+            await run_io(index_document, result["document_id"], result["full_text"], chunk_starts_of(result["metadatas"]))
+        except Exception as e:
+            print(f"Error indexing document: {e}")
+            if revise_id:
+                # Never serve the previous version's text; rebuilt on next use
+                await run_io(delete_lexical_index, revise_id)
+                await run_io(delete_document_index, revise_id)
+        
+        if changes:
+            message = (
+                f"PDF revised: {changes['added']} chunks re-embedded, "
+                f"{changes['unchanged']} unchanged, {changes['removed']} removed."
+            )
+        else:
+            message = "PDF uploaded successfully. Use document_id for summarization and Q&A."
         
         return DocumentUploadResponse(
             document_id=result["document_id"],
             filename=result["filename"],
             chunks=result["total_chunks"],
-            message=f"PDF uploaded successfully. Use document_id for summarization and Q&A."
+            message=message,
+            content_sha256=upload.sha256,
+            changes=changes,
+            usage=usage_summary()
         )
     
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if upload:
+            await run_io(upload.cleanup)
 
 
 @router.get("/documents/list")
-async def list_uploaded_documents():
-    """List all documents uploaded to vector store."""
+async def list_uploaded_documents(course_id: Optional[str] = Query(None)):
+    """List all documents uploaded to vector store (optionally one course's)."""
     try:
-        documents = list_all_documents()
+        documents = await alist_all_documents(course_id)
         return {"documents": documents, "count": len(documents)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -100,8 +168,11 @@ async def list_uploaded_documents():
 @router.delete("/documents/{document_id}")
 async def delete_document(document_id: str):
     """Delete a document from vector store."""
+    check_document_id(document_id)
     try:
-        success = delete_document_by_id(document_id)
+        success = await adelete_document_by_id(document_id)
+        await run_io(delete_document_index, document_id)
+        await run_io(delete_lexical_index, document_id)
         if success:
             return {"message": f"Document deleted successfully"}
         raise HTTPException(status_code=404, detail="Document not found")
@@ -109,30 +180,103 @@ async def delete_document(document_id: str):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/documents/bulk-delete")
+async def bulk_delete_documents(request: BulkDeleteRequest):
+    """Delete many documents at once (one delete per partition, not per document)."""
+    for document_id in request.document_ids:
+        check_document_id(document_id)
+    try:
+        document_ids = list(dict.fromkeys(request.document_ids))
+        deleted = await adelete_documents(document_ids)
+        for document_id in deleted:
+            await run_io(delete_document_index, document_id)
+            await run_io(delete_lexical_index, document_id)
+        deleted_set = set(deleted)
+        return {
+            "deleted": deleted,
+            "not_found": [doc_id for doc_id in document_ids if doc_id not in deleted_set]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
     
 
-# Add to backend/app/routes/pdf.py
+@router.delete("/courses/{course_id}")
+async def delete_course(course_id: str):
+    """Delete every document uploaded with a course_id."""
+    try:
+        deleted = await adelete_tenant_documents(course_id)
+        if not deleted:
+            raise HTTPException(status_code=404, detail="Course not found")
+        for document_id in deleted:
+            await run_io(delete_document_index, document_id)
+            await run_io(delete_lexical_index, document_id)
+        return {"message": "Course deleted successfully", "documents": deleted}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 
 @router.get("/documents/{document_id}/text")
-async def get_document_text(document_id: str):
-    """Get the full text of a document for read aloud."""
-    from app.utils.vector_store import get_document_by_id
-    
-    document = get_document_by_id(document_id)
+async def get_document_text(
+    document_id: str,
+    cursor: int = Query(0, ge=0, description="Index of the first sentence to return"),
+    limit: int = Query(100, ge=1, le=MAX_SENTENCE_PAGE)
+):
+    """
+    Get a page of a document's sentences for read aloud.
     
-    if not document:
+    Sentences are segmented once at upload; each call only slices the
+    stored offsets. Follow next_cursor until it is null. The full text is
+    available (with Range support) from /documents/{document_id}/text/raw.
+    """
+    check_document_id(document_id)
+    if not await run_io(ensure_document_index, document_id):
         raise HTTPException(status_code=404, detail="Document not found")
     
-    text = document['text']
-    
-    # Split into sentences for read aloud processing
-    import re
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    sentences = [s.strip() for s in sentences if s.strip() and len(s.strip()) > 10]
+    sentence_count = get_sentence_count(document_id)
+    sentences = await run_io(load_sentences, document_id, cursor, cursor + limit)
+    next_cursor = cursor + len(sentences)
     
     return {
         "document_id": document_id,
-        "text": text,
         "sentences": sentences,
-        "sentence_count": len(sentences)
-    }
\ No newline at end of file
+        "sentence_count": sentence_count,
+        "cursor": cursor,
+        "next_cursor": next_cursor if next_cursor < sentence_count else None,
+        "text_bytes": os.path.getsize(get_text_path(document_id))
+    }
+
+
+@router.get("/documents/{document_id}/text/raw")
+async def get_document_raw_text(document_id: str, request: Request):
+    """Stream the document's UTF-8 text; supports HTTP Range requests over bytes."""
+    check_document_id(document_id)
+    if not await run_io(ensure_document_index, document_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    path = get_text_path(document_id)
+    size = os.path.getsize(path)
+    headers = {"Accept-Ranges": "bytes"}
+    
+    try:
+        byte_range = parse_range_header(request.headers.get("range"), size)
+    except ValueError:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    
+    headers["Content-Length"] = str(max(0, end - start + 1))
+    return StreamingResponse(
+        iter_file_range(path, start, end),
+        status_code=status_code,
+        media_type="text/plain; charset=utf-8",
+        headers=headers
+    )
@@ -1,7 +1,10 @@
 # /api/qa endpoint
 from fastapi import APIRouter, HTTPException
-from app.models.schemas import QARequest, QAResponse
-from app.services.qa_system import answer_question, get_conversation_history, clear_conversation
+from app.models.schemas import QARequest, QAResponse, BatchQARequest, BatchQAResponse
+from app.services.qa_system import answer_question, answer_questions, get_conversation_history, clear_conversation
+from app.config import settings
+from app.utils.helpers import parse_page_range
+from app.utils.usage_tracker import tag_usage, usage_summary
 
 router = APIRouter()
 
@@ -9,27 +12,66 @@ router = APIRouter()
 @router.post("/qa", response_model=QAResponse)
 async def question_answer(request: QARequest):
     """Answer questions based on context or knowledge base with history."""
+    try:
+        pages = parse_page_range(request.page_start, request.page_end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if pages and not request.document_id:
+        raise HTTPException(status_code=400, detail="page_start/page_end require a document_id")
+    
     try:
         if not request.question.strip():
             raise HTTPException(status_code=400, detail="Question cannot be empty")
         
+        tag_usage(document_id=request.document_id)
         result = await answer_question(
             question=request.question,
             context=request.context,
             session_id=request.session_id,
-            use_history=True
+            use_history=True,
+            document_id=request.document_id,
+            pages=pages
         )
         
         return QAResponse(
             answer=result["answer"],
             sources=result.get("sources"),
-            session_id=result.get("session_id")
+            session_id=result.get("session_id"),
+            usage=usage_summary()
         )
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/qa/batch", response_model=BatchQAResponse)
+async def batch_question_answer(request: BatchQARequest):
+    """
+    Answer a list of independent questions about the stored documents.
+    
+    Answers come back in question order; a question whose LLM call failed
+    carries an error instead of failing the batch.
+    """
+    try:
+        pages = parse_page_range(request.page_start, request.page_end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if pages and not request.document_id:
+        raise HTTPException(status_code=400, detail="page_start/page_end require a document_id")
+    if len(request.questions) > settings.QA_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.QA_BATCH_MAX_QUESTIONS} questions per batch")
+    if any(not question.strip() for question in request.questions):
+        raise HTTPException(status_code=400, detail="Questions cannot be empty")
+    
+    try:
+        tag_usage(document_id=request.document_id)
+        result = await answer_questions(request.questions, document_id=request.document_id, pages=pages)
+        return BatchQAResponse(**result, usage=usage_summary())
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.delete("/qa/history/{session_id}")
 async def clear_history(session_id: str):
     """Clear conversation history for a session."""
@@ -1,29 +1,111 @@
 # backend/app/routes/read_aloud.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse, JSONResponse
 from app.services.read_aloud_service import (
-    generate_embeddings,
-    semantic_chunk_sentences
+    agenerate_embeddings,
+    asemantic_chunk_sentences,
+    asegment_document,
+    attach_audio
 )
+from app.services.tts_service import (
+    AUDIO_ID_PATTERN,
+    get_audio_status,
+    get_audio_path,
+    get_audio_content_type
+)
+from app.utils.helpers import parse_range_header, iter_file_range
+from app.utils.document_index import ensure_document_index
+from app.utils.executors import run_io
 from app.models.schemas import ReadAloudRequest, ReadAloudResponse
+from app.utils.usage_tracker import tag_usage, usage_summary
+import os
 
 router = APIRouter()
 
 @router.post("/read-aloud", response_model=ReadAloudResponse)
 async def read_aloud(request: ReadAloudRequest):
     try:
-        if not request.sentences or len(request.sentences) < 5:
-            raise HTTPException(status_code=400, detail="Not enough content")
+        mode = request.mode or "similarity"
 
-        embeddings = generate_embeddings(request.sentences)
+        if request.document_id:
+            tag_usage(document_id=request.document_id)
+            # Stored document: reuse the chunk vectors computed at upload
+            if not await run_io(ensure_document_index, request.document_id, with_embeddings=True):
+                raise HTTPException(status_code=404, detail="Document not found")
 
-        chunks = semantic_chunk_sentences(
-            request.sentences,
-            embeddings,
-            num_clusters=request.num_clusters
-        )
+            chunks = await asegment_document(request.document_id, request.num_clusters, mode)
+            if chunks is None:
+                raise HTTPException(status_code=400, detail="Not enough content")
+        else:
+            if not request.sentences or len(request.sentences) < 5:
+                raise HTTPException(status_code=400, detail="Not enough content")
+
+            embeddings = await agenerate_embeddings(request.sentences)
+            chunks = await asemantic_chunk_sentences(
+                request.sentences,
+                embeddings,
+                num_clusters=request.num_clusters,
+                mode=mode
+            )
+
+        if request.with_audio:
+            chunks = await attach_audio(chunks, request.voice)
 
-        return ReadAloudResponse(chunks=chunks)
+        return ReadAloudResponse(chunks=chunks, usage=usage_summary())
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/read-aloud/audio/{audio_id}")
+async def get_read_aloud_audio(audio_id: str, request: Request):
+    """
+    Serve a synthesized read-aloud segment.
+    
+    Supports HTTP Range requests for seeking. Returns 202 while the segment
+    is still being rendered so the player can retry.
+    """
+    if not AUDIO_ID_PATTERN.match(audio_id):
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    status = get_audio_status(audio_id)
+    if status == "pending":
+        return JSONResponse(
+            status_code=202,
+            content={"audio_id": audio_id, "status": status},
+            headers={"Retry-After": "1"}
+        )
+    if status == "failed":
+        raise HTTPException(status_code=500, detail="Audio generation failed")
+    if status == "missing":
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    path = get_audio_path(audio_id)
+    size = os.path.getsize(path)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=31536000, immutable"
+    }
+
+    try:
+        byte_range = parse_range_header(request.headers.get("range"), size)
+    except ValueError:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_file_range(path, start, end),
+        status_code=status_code,
+        media_type=get_audio_content_type(audio_id),
+        headers=headers
+    )
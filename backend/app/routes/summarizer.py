@@ -1,7 +1,18 @@
 # /api/summarize endpoint
 from fastapi import APIRouter, HTTPException
-from app.models.schemas import SummarizeRequest, SummarizeResponse
-from app.services.summarizer import summarize_text
+from fastapi.responses import StreamingResponse
+from app.config import settings
+from app.models.schemas import (
+    SummarizeRequest,
+    SummarizeResponse,
+    CoursePackSummarizeRequest,
+    CoursePackSummaryResponse
+)
+from app.services.summarizer import summarize_text, summarize_course_pack, summarize_course_pack_events
+from app.utils.async_vector_store import alist_all_documents
+from app.utils.helpers import parse_page_range
+from app.utils.usage_tracker import tag_usage, usage_summary, defer_until_streamed
+import json
 
 router = APIRouter()
 
@@ -18,6 +29,7 @@ async def summarize(request: SummarizeRequest):
     Usage:
     1. With direct text: {"text": "...", "summary_type": "explanatory"}
     2. With document_id: {"document_id": "uuid", "summary_type": "concise"}
+    3. Part of a document: {"document_id": "uuid", "page_start": 3, "page_end": 5}
     """
     try:
         # Validate input
@@ -27,12 +39,22 @@ async def summarize(request: SummarizeRequest):
                 detail="Either 'text' or 'document_id' must be provided"
             )
         
+        try:
+            pages = parse_page_range(request.page_start, request.page_end)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if pages and (request.text or not request.document_id):
+            raise HTTPException(status_code=400, detail="page_start/page_end apply to a stored document_id only")
+        
+        tag_usage(document_id=request.document_id)
+        
         # Generate summary
         result = await summarize_text(
             text=request.text,
             document_id=request.document_id,
             max_length=request.max_length or 500,
-            summary_type=request.summary_type or "learning"
+            summary_type=request.summary_type or "learning",
+            pages=pages
         )
         
         # Check for errors in result
@@ -42,10 +64,73 @@ async def summarize(request: SummarizeRequest):
         return SummarizeResponse(
             summary=result["summary"],
             summary_type=result["summary_type"],
-            source=result["source"]
+            source=result["source"],
+            usage=usage_summary()
         )
     
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
+
+
+@router.post("/summarize/course-pack", response_model=CoursePackSummaryResponse)
+async def summarize_pack(request: CoursePackSummarizeRequest):
+    """
+    Summarize several stored documents (a course pack) into one summary.
+    
+    Documents are summarized concurrently under a shared LLM budget, then
+    combined. Each document's summary is returned too.
+    
+    Usage:
+    1. Listed documents: {"document_ids": ["uuid", "uuid"]}
+    2. A whole course: {"course_id": "bio101"}
+    3. Progress: add "stream": true for NDJSON events (started, one per
+       finished document, reduce, summary)
+    """
+    if bool(request.document_ids) == bool(request.course_id):
+        raise HTTPException(status_code=400, detail="Provide either 'document_ids' or 'course_id'")
+    
+    if request.course_id:
+        document_ids = [doc["document_id"] for doc in await alist_all_documents(tenant_id=request.course_id)]
+        if not document_ids:
+            raise HTTPException(status_code=404, detail="Course not found")
+    else:
+        document_ids = list(dict.fromkeys(request.document_ids))
+    if len(document_ids) > settings.COURSE_PACK_MAX_DOCUMENTS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.COURSE_PACK_MAX_DOCUMENTS} documents per course pack")
+    
+    for document_id in document_ids:
+        tag_usage(document_id=document_id)
+    options = dict(
+        max_length=request.max_length or 800,
+        document_max_length=request.document_max_length or 300,
+        summary_type=request.summary_type or "explanatory"
+    )
+    
+    if request.stream:
+        async def events():
+            async for event in summarize_course_pack_events(document_ids, **options):
+                if event["event"] == "summary":
+                    event["usage"] = usage_summary()
+                yield json.dumps(event) + "\n"
+        
+        # The LLM calls happen while the body streams; account for them then
+        return StreamingResponse(defer_until_streamed(events()), media_type="application/x-ndjson")
+    
+    try:
+        result = await summarize_course_pack(document_ids, **options)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
+    
+    if result["summary"] is None:
+        not_found = all(document["error"] == "Error: Document not found" for document in result["documents"])
+        raise HTTPException(status_code=404 if not_found else 500, detail=result["error"])
+    
+    return CoursePackSummaryResponse(
+        summary=result["summary"],
+        summary_type=result["summary_type"],
+        documents=result["documents"],
+        processing_time_seconds=result["processing_time_seconds"],
+        usage=usage_summary()
+    )
@@ -0,0 +1,23 @@
+# /api/usage endpoints (token and cost accounting)
+from fastapi import APIRouter
+from app.utils.usage_tracker import get_usage_stats, reset_usage_stats
+
+router = APIRouter()
+
+
+@router.get("/usage/stats")
+async def usage_stats():
+    """
+    Tokens, latency and estimated cost of LLM and embedding calls.
+    
+    Rolled up overall, per endpoint, per document and per model since
+    startup (or the last reset).
+    """
+    return get_usage_stats()
+
+
+@router.delete("/usage/stats")
+async def clear_usage_stats():
+    """Reset the usage counters."""
+    reset_usage_stats()
+    return {"message": "Usage stats reset"}
@@ -1,12 +1,18 @@
 # OpenAI/LangChain integration
-from langchain_openai import ChatOpenAI
 from app.config import settings
+from app.utils.usage_tracker import UsageCallbackHandler
 
 
 def get_llm(model: str = "gpt-4", temperature: float = 0.1):
-    """Initialize and return LLM instance."""
+    """Initialize and return LLM instance (token usage is recorded per call)."""
+    # Deferred: langchain_openai/openai take seconds to import
+    from langchain_openai import ChatOpenAI
+    
+    model = "gpt-5-nano" if model == "gpt-4" else model
     return ChatOpenAI(
-        model="gpt-5-nano" if model == "gpt-4" else model,
+        model=model,
         temperature=temperature,
-        openai_api_key=settings.OPENAI_API_KEY
+        openai_api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL or None,
+        callbacks=[UsageCallbackHandler(model)]
     )
@@ -0,0 +1,144 @@
+# Incremental topic mastery aggregates (per user x document x topic)
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.config import settings
+
+# Rows with this document_id hold the user's rollup across all documents
+ALL_DOCUMENTS = "*"
+
+_connection = None
+_lock = threading.Lock()
+
+
+def get_mastery_db() -> sqlite3.Connection:
+    """Get or create the SQLite connection holding mastery counters."""
+    global _connection
+
+    if _connection is None:
+        with _lock:
+            if _connection is None:
+                db_dir = os.path.dirname(settings.MASTERY_DB_PATH)
+                if db_dir:
+                    os.makedirs(db_dir, exist_ok=True)
+
+                conn = sqlite3.connect(settings.MASTERY_DB_PATH, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """CREATE TABLE IF NOT EXISTS topic_mastery (
+                        user_id TEXT NOT NULL,
+                        document_id TEXT NOT NULL,
+                        topic TEXT NOT NULL,
+                        total INTEGER NOT NULL DEFAULT 0,
+                        correct INTEGER NOT NULL DEFAULT 0,
+                        rolling REAL NOT NULL DEFAULT 0,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        updated_at TEXT NOT NULL,
+                        PRIMARY KEY (user_id, document_id, topic)
+                    )"""
+                )
+                conn.commit()
+                _connection = conn
+
+    return _connection
+
+
+def record_attempt(user_id: str, document_id: Optional[str], topic_analysis: List[Dict]) -> None:
+    """
+    Fold one graded attempt into the aggregates.
+
+    Each topic is a single upsert on its (user, document, topic) row plus
+    one on the user's all-documents rollup, so the cost per graded answer is
+    constant no matter how much history already exists.
+
+    The rolling mastery is an exponentially weighted average of correctness.
+    Applying n answers with c correct at once uses the closed form
+    r' = d * r + (1 - d) * c / n with d = (1 - alpha) ** n.
+    """
+    alpha = settings.MASTERY_DECAY
+    now = datetime.now().isoformat()
+    document_keys = [document_id or ALL_DOCUMENTS]
+    if document_id:
+        document_keys.append(ALL_DOCUMENTS)
+
+    rows = []
+    for topic in topic_analysis:
+        total = topic["total"]
+        if total <= 0:
+            continue
+        correct = topic["correct"]
+        decay = (1 - alpha) ** total
+        for doc_key in document_keys:
+            rows.append((user_id, doc_key, topic["topic"], total, correct, correct / total, now, decay))
+
+    if not rows:
+        return
+
+    conn = get_mastery_db()
+    with _lock:
+        conn.executemany(
+            """INSERT INTO topic_mastery
+                   (user_id, document_id, topic, total, correct, rolling, attempts, updated_at)
+               VALUES (?1, ?2, ?3, ?4, ?5, ?6, 1, ?7)
+               ON CONFLICT (user_id, document_id, topic) DO UPDATE SET
+                   total = total + excluded.total,
+                   correct = correct + excluded.correct,
+                   rolling = ?8 * rolling + (1 - ?8) * excluded.rolling,
+                   attempts = attempts + 1,
+                   updated_at = excluded.updated_at""",
+            rows
+        )
+        conn.commit()
+
+
+def get_topic_mastery(user_id: str, document_id: Optional[str] = None) -> List[Dict]:
+    """
+    Read the aggregated counters for a user (optionally for one document).
+
+    Returns one entry per topic, weakest rolling mastery first.
+    """
+    conn = get_mastery_db()
+    with _lock:
+        rows = conn.execute(
+            """SELECT topic, total, correct, rolling, attempts, updated_at
+               FROM topic_mastery
+               WHERE user_id = ? AND document_id = ?
+               ORDER BY rolling ASC, topic ASC""",
+            (user_id, document_id or ALL_DOCUMENTS)
+        ).fetchall()
+
+    mastery = []
+    for topic, total, correct, rolling, attempts, updated_at in rows:
+        mastery.append({
+            "topic": topic,
+            "total": total,
+            "correct": correct,
+            "incorrect": total - correct,
+            "percentage": round((correct / total) * 100) if total > 0 else 0,
+            "rolling_percentage": round(rolling * 100),
+            "attempts": attempts,
+            "last_attempt": updated_at
+        })
+
+    return mastery
+
+
+def clear_user_mastery(user_id: str, document_id: Optional[str] = None) -> bool:
+    """
+    Delete a user's aggregates (all of them, or one document's rows).
+
+    Clearing a single document leaves the all-documents rollup untouched.
+    """
+    conn = get_mastery_db()
+    with _lock:
+        if document_id:
+            cursor = conn.execute(
+                "DELETE FROM topic_mastery WHERE user_id = ? AND document_id = ?",
+                (user_id, document_id)
+            )
+        else:
+            cursor = conn.execute("DELETE FROM topic_mastery WHERE user_id = ?", (user_id,))
+        conn.commit()
+    return cursor.rowcount > 0
@@ -1,15 +1,17 @@
 # MCQ generation with document_id support and topic analysis
 import json
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from app.services.llm_service import get_llm
-from app.utils.vector_store import get_document_by_id
+from app.utils.async_vector_store import aget_document_by_id
+from app.utils.executors import run_io
 from app.utils.helpers import chunk_text
+from app.utils.metrics import timed_stage
+from app.services.mastery_tracker import record_attempt, get_topic_mastery
 from typing import Optional, List, Dict
 import asyncio
 from collections import defaultdict
 
 
+@timed_stage("mcq_generate")
 async def generate_mcqs(
     text: Optional[str] = None,
     document_id: Optional[str] = None,
@@ -31,7 +33,7 @@ async def generate_mcqs(
         
         # Get text from vector store if document_id provided
         if document_id and not text:
-            document = get_document_by_id(document_id)
+            document = await aget_document_by_id(document_id)
             
             if not document:
                 return {
@@ -122,11 +124,15 @@ def extract_topics(questions: List[Dict]) -> List[Dict]:
     return sorted(topics, key=lambda x: x['name'])
 
 
+@timed_stage("mcq_llm")
 async def generate_mcqs_from_chunk(text: str, num_questions: int) -> list:
     """Generate MCQs from a single text chunk."""
     
     llm = get_llm(model="gpt-3.5-turbo", temperature=0.3)
     
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+    
     prompt = ChatPromptTemplate.from_template(
         """You are an expert teacher creating multiple choice questions to test understanding.
 
@@ -210,9 +216,26 @@ JSON Output:"""
         return []
 
 
+def get_performance_level(percentage: int) -> str:
+    """Map a topic percentage to a performance level."""
+    if percentage == 100:
+        return "excellent"
+    elif percentage >= 80:
+        return "strong"
+    elif percentage >= 60:
+        return "good"
+    elif percentage >= 40:
+        return "needs_practice"
+    else:
+        return "weak"
+
+
+@timed_stage("mcq_evaluate")
 async def evaluate_mcq_answers(
     questions: List[Dict],
-    user_answers: Dict[int, int]
+    user_answers: Dict[int, int],
+    user_id: Optional[str] = None,
+    document_id: Optional[str] = None
 ) -> Dict:
     """
     Evaluate user answers and provide topic-wise analysis.
@@ -220,6 +243,8 @@ async def evaluate_mcq_answers(
     Args:
         questions: List of MCQ questions
         user_answers: Dict mapping question index to selected option index
+        user_id: If provided, the attempt is folded into the user's mastery aggregates
+        document_id: Document the quiz was generated from (for per-document mastery)
     
     Returns:
         Dict with score, topic analysis, and feedback
@@ -261,25 +286,13 @@ async def evaluate_mcq_answers(
     for topic, stats in topic_stats.items():
         percentage = round((stats["correct"] / stats["total"]) * 100) if stats["total"] > 0 else 0
         
-        # Determine performance level
-        if percentage == 100:
-            performance = "excellent"
-        elif percentage >= 80:
-            performance = "strong"
-        elif percentage >= 60:
-            performance = "good"
-        elif percentage >= 40:
-            performance = "needs_practice"
-        else:
-            performance = "weak"
-        
         topic_analysis.append({
             "topic": topic,
             "total": stats["total"],
             "correct": stats["correct"],
             "incorrect": stats["incorrect"],
             "percentage": percentage,
-            "performance": performance,
+            "performance": get_performance_level(percentage),
             "questions": stats["questions"]
         })
     
@@ -293,6 +306,13 @@ async def evaluate_mcq_answers(
     # Calculate overall percentage
     overall_percentage = round((total_correct / total_questions) * 100) if total_questions > 0 else 0
     
+    # Fold this attempt into the running per-topic aggregates
+    if user_id:
+        try:
+            await run_io(record_attempt, user_id, document_id, topic_analysis)
+        except Exception as e:
+            print(f"Error recording mastery: {e}")
+    
     return {
         "total_questions": total_questions,
         "total_correct": total_correct,
@@ -304,6 +324,48 @@ async def evaluate_mcq_answers(
     }
 
 
+def get_mastery_report(user_id: str, document_id: Optional[str] = None) -> Dict:
+    """
+    Build a topic mastery report from the stored aggregates.
+    
+    Reads one precomputed row per topic, so the cost does not depend on how
+    many attempts the user has made. Weak/strong classification and
+    recommendations use the rolling mastery, so recent answers count most.
+    """
+    mastery = get_topic_mastery(user_id, document_id)
+    
+    topic_analysis = []
+    for entry in mastery:
+        topic_analysis.append({
+            **entry,
+            "performance": get_performance_level(entry["rolling_percentage"])
+        })
+    
+    total_questions = sum(t["total"] for t in topic_analysis)
+    total_correct = sum(t["correct"] for t in topic_analysis)
+    overall_percentage = round((total_correct / total_questions) * 100) if total_questions > 0 else 0
+    
+    weak_topics = [t["topic"] for t in topic_analysis if t["rolling_percentage"] < 60]
+    strong_topics = [t["topic"] for t in topic_analysis if t["rolling_percentage"] >= 80]
+    
+    recommendations = generate_recommendations([
+        {**t, "percentage": t["rolling_percentage"]}
+        for t in topic_analysis
+    ]) if topic_analysis else []
+    
+    return {
+        "user_id": user_id,
+        "document_id": document_id,
+        "total_questions": total_questions,
+        "total_correct": total_correct,
+        "overall_percentage": overall_percentage,
+        "topic_mastery": topic_analysis,
+        "weak_topics": weak_topics,
+        "strong_topics": strong_topics,
+        "recommendations": recommendations
+    }
+
+
 def generate_recommendations(topic_analysis: List[Dict]) -> List[str]:
     """Generate study recommendations based on topic analysis."""
     recommendations = []
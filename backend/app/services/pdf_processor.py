@@ -1,76 +1,137 @@
 # Enhanced PDF processing with better extraction
+import importlib.util
+import io
 import os
+import time
 import uuid
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Optional, Union
 from app.config import settings
-from app.utils.helpers import chunk_text
+from app.utils.helpers import chunk_hash, page_chunk_spans, page_span, split_sentence_spans
+from app.utils.executors import run_cpu
+from app.utils.metrics import counter, timed_stage
+from app.utils.tracing import record_span
 
-try:
-    import fitz  # PyMuPDF
-    PYMUPDF_AVAILABLE = True
-except ImportError:
-    PYMUPDF_AVAILABLE = False
+# PyMuPDF and PyPDF2 are imported on first use (in the worker that extracts),
+# so only their availability is checked at startup
+PYMUPDF_AVAILABLE = importlib.util.find_spec("fitz") is not None
+if not PYMUPDF_AVAILABLE:
     print("Warning: PyMuPDF not installed. Falling back to PyPDF2")
 
-# Fallback to PyPDF2
-from PyPDF2 import PdfReader
+DOCUMENTS_INGESTED = counter("scholarnet_documents_ingested_total", "PDFs processed for the vector store", ("status",))
+INGESTED_BYTES = counter("scholarnet_ingested_bytes_total", "Bytes of PDFs processed for the vector store")
+INGESTED_CHUNKS = counter("scholarnet_ingested_chunks_total", "Chunks produced from ingested PDFs")
+
+# A PDF to read: file path, or the bytes of an upload kept in memory
+PDFSource = Union[str, bytes]
+
+
+def open_pymupdf(source: PDFSource):
+    """Open a PDF with PyMuPDF from a path or directly from memory."""
+    import fitz  # PyMuPDF
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+def open_pypdf2(source: PDFSource):
+    """Open a PDF with PyPDF2 from a path or directly from memory."""
+    from PyPDF2 import PdfReader
+    if isinstance(source, (bytes, bytearray)):
+        return PdfReader(io.BytesIO(source))
+    return PdfReader(source)
+
+
+def join_pages(parts: List[str]) -> Tuple[str, List[int]]:
+    """
+    Concatenate per-page text (separators included) and strip the result.
+    
+    Returns:
+        (text, start offset of every page in text)
+    """
+    raw = "".join(parts)
+    text = raw.strip()
+    leading = len(raw) - len(raw.lstrip())
+    
+    page_starts = []
+    offset = 0
+    for part in parts:
+        page_starts.append(min(max(offset - leading, 0), len(text)))
+        offset += len(part)
+    return text, page_starts
 
 
-def extract_text_from_pdf_pymupdf(file_path: str) -> Tuple[str, int]:
+def extract_pages_pymupdf(source: PDFSource) -> Tuple[str, List[int]]:
     """
     Extract text using PyMuPDF (much better for complex PDFs).
     Handles images, tables, and complex layouts better.
+    
+    Returns:
+        (text, start offset of every page in text)
     """
     doc = None
     try:
-        doc = fitz.open(file_path)
-        text = ""
-        num_pages = len(doc)
-        
-        for page_num in range(num_pages):
-            page = doc[page_num]
-            # Extract text with layout preservation
-            text += page.get_text("text")
-            text += "\n\n"  # Page separator
-        
-        return text.strip(), num_pages
+        doc = open_pymupdf(source)
+        # Extract text with layout preservation, blank line as page separator
+        return join_pages([page.get_text("text") + "\n\n" for page in doc])
     finally:
         # Always close the document properly
         if doc:
             doc.close()
 
 
-def extract_text_from_pdf_pypdf2(file_path: str) -> Tuple[str, int]:
-    """Fallback: Extract text using PyPDF2 (basic extraction)."""
-    reader = PdfReader(file_path)
-    text = ""
+def extract_pages_pypdf2(source: PDFSource) -> Tuple[str, List[int]]:
+    """Fallback: Extract text using PyPDF2 (basic extraction), with page offsets."""
+    reader = open_pypdf2(source)
+    parts = []
     
     for page in reader.pages:
         page_text = page.extract_text()
-        if page_text:
-            text += page_text + "\n"
+        parts.append(page_text + "\n" if page_text else "")
     
-    return text.strip(), len(reader.pages)
+    return join_pages(parts)
 
 
-def extract_text_from_pdf(file_path: str) -> Tuple[str, int]:
+def extract_pages(source: PDFSource) -> Tuple[str, List[int]]:
     """
     Smart PDF extraction - uses best available library.
     
+    source is a file path or the PDF bytes.
+    
     Priority:
     1. PyMuPDF (fitz) - Best quality
     2. PyPDF2 - Fallback
+    
+    Returns:
+        (text, start offset of every page in text)
     """
     if PYMUPDF_AVAILABLE:
         try:
             print("📄 Using PyMuPDF for extraction (better quality)")
-            return extract_text_from_pdf_pymupdf(file_path)
+            return extract_pages_pymupdf(source)
         except Exception as e:
             print(f"Error with PyMuPDF extraction, trying fallback: {e}")
-            return extract_text_from_pdf_pypdf2(file_path)
+            return extract_pages_pypdf2(source)
     else:
         print("📄 Using PyPDF2 for extraction (basic quality)")
-        return extract_text_from_pdf_pypdf2(file_path)
+        return extract_pages_pypdf2(source)
+
+
+def extract_text_from_pdf_pymupdf(source: PDFSource) -> Tuple[str, int]:
+    """Text and page count using PyMuPDF."""
+    text, page_starts = extract_pages_pymupdf(source)
+    return text, len(page_starts)
+
+
+def extract_text_from_pdf_pypdf2(source: PDFSource) -> Tuple[str, int]:
+    """Text and page count using PyPDF2."""
+    text, page_starts = extract_pages_pypdf2(source)
+    return text, len(page_starts)
+
+
+def extract_text_from_pdf(source: PDFSource) -> Tuple[str, int]:
+    """Text and page count with the best available library (see extract_pages)."""
+    text, page_starts = extract_pages(source)
+    return text, len(page_starts)
 
 
 def save_uploaded_file(file_content: bytes, filename: str) -> str:
@@ -87,32 +148,76 @@ def save_uploaded_file(file_content: bytes, filename: str) -> str:
     return file_path
 
 
-async def process_pdf(file_path: str) -> dict:
-    """Process PDF and optionally generate audio."""
-    text, num_pages = extract_text_from_pdf(file_path)
+@timed_stage("pdf_read")
+async def process_pdf(source: PDFSource) -> dict:
+    """Process PDF (path or bytes) and optionally generate audio."""
+    text, num_pages = await run_cpu(extract_text_from_pdf, source)
     
     # Basic quality check
     if len(text.strip()) < 100:
         print("⚠️ Warning: Extracted text is suspiciously short. PDF may have images/scans.")
     
-    # TTS can be implemented here
     audio_url = None
+    audio_segments = None
+    
+    if settings.PDF_READ_AUDIO and text.strip():
+        from app.services.tts_service import submit_segments, get_audio_url
+        
+        # Queue speech for the whole text; the first segment's URL is the entry point
+        jobs = submit_segments(group_sentences_for_audio(text))
+        audio_segments = [get_audio_url(job["audio_id"]) for job in jobs]
+        audio_url = audio_segments[0] if audio_segments else None
     
     return {
         "text": text,
         "audio_url": audio_url,
+        "audio_segments": audio_segments,
         "pages": num_pages
     }
 
 
-def process_pdf_for_vector_store_sync(file_path: str, filename: str) -> dict:
+def group_sentences_for_audio(text: str, max_chars: int = 1500) -> list:
+    """Group consecutive sentences into segments of roughly max_chars for TTS."""
+    segments = []
+    current = []
+    current_length = 0
+    
+    for start, end in split_sentence_spans(text):
+        sentence = " ".join(text[start:end].split())
+        if current and current_length + len(sentence) > max_chars:
+            segments.append(" ".join(current))
+            current, current_length = [], 0
+        current.append(sentence)
+        current_length += len(sentence) + 1
+    
+    if current:
+        segments.append(" ".join(current))
+    
+    return segments
+
+
+def process_pdf_for_vector_store_sync(
+    source: PDFSource,
+    filename: str,
+    content_sha256: Optional[str] = None,
+    document_id: Optional[str] = None
+) -> dict:
     """
     Synchronous version - Process PDF and prepare for vector store.
-    This ensures file operations complete before returning.
+    
+    source is a file path or the PDF bytes; content_sha256 (of the
+    upload) is stored in every chunk's metadata when given. Pass the
+    document_id of a stored document to re-ingest a revised version.
     """
     try:
+        # Wall-clock stage timings, replayed as trace spans by the parent process
+        timings = {}
+        
         # Extract text with better library
-        text, num_pages = extract_text_from_pdf(file_path)
+        started = time.time_ns()
+        text, page_starts = extract_pages(source)
+        num_pages = len(page_starts)
+        timings["pdf_extract"] = (started, time.time_ns())
         
         # Validate extraction quality
         if not text or len(text.strip()) < 10:
@@ -124,15 +229,26 @@ def process_pdf_for_vector_store_sync(file_path: str, filename: str) -> dict:
             print(f"⚠️ Warning: Only {words_per_page:.0f} words/page. PDF may be image-heavy.")
             print("💡 Tip: Consider using OCR or vision-enabled models for better results.")
         
-        # Generate unique document ID
-        document_id = str(uuid.uuid4())
+        # Generate unique document ID (unless revising a stored one)
+        document_id = document_id or str(uuid.uuid4())
         
-        # Chunking for vector store
-        chunks = chunk_text(text, chunk_size=1000, overlap=200)
+        # Chunking for vector store: chunks restart at every page, so a
+        # revised upload only produces new chunks for the pages that changed
+        started = time.time_ns()
+        spans = [
+            (start, end)
+            for start, end in page_chunk_spans(page_starts, len(text), settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+            if text[start:end].strip()
+        ]
+        chunks = [text[start:end] for start, end in spans]
+        timings["pdf_chunk"] = (started, time.time_ns())
         
         if not chunks:
             raise ValueError("No chunks generated from PDF text")
         
+        # Pages each chunk spans, so retrieval can be limited to a page range
+        page_spans = [page_span(page_starts, start, end) for start, end in spans]
+        
         # Prepare metadata for each chunk
         metadatas = [
             {
@@ -141,10 +257,17 @@ def process_pdf_for_vector_store_sync(file_path: str, filename: str) -> dict:
                 "chunk_index": i,
                 "total_chunks": len(chunks),
                 "pages": num_pages,
+                "page_start": page_spans[i][0],
+                "page_end": page_spans[i][1],
+                "char_start": spans[i][0],
+                "chunk_hash": chunk_hash(chunks[i]),
                 "extraction_method": "pymupdf" if PYMUPDF_AVAILABLE else "pypdf2"
             }
             for i in range(len(chunks))
         ]
+        if content_sha256:
+            for metadata in metadatas:
+                metadata["content_sha256"] = content_sha256
         
         return {
             "status": "success",
@@ -155,7 +278,8 @@ def process_pdf_for_vector_store_sync(file_path: str, filename: str) -> dict:
             "pages": num_pages,
             "total_chunks": len(chunks),
             "words_per_page": words_per_page,
-            "full_text": text  # Keep full text for later retrieval
+            "full_text": text,  # Keep full text for later retrieval
+            "timings": timings
         }
     
     except Exception as e:
@@ -167,32 +291,38 @@ def process_pdf_for_vector_store_sync(file_path: str, filename: str) -> dict:
         }
 
 
-async def process_pdf_for_vector_store(file_path: str, filename: str) -> dict:
+@timed_stage("pdf_ingest")
+async def process_pdf_for_vector_store(
+    source: PDFSource,
+    filename: str,
+    content_sha256: Optional[str] = None,
+    document_id: Optional[str] = None
+) -> dict:
     """
     Async wrapper that runs synchronous PDF processing.
-    Ensures file is fully processed before any cleanup.
+    Ensures the source is fully processed before any cleanup.
     """
-    import asyncio
+    size = len(source) if isinstance(source, (bytes, bytearray)) else os.path.getsize(source)
     
-    # Run the synchronous extraction in a thread pool to not block
-    loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(
-        None, 
-        process_pdf_for_vector_store_sync, 
-        file_path, 
-        filename
-    )
+    # Extraction and chunking are CPU-bound: run them in the process pool
+    result = await run_cpu(process_pdf_for_vector_store_sync, source, filename, content_sha256, document_id)
+    for name, (start_ns, end_ns) in result.pop("timings", {}).items():
+        record_span(name, start_ns, end_ns)
     
+    DOCUMENTS_INGESTED.inc(status=result["status"])
+    if result["status"] == "success":
+        INGESTED_BYTES.inc(size)
+        INGESTED_CHUNKS.inc(result["total_chunks"])
     return result
 
 
-def get_pdf_metadata(file_path: str) -> dict:
-    """Extract metadata from PDF."""
+def get_pdf_metadata(source: PDFSource) -> dict:
+    """Extract metadata from PDF (path or bytes)."""
     try:
         if PYMUPDF_AVAILABLE:
             doc = None
             try:
-                doc = fitz.open(file_path)
+                doc = open_pymupdf(source)
                 metadata = doc.metadata
                 pages = len(doc)
                 return {
@@ -205,7 +335,7 @@ def get_pdf_metadata(file_path: str) -> dict:
                 if doc:
                     doc.close()
         else:
-            reader = PdfReader(file_path)
+            reader = open_pypdf2(source)
             metadata = reader.metadata
             return {
                 "title": metadata.get("/Title", "Unknown") if metadata else "Unknown",
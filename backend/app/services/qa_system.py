@@ -1,11 +1,13 @@
 # Q&A with Conversation History Support
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough, RunnableParallel
 from app.services.llm_service import get_llm
-from app.utils.vector_store import get_optimized_retriever
-from typing import Optional, List, Dict
+from app.utils.async_vector_store import ahybrid_search, ahybrid_search_batch
+from app.utils.context_packer import pack_context
+from app.utils.executors import run_cpu
+from app.utils.metrics import track_stage, timed_stage
+from app.config import settings
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime
+import asyncio
 import uuid
 
 # ✅ In-memory storage (for demo - use Redis/DB in production)
@@ -51,9 +53,10 @@ def get_or_create_session(session_id: Optional[str] = None) -> ConversationHisto
     return new_session
 
 
-def format_docs(docs):
-    """Format retrieved documents into a single string."""
-    return "\n\n".join(doc.page_content[:300] for doc in docs)
+async def format_docs(docs, question: str, model: str = "gpt-3.5-turbo") -> str:
+    """Pack the sentences of retrieved documents most relevant to the question into the token budget."""
+    # Sentence splitting and scoring are CPU-bound; keep them off the event loop
+    return await run_cpu(pack_context, question, [doc.page_content for doc in docs], model)
 
 
 def get_question_type(question: str) -> str:
@@ -109,11 +112,14 @@ Instructions:
 Answer:"""
 
 
+@timed_stage("qa")
 async def answer_question(
     question: str,
     context: str = None,
     session_id: Optional[str] = None,
-    use_history: bool = True
+    use_history: bool = True,
+    document_id: Optional[str] = None,
+    pages: Optional[Tuple[int, int]] = None
 ) -> dict:
     """
     Answer question with optional conversation history.
@@ -123,12 +129,15 @@ async def answer_question(
         context: Optional direct context (if not using vector store)
         session_id: Session ID for conversation history
         use_history: Whether to use conversation history
+        document_id: Restrict retrieval to one stored document
+        pages: (first, last) page range of that document to retrieve from
     
     Returns:
         Dict with answer, sources, and session_id
     """
     
-    llm = get_llm(model="gpt-3.5-turbo", temperature=0.3)
+    model = "gpt-3.5-turbo"
+    llm = get_llm(model=model, temperature=0.3)
     
     # Get or create session
     session = get_or_create_session(session_id) if use_history else None
@@ -145,18 +154,23 @@ async def answer_question(
     
     # Build prompt with history
     prompt_template = get_prompt_with_history(question_type)
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+    
     prompt = ChatPromptTemplate.from_template(prompt_template)
     
     if context:
-        # Direct context provided
-        context = context[:4000]
+        # Direct context provided: keep the parts relevant to the question
+        with track_stage("qa_context_packing"):
+            context = await run_cpu(pack_context, question, [context], model)
         
         chain = prompt | llm | StrOutputParser()
-        answer = await chain.ainvoke({
-            "context": context,
-            "question": question,
-            "conversation_history": conversation_history
-        })
+        with track_stage("qa_llm"):
+            answer = await chain.ainvoke({
+                "context": context,
+                "question": question,
+                "conversation_history": conversation_history
+            })
         
         # Store in history
         if session:
@@ -170,22 +184,21 @@ async def answer_question(
         }
     
     else:
-        # Retrieve from vector store
-        retriever = get_optimized_retriever(k=3, search_type="similarity")
+        # Hybrid BM25 + vector retrieval (keyword queries skip the embedding call)
+        with track_stage("qa_retrieval"):
+            results = await ahybrid_search(question, k=settings.QA_RETRIEVAL_K, document_id=document_id, pages=pages)
+        retrieved_docs = [doc for doc, _ in results]
         
-        rag_chain = (
-            RunnableParallel({
-                "context": retriever | format_docs,
-                "question": RunnablePassthrough(),
-                "conversation_history": lambda x: conversation_history
-            })
-            | prompt
-            | llm
-            | StrOutputParser()
-        )
+        with track_stage("qa_context_packing"):
+            packed_context = await format_docs(retrieved_docs, question, model)
         
-        retrieved_docs = await retriever.ainvoke(question)
-        answer = await rag_chain.ainvoke(question)
+        chain = prompt | llm | StrOutputParser()
+        with track_stage("qa_llm"):
+            answer = await chain.ainvoke({
+                "context": packed_context,
+                "question": question,
+                "conversation_history": conversation_history
+            })
         
         sources = [
             f"{doc.page_content[:150]}..."
@@ -204,6 +217,101 @@ async def answer_question(
         }
 
 
+def _source_key(doc) -> tuple:
+    metadata = doc.metadata or {}
+    if "document_id" in metadata and "chunk_index" in metadata:
+        return metadata["document_id"], metadata["chunk_index"]
+    return None, doc.page_content
+
+
+@timed_stage("qa_batch")
+async def answer_questions(
+    questions: List[str],
+    document_id: Optional[str] = None,
+    pages: Optional[Tuple[int, int]] = None
+) -> dict:
+    """
+    Answer many independent questions (no conversation history).
+    
+    Retrieval runs once for the whole batch: one embedding request, one
+    vector query per partition, and repeated questions are retrieved and
+    answered once. LLM calls run concurrently, at most
+    QA_BATCH_CONCURRENCY at a time, so a batch takes about as long as its
+    slowest answer.
+    
+    Args:
+        questions: Questions, answered in this order
+        document_id: Restrict retrieval to one stored document
+        pages: (first, last) page range of that document to retrieve from
+    
+    Returns:
+        Dict with answers (question, answer or error, indices into
+        sources) and sources (each retrieved chunk once)
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+    
+    model = "gpt-3.5-turbo"
+    llm = get_llm(model=model, temperature=0.3)
+    unique = list(dict.fromkeys(questions))
+    
+    with track_stage("qa_retrieval"):
+        results = await ahybrid_search_batch(unique, k=settings.QA_RETRIEVAL_K, document_id=document_id, pages=pages)
+    
+    # Chunks retrieved for several questions are listed once
+    sources, source_ids, retrieved = [], {}, []
+    for hits in results:
+        ids = []
+        for doc, _ in hits:
+            key = _source_key(doc)
+            if key not in source_ids:
+                source_ids[key] = len(sources)
+                sources.append(f"{doc.page_content[:150]}...")
+            ids.append(source_ids[key])
+        retrieved.append(ids)
+    
+    limit = asyncio.Semaphore(max(1, settings.QA_BATCH_CONCURRENCY))
+    chains = {}
+    
+    async def answer(question: str, hits: list) -> str:
+        question_type = get_question_type(question)
+        if question_type not in chains:
+            prompt = ChatPromptTemplate.from_template(get_prompt_with_history(question_type))
+            chains[question_type] = prompt | llm | StrOutputParser()
+        
+        with track_stage("qa_context_packing"):
+            packed_context = await format_docs([doc for doc, _ in hits], question, model)
+        
+        async with limit:
+            with track_stage("qa_llm"):
+                result = await chains[question_type].ainvoke({
+                    "context": packed_context,
+                    "question": question,
+                    "conversation_history": "No previous conversation"
+                })
+        return result.strip()
+    
+    answers = await asyncio.gather(
+        *(answer(question, hits) for question, hits in zip(unique, results)),
+        return_exceptions=True
+    )
+    
+    by_question = {}
+    for question, ids, result in zip(unique, retrieved, answers):
+        failed = isinstance(result, Exception)
+        by_question[question] = {
+            "question": question,
+            "answer": None if failed else result,
+            "sources": ids,
+            "error": str(result) if failed else None
+        }
+    
+    return {
+        "answers": [by_question[question] for question in questions],
+        "sources": sources
+    }
+
+
 # ✅ NEW: Session management functions
 def get_conversation_history(session_id: str) -> List[Dict]:
     """Get full conversation history for a session."""
@@ -1,42 +1,121 @@
 # backend/app/services/read_aloud_service.py
 
-from typing import List, Dict
-import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.metrics.pairwise import cosine_similarity
-from langchain_openai import OpenAIEmbeddings
+import asyncio
+from typing import List, Dict, Optional
+from app.services.segmentation import (
+    segment_by_similarity,
+    segment_by_minibatch_kmeans,
+    build_segments
+)
+from app.services.tts_service import submit_segments, get_audio_url
+from app.utils.document_index import load_sentences, load_sentence_vectors
+from app.utils.executors import run_io, run_cpu
+from app.utils.embeddings import get_embeddings
+from app.utils.metrics import timed_stage
+from app.config import settings
 
 
 def generate_embeddings(sentences: List[str]) -> List[List[float]]:
-    embedder = OpenAIEmbeddings()
-    return embedder.embed_documents(sentences)
+    return get_embeddings().embed_documents(sentences)
 
 
 def semantic_chunk_sentences(
     sentences: List[str],
     embeddings: List[List[float]],
-    num_clusters: int = 5
+    num_clusters: Optional[int] = None,
+    mode: str = "similarity"
 ) -> List[Dict]:
+    """
+    Group sentences into contiguous, reading-order chunks for read aloud.
 
-    X = np.array(embeddings)
-
-    kmeans = KMeans(
-        n_clusters=num_clusters,
-        random_state=42,
-        n_init="auto"
-    )
-    labels = kmeans.fit_predict(X)
-
-    clusters = {}
-    for sentence, label in zip(sentences, labels):
-        clusters.setdefault(label, []).append(sentence)
-
-    chunks = []
-    for idx, chunk_sentences in clusters.items():
-        chunks.append({
-            "chunk_id": idx,
-            "num_sentences": len(chunk_sentences),
-            "text": " ".join(chunk_sentences)
-        })
+    Args:
+        sentences: Sentences in document order
+        embeddings: One embedding per sentence
+        num_clusters: Target number of chunks (None = choose automatically)
+        mode: "similarity" (adjacent-sentence boundaries, linear time) or
+              "minibatch" (MiniBatchKMeans topic labels, for large inputs)
+    """
+    if mode == "minibatch":
+        starts = segment_by_minibatch_kmeans(embeddings, num_segments=num_clusters)
+    else:
+        starts = segment_by_similarity(embeddings, num_segments=num_clusters)
+
+    return build_segments(sentences, starts)
+
+
+def segment_document(
+    document_id: str,
+    num_clusters: Optional[int] = None,
+    mode: str = "similarity"
+) -> Optional[List[Dict]]:
+    """
+    Segment an indexed document using its stored chunk vectors.
+
+    Only reads index files, so it is safe to run in a worker process.
+    Returns None if the document has fewer than 5 sentences.
+    """
+    sentences = load_sentences(document_id)
+    if len(sentences) < 5:
+        return None
+    embeddings = load_sentence_vectors(document_id)
+    return semantic_chunk_sentences(sentences, embeddings, num_clusters=num_clusters, mode=mode)
+
+
+@timed_stage("read_aloud_embed")
+async def agenerate_embeddings(sentences: List[str]) -> List[List[float]]:
+    """Embed sentences on the IO pool (network call)."""
+    return await run_io(generate_embeddings, sentences)
+
+
+@timed_stage("read_aloud_segment")
+async def asemantic_chunk_sentences(
+    sentences: List[str],
+    embeddings,
+    num_clusters: Optional[int] = None,
+    mode: str = "similarity"
+) -> List[Dict]:
+    """Run segmentation in the process pool."""
+    return await run_cpu(semantic_chunk_sentences, sentences, embeddings, num_clusters, mode)
+
+
+@timed_stage("read_aloud_segment")
+async def asegment_document(
+    document_id: str,
+    num_clusters: Optional[int] = None,
+    mode: str = "similarity"
+) -> Optional[List[Dict]]:
+    """Run document segmentation in the process pool."""
+    return await run_cpu(segment_document, document_id, num_clusters, mode)
+
+
+@timed_stage("read_aloud_audio")
+async def attach_audio(chunks: List[Dict], voice: Optional[str] = None) -> List[Dict]:
+    """
+    Queue speech synthesis for every chunk and add audio URLs.
+
+    Cached segments are never re-synthesized. Waits (up to
+    TTS_FIRST_SEGMENT_TIMEOUT) for the first segment only, so playback can
+    start while the rest render in the background.
+    """
+    jobs = submit_segments([chunk["text"] for chunk in chunks], voice)
+
+    if jobs and jobs[0]["future"] is not None:
+        try:
+            # shield: a timeout must not cancel the job itself, it keeps rendering
+            await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(jobs[0]["future"])),
+                timeout=settings.TTS_FIRST_SEGMENT_TIMEOUT
+            )
+            jobs[0]["status"] = "ready"
+        except asyncio.TimeoutError:
+            pass
+        except Exception as e:
+            # Still return the text; the segment reports "failed" when polled
+            print(f"⚠️ First audio segment failed: {str(e)}")
+            jobs[0]["status"] = "failed"
+
+    for chunk, job in zip(chunks, jobs):
+        chunk["audio_url"] = get_audio_url(job["audio_id"])
+        chunk["audio_status"] = job["status"]
 
     return chunks
@@ -0,0 +1,229 @@
+# Order-preserving semantic segmentation of sentence sequences
+from typing import List, Optional
+import numpy as np
+
+DEFAULT_MIN_SEGMENT_SENTENCES = 3
+DEFAULT_MAX_SEGMENT_SENTENCES = 40
+SMOOTHING_WINDOW = 2  # sentences on each side when smoothing similarities
+DEPTH_WINDOW = 6  # sentences on each side when measuring a dip's depth
+
+
+def normalize_rows(embeddings) -> np.ndarray:
+    """Return a float32 copy of the embeddings with unit-length rows."""
+    X = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return X / norms
+
+
+def adjacent_similarities(X: np.ndarray) -> np.ndarray:
+    """Cosine similarity between each sentence and the next (X must be normalized)."""
+    if len(X) < 2:
+        return np.zeros(0, dtype=np.float32)
+    return np.einsum("ij,ij->i", X[:-1], X[1:])
+
+
+def _smooth(values: np.ndarray, window: int) -> np.ndarray:
+    """Centered moving average with edge padding."""
+    if window <= 0 or len(values) == 0:
+        return values
+    padded = np.pad(values, window, mode="edge")
+    kernel = np.ones(2 * window + 1, dtype=np.float32) / (2 * window + 1)
+    return np.convolve(padded, kernel, mode="valid")
+
+
+def _window_max(values: np.ndarray, window: int, side: str) -> np.ndarray:
+    """Max over the `window` values to the left (inclusive) or right (inclusive) of each index."""
+    padded = np.pad(values, (window, 0) if side == "left" else (0, window), mode="edge")
+    views = np.lib.stride_tricks.sliding_window_view(padded, window + 1)
+    return views.max(axis=1)
+
+
+def depth_scores(similarities: np.ndarray) -> np.ndarray:
+    """
+    TextTiling-style depth of every gap between sentences.
+
+    A gap is a strong boundary when similarity drops there relative to the
+    highest (smoothed) similarity nearby on both sides. Runs in
+    O(n * DEPTH_WINDOW).
+    """
+    if len(similarities) == 0:
+        return similarities
+    smoothed = _smooth(similarities, SMOOTHING_WINDOW)
+    left = _window_max(smoothed, DEPTH_WINDOW, "left")
+    right = _window_max(smoothed, DEPTH_WINDOW, "right")
+    return (left - similarities) + (right - similarities)
+
+
+def select_boundaries(
+    scores: np.ndarray,
+    candidates: np.ndarray,
+    num_sentences: int,
+    num_segments: Optional[int],
+    min_segment_sentences: int
+) -> List[int]:
+    """
+    Pick boundary gaps from candidates, strongest first.
+
+    Gap i separates sentence i from sentence i + 1. A candidate is skipped
+    when it would create a segment shorter than min_segment_sentences.
+    """
+    order = candidates[np.argsort(-scores[candidates], kind="stable")]
+    limit = num_segments - 1 if num_segments else len(order)
+
+    # accepted[k] marks that sentence k begins a segment; spacing is checked
+    # against the nearest accepted boundary on each side
+    accepted = np.zeros(num_sentences + 1, dtype=bool)
+    accepted[0] = accepted[num_sentences] = True
+    chosen = []
+
+    for gap in order:
+        if len(chosen) >= limit:
+            break
+        start = int(gap) + 1
+        lo = max(0, start - min_segment_sentences + 1)
+        hi = min(num_sentences, start + min_segment_sentences - 1)
+        if accepted[lo:hi + 1].any():
+            continue
+        accepted[start] = True
+        chosen.append(start)
+
+    return sorted(chosen)
+
+
+def _split_long_segments(
+    starts: List[int],
+    similarities: np.ndarray,
+    num_sentences: int,
+    min_segment_sentences: int,
+    max_segment_sentences: int
+) -> List[int]:
+    """Split any segment longer than max_segment_sentences at its weakest internal gap."""
+    bounds = [0] + starts + [num_sentences]
+    result = []
+    stack = [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)][::-1]
+
+    while stack:
+        start, end = stack.pop()
+        if end - start <= max_segment_sentences:
+            result.append(start)
+            continue
+        lo = start + min_segment_sentences - 1
+        hi = end - min_segment_sentences - 1
+        if hi < lo:
+            result.append(start)
+            continue
+        gap = lo + int(np.argmin(similarities[lo:hi + 1]))
+        stack.append((gap + 1, end))
+        stack.append((start, gap + 1))
+
+    return [s for s in result if s > 0]
+
+
+def segment_by_similarity(
+    embeddings,
+    num_segments: Optional[int] = None,
+    min_segment_sentences: int = DEFAULT_MIN_SEGMENT_SENTENCES,
+    max_segment_sentences: int = DEFAULT_MAX_SEGMENT_SENTENCES
+) -> List[int]:
+    """
+    Find contiguous topic segments from adjacent-sentence similarity.
+
+    Returns the sentence indices where a new segment begins (excluding 0).
+    With num_segments=None the count is chosen automatically: every local
+    dip whose depth exceeds the mean plus one standard deviation of all dip
+    depths becomes a boundary.
+    """
+    X = normalize_rows(embeddings)
+    n = len(X)
+    if n <= min_segment_sentences:
+        return []
+
+    similarities = adjacent_similarities(X)
+    depths = depth_scores(similarities)
+
+    # Local maxima of depth are the candidate boundaries
+    left = np.concatenate(([-np.inf], depths[:-1]))
+    right = np.concatenate((depths[1:], [-np.inf]))
+    candidates = np.flatnonzero((depths >= left) & (depths >= right) & (depths > 0))
+
+    if num_segments is None:
+        valley_depths = depths[candidates]
+        cutoff = valley_depths.mean() + valley_depths.std() if len(candidates) else 0.0
+        candidates = candidates[depths[candidates] > cutoff]
+
+    starts = select_boundaries(depths, candidates, n, num_segments, min_segment_sentences)
+
+    if num_segments is None:
+        starts = _split_long_segments(
+            starts, similarities, n, min_segment_sentences, max_segment_sentences
+        )
+
+    return starts
+
+
+def auto_cluster_count(num_sentences: int) -> int:
+    """Heuristic cluster count for MiniBatchKMeans segmentation."""
+    return int(min(64, max(2, round(np.sqrt(num_sentences / 2)))))
+
+
+def _majority_filter(labels: np.ndarray, n_clusters: int, window: int) -> np.ndarray:
+    """Replace each label by the most common label within `window` on each side."""
+    one_hot = np.zeros((len(labels) + 1, n_clusters), dtype=np.int32)
+    one_hot[np.arange(1, len(labels) + 1), labels] = 1
+    counts = np.cumsum(one_hot, axis=0)
+    idx = np.arange(len(labels))
+    lo = np.maximum(idx - window, 0)
+    hi = np.minimum(idx + window + 1, len(labels))
+    return np.argmax(counts[hi] - counts[lo], axis=1)
+
+
+def segment_by_minibatch_kmeans(
+    embeddings,
+    num_segments: Optional[int] = None,
+    min_segment_sentences: int = DEFAULT_MIN_SEGMENT_SENTENCES,
+    random_state: int = 42
+) -> List[int]:
+    """
+    Segment using MiniBatchKMeans topic labels, kept in reading order.
+
+    Sentences are clustered into topics, labels are smoothed with a
+    majority filter, and boundaries are placed where the smoothed label
+    changes between neighbours (deepest similarity dips first).
+    """
+    from sklearn.cluster import MiniBatchKMeans
+
+    X = normalize_rows(embeddings)
+    n = len(X)
+    if n <= min_segment_sentences:
+        return []
+
+    n_clusters = min(n, num_segments or auto_cluster_count(n))
+    labels = MiniBatchKMeans(
+        n_clusters=n_clusters,
+        random_state=random_state,
+        batch_size=1024,
+        n_init=1
+    ).fit_predict(X)
+    labels = _majority_filter(labels, n_clusters, min_segment_sentences)
+
+    depths = depth_scores(adjacent_similarities(X))
+    candidates = np.flatnonzero(labels[:-1] != labels[1:])
+
+    return select_boundaries(depths, candidates, n, num_segments, min_segment_sentences)
+
+
+def build_segments(sentences: List[str], starts: List[int]) -> List[dict]:
+    """Turn segment start indices into ordered read-aloud chunks."""
+    bounds = [0] + list(starts) + [len(sentences)]
+    chunks = []
+    for chunk_id in range(len(bounds) - 1):
+        start, end = bounds[chunk_id], bounds[chunk_id + 1]
+        chunks.append({
+            "chunk_id": chunk_id,
+            "num_sentences": end - start,
+            "text": " ".join(sentences[start:end]),
+            "start_sentence": start,
+            "end_sentence": end
+        })
+    return chunks
@@ -1,11 +1,12 @@
 # OPTIMIZED Summarization - 2-3x Faster
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from app.services.llm_service import get_llm
-from app.utils.vector_store import get_document_by_id
-from app.utils.helpers import chunk_text
-from typing import Optional
+from app.config import settings
+from app.utils.async_vector_store import aget_document_by_id
+from app.utils.helpers import chunk_text, describe_page_range
+from app.utils.metrics import timed_stage
+from typing import AsyncIterator, List, Optional, Tuple
 import asyncio
+import time
 
 
 def get_summary_prompt(summary_type: str) -> str:
@@ -50,11 +51,21 @@ Comprehensive Explanatory Summary:"""
     return prompts.get(summary_type, prompts["explanatory"])
 
 
+async def _invoke(chain, inputs: dict, limit: Optional[asyncio.Semaphore] = None) -> str:
+    """Run a chain, inside a shared concurrency budget when one is given."""
+    if limit is None:
+        return await chain.ainvoke(inputs)
+    async with limit:
+        return await chain.ainvoke(inputs)
+
+
 # 🚀 OPTIMIZATION 1: Larger chunks = Fewer API calls
+@timed_stage("summarize_map_reduce")
 async def summarize_long_document_map_reduce(
     text: str, 
     summary_type: str, 
-    max_length: int
+    max_length: int,
+    limit: Optional[asyncio.Semaphore] = None
 ) -> str:
     """
     OPTIMIZED map-reduce with:
@@ -62,6 +73,9 @@ async def summarize_long_document_map_reduce(
     - GPT-3.5 for chunk summaries (faster)
     - GPT-4 only for final summary (quality)
     - True parallel processing
+    
+    With a shared limit (course packs), all chunks are submitted at once
+    and the limit paces the LLM calls instead of fixed batches.
     """
     
     # 🚀 OPTIMIZATION: Use larger chunks (20k instead of 10k)
@@ -71,7 +85,7 @@ async def summarize_long_document_map_reduce(
     print(f"🚀 OPTIMIZED: Split into {len(chunks)} chunks (was 37, now ~{len(chunks)})")
     
     if len(chunks) <= 1:
-        return await summarize_single_chunk(text, summary_type, max_length)
+        return await summarize_single_chunk(text, summary_type, max_length, limit)
     
     # 🚀 OPTIMIZATION: Always use GPT-3.5 for chunk summaries (MUCH faster)
     chunk_llm = get_llm(model="gpt-3.5-turbo", temperature=0.3)
@@ -79,6 +93,9 @@ async def summarize_long_document_map_reduce(
     # Adjust chunk summary length
     chunk_summary_length = min(400, max_length // len(chunks))
     
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+    
     chunk_prompt = ChatPromptTemplate.from_template(
         """Summarize this section briefly and clearly:
 
@@ -92,7 +109,7 @@ Create a focused summary (~{chunk_length} words) of main points:"""
     print(f"⚡ Processing {len(chunks)} chunks in parallel with GPT-3.5...")
     
     # 🚀 OPTIMIZATION: Process in batches to avoid rate limits
-    batch_size = 10  # Process 10 at a time
+    batch_size = len(chunks) if limit else 10  # Process 10 at a time
     all_summaries = []
     
     for i in range(0, len(chunks), batch_size):
@@ -100,10 +117,10 @@ Create a focused summary (~{chunk_length} words) of main points:"""
         print(f"  📦 Batch {i//batch_size + 1}/{(len(chunks)-1)//batch_size + 1}")
         
         batch_summaries = await asyncio.gather(*[
-            chunk_chain.ainvoke({
+            _invoke(chunk_chain, {
                 "chunk": chunk,
                 "chunk_length": chunk_summary_length
-            })
+            }, limit)
             for chunk in batch
         ])
         
@@ -123,19 +140,21 @@ Create a focused summary (~{chunk_length} words) of main points:"""
     final_prompt = ChatPromptTemplate.from_template(final_prompt_template)
     final_chain = final_prompt | final_llm | StrOutputParser()
     
-    final_summary = await final_chain.ainvoke({
+    final_summary = await _invoke(final_chain, {
         "text": combined_text,
         "max_length": max_length
-    })
+    }, limit)
     
     return final_summary
 
 
 # 🚀 OPTIMIZATION 2: Faster refine strategy
+@timed_stage("summarize_refine")
 async def summarize_long_document_refine(
     text: str,
     summary_type: str,
-    max_length: int
+    max_length: int,
+    limit: Optional[asyncio.Semaphore] = None
 ) -> str:
     """
     OPTIMIZED refine with larger chunks and GPT-3.5.
@@ -145,7 +164,7 @@ async def summarize_long_document_refine(
     chunks = chunk_text(text, chunk_size=20000, overlap=1000)
     
     if len(chunks) <= 1:
-        return await summarize_single_chunk(text, summary_type, max_length)
+        return await summarize_single_chunk(text, summary_type, max_length, limit)
     
     print(f"🚀 OPTIMIZED Refine: {len(chunks)} chunks")
     
@@ -155,16 +174,19 @@ async def summarize_long_document_refine(
     
     print(f"⚡ Using {model} for refine strategy")
     
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+    
     # Initial summary from first chunk
     initial_prompt = ChatPromptTemplate.from_template(
         get_summary_prompt(summary_type)
     )
     initial_chain = initial_prompt | llm | StrOutputParser()
     
-    current_summary = await initial_chain.ainvoke({
+    current_summary = await _invoke(initial_chain, {
         "text": chunks[0],
         "max_length": max_length // 2
-    })
+    }, limit)
     
     # Refine with subsequent chunks
     refine_template = """You are refining an existing summary with new information.
@@ -184,17 +206,23 @@ Refined Summary:"""
     
     for i, chunk in enumerate(chunks[1:], 1):
         print(f"  🔄 Refining with chunk {i+1}/{len(chunks)}")
-        current_summary = await refine_chain.ainvoke({
+        current_summary = await _invoke(refine_chain, {
             "current_summary": current_summary,
             "new_content": chunk,
             "summary_type": summary_type,
             "max_length": max_length
-        })
+        }, limit)
     
     return current_summary
 
 
-async def summarize_single_chunk(text: str, summary_type: str, max_length: int) -> str:
+@timed_stage("summarize_direct")
+async def summarize_single_chunk(
+    text: str,
+    summary_type: str,
+    max_length: int,
+    limit: Optional[asyncio.Semaphore] = None
+) -> str:
     """Summarize text that fits in single prompt."""
     # 🚀 ULTRA-FAST: Always use GPT-3.5
     model = "gpt-3.5-turbo"
@@ -203,25 +231,35 @@ async def summarize_single_chunk(text: str, summary_type: str, max_length: int)
     print(f"⚡ Direct summarization with {model}")
     
     prompt_template = get_summary_prompt(summary_type)
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+    
     prompt = ChatPromptTemplate.from_template(prompt_template)
     chain = prompt | llm | StrOutputParser()
     
-    return await chain.ainvoke({
+    return await _invoke(chain, {
         "text": text[:100000],
         "max_length": max_length
-    })
+    }, limit)
 
 
+@timed_stage("summarize")
 async def summarize_text(
     text: Optional[str] = None,
     document_id: Optional[str] = None,
     max_length: int = 500,
     summary_type: str = "learning",
-    strategy: str = "auto"
+    strategy: str = "auto",
+    pages: Optional[Tuple[int, int]] = None,
+    limit: Optional[asyncio.Semaphore] = None
 ) -> dict:
     """
     ULTRA-FAST Summarization with complete context support.
     
+    pages=(first, last) summarizes only that page range of a stored document.
+    limit is a concurrency budget for the LLM calls, shared with other
+    summaries running at the same time (course packs).
+    
     PERFORMANCE IMPROVEMENTS:
     - 20k char chunks (instead of 10k) = 50% fewer API calls
     - GPT-3.5 Turbo for EVERYTHING = Maximum speed (10x faster than GPT-4)
@@ -232,18 +270,17 @@ async def summarize_text(
     Quality: Excellent (GPT-3.5 is very good for summaries)
     """
     try:
-        import time
         start_time = time.time()
         
         source_filename = None
         
         # Get text from vector store if document_id provided
         if document_id and not text:
-            document = get_document_by_id(document_id)
+            document = await aget_document_by_id(document_id, pages)
             
             if not document:
                 return {
-                    "summary": "Error: Document not found",
+                    "summary": f"Error: No text found in {describe_page_range(pages)} of the document" if pages else "Error: Document not found",
                     "summary_type": summary_type,
                     "source": None,
                     "processing_info": None
@@ -284,13 +321,13 @@ async def summarize_text(
         
         # Route to appropriate summarization method
         if strategy == "direct":
-            summary = await summarize_single_chunk(text, summary_type, max_length)
+            summary = await summarize_single_chunk(text, summary_type, max_length, limit)
             chunks_processed = 1
         elif strategy == "refine":
-            summary = await summarize_long_document_refine(text, summary_type, max_length)
+            summary = await summarize_long_document_refine(text, summary_type, max_length, limit)
             chunks_processed = (char_count // 20000) + 1
         else:  # map-reduce
-            summary = await summarize_long_document_map_reduce(text, summary_type, max_length)
+            summary = await summarize_long_document_map_reduce(text, summary_type, max_length, limit)
             chunks_processed = (char_count // 20000) + 1
         
         elapsed_time = time.time() - start_time
@@ -318,4 +355,117 @@ async def summarize_text(
             "summary_type": summary_type,
             "source": None,
             "processing_info": None
-        }
\ No newline at end of file
+        }
+
+
+async def _summarize_pack_document(
+    document_id: str,
+    summary_type: str,
+    max_length: int,
+    limit: asyncio.Semaphore
+) -> dict:
+    """Map stage of a course pack: one document, with the strategy summarize_text picks for its size."""
+    result = await summarize_text(
+        document_id=document_id,
+        max_length=max_length,
+        summary_type=summary_type,
+        limit=limit
+    )
+    failed = result["summary"].startswith("Error")
+    return {
+        "document_id": document_id,
+        "source": result["source"],
+        "status": "failed" if failed else "done",
+        "summary": None if failed else result["summary"],
+        "error": result["summary"] if failed else None,
+        "processing_info": result["processing_info"]
+    }
+
+
+async def summarize_course_pack_events(
+    document_ids: List[str],
+    max_length: int = 800,
+    document_max_length: int = 300,
+    summary_type: str = "explanatory"
+) -> AsyncIterator[dict]:
+    """
+    Summarize several documents into one course-pack summary, reporting progress.
+    
+    Every document is summarized concurrently (its own direct / refine /
+    map-reduce strategy), all sharing one budget of SUMMARY_CONCURRENCY
+    LLM calls in flight, so the pack takes about as long as its largest
+    document. The document summaries are then combined by a cross-document
+    reduce.
+    
+    Yields:
+        {"event": "started"}, one {"event": "document"} per document as it
+        finishes (done or failed), {"event": "reduce"}, then
+        {"event": "summary"} with the result (summary None if no document
+        could be summarized)
+    """
+    start_time = time.time()
+    limit = asyncio.Semaphore(max(1, settings.SUMMARY_CONCURRENCY))
+    total = len(document_ids)
+    yield {"event": "started", "total": total, "document_ids": document_ids}
+    print(f"📚 Summarizing course pack of {total} documents")
+    
+    tasks = [
+        asyncio.create_task(_summarize_pack_document(document_id, summary_type, document_max_length, limit))
+        for document_id in document_ids
+    ]
+    documents = {}
+    try:
+        for completed, task in enumerate(asyncio.as_completed(tasks), 1):
+            result = await task
+            documents[result["document_id"]] = result
+            print(f"  📄 {completed}/{total} {result['source'] or result['document_id']}: {result['status']}")
+            yield {"event": "document", "completed": completed, "total": total, **result}
+    finally:
+        # Client went away (streaming): stop the remaining map stages
+        for task in tasks:
+            task.cancel()
+    
+    ordered = [documents[document_id] for document_id in document_ids]
+    summarized = [document for document in ordered if document["status"] == "done"]
+    summary, error = None, None
+    
+    if len(summarized) == 1:
+        summary = summarized[0]["summary"]
+    elif summarized:
+        yield {"event": "reduce", "documents": len(summarized)}
+        combined = "\n\n".join(
+            f"Document: {document['source'] or document['document_id']}\n{document['summary']}"
+            for document in summarized
+        )
+        result = await summarize_text(text=combined, max_length=max_length, summary_type=summary_type, limit=limit)
+        if result["summary"].startswith("Error"):
+            error = result["summary"]
+        else:
+            summary = result["summary"]
+    else:
+        error = "Error: None of the documents could be summarized"
+    
+    elapsed_time = time.time() - start_time
+    print(f"✅ Course pack COMPLETED in {elapsed_time:.2f} seconds")
+    yield {
+        "event": "summary",
+        "summary": summary,
+        "error": error,
+        "summary_type": summary_type,
+        "documents": ordered,
+        "processing_time_seconds": round(elapsed_time, 2)
+    }
+
+
+@timed_stage("summarize_course_pack")
+async def summarize_course_pack(
+    document_ids: List[str],
+    max_length: int = 800,
+    document_max_length: int = 300,
+    summary_type: str = "explanatory"
+) -> dict:
+    """summarize_course_pack_events without the progress events: the final result."""
+    result = None
+    async for event in summarize_course_pack_events(document_ids, max_length, document_max_length, summary_type):
+        result = event
+    return result
@@ -0,0 +1,242 @@
+# Text-to-speech pipeline with a content-addressed audio cache
+import abc
+import hashlib
+import io
+import math
+import os
+import re
+import struct
+import threading
+import wave
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+from app.config import settings
+from app.utils.metrics import gauge, record_cache, register_collector
+
+AUDIO_ID_PATTERN = re.compile(r"^[0-9a-f]{64}\.(mp3|wav)$")
+CONTENT_TYPES = {"mp3": "audio/mpeg", "wav": "audio/wav"}
+
+
+class TTSEngine(abc.ABC):
+    """Base class for speech engines. Subclasses implement synthesize()."""
+
+    name = "base"
+    file_extension = "wav"
+    max_input_chars = 4000
+
+    @abc.abstractmethod
+    def synthesize(self, text: str, voice: str) -> bytes:
+        """Render text to audio bytes in file_extension's format."""
+
+
+class OpenAITTSEngine(TTSEngine):
+    """OpenAI speech API. Long segments are sent in sentence-aligned pieces."""
+
+    name = "openai"
+    file_extension = "mp3"
+
+    def __init__(self):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL or None)
+        self.model = settings.TTS_MODEL
+
+    def synthesize(self, text: str, voice: str) -> bytes:
+        audio = b""
+        for piece in split_for_tts(text, self.max_input_chars):
+            response = self.client.audio.speech.create(
+                model=self.model,
+                voice=voice,
+                input=piece,
+                response_format="mp3"
+            )
+            # MP3 frames can be concatenated directly
+            audio += response.content
+        return audio
+
+
+class OfflineTTSEngine(TTSEngine):
+    """
+    Deterministic stand-in engine for tests and offline runs.
+
+    Produces a 16 kHz mono WAV tone whose length follows the word count,
+    so cache and streaming behaviour can be exercised without a network.
+    """
+
+    name = "offline"
+    file_extension = "wav"
+    sample_rate = 16000
+    seconds_per_word = 0.05
+
+    def synthesize(self, text: str, voice: str) -> bytes:
+        num_samples = int(self.sample_rate * self.seconds_per_word * max(1, len(text.split())))
+        seed = int(hashlib.sha256(f"{voice}|{text}".encode("utf-8")).hexdigest()[:4], 16)
+        frequency = 220 + seed % 440
+        step = 2 * math.pi * frequency / self.sample_rate
+        frames = struct.pack(
+            f"<{num_samples}h",
+            *(int(8000 * math.sin(step * i)) for i in range(num_samples))
+        )
+
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(frames)
+        return buffer.getvalue()
+
+
+TTS_ENGINES = {
+    "openai": OpenAITTSEngine,
+    "offline": OfflineTTSEngine,
+}
+
+_engine = None
+_executor = None
+_pending: Dict[str, Future] = {}
+_lock = threading.Lock()
+_engine_lock = threading.Lock()
+
+TTS_PENDING = gauge("scholarnet_tts_pending_segments", "Audio segments queued or rendering")
+
+
+def _collect_pending():
+    with _lock:
+        TTS_PENDING.set(sum(1 for future in _pending.values() if not future.done()))
+
+
+register_collector(_collect_pending)
+
+
+def get_tts_engine() -> TTSEngine:
+    """Get or create the engine selected by settings.TTS_ENGINE."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            # Re-check: another worker thread may have built it meanwhile
+            if _engine is None:
+                engine_class = TTS_ENGINES.get(settings.TTS_ENGINE)
+                if engine_class is None:
+                    raise ValueError(f"Unknown TTS engine: {settings.TTS_ENGINE}")
+                _engine = engine_class()
+    return _engine
+
+
+def get_tts_executor() -> ThreadPoolExecutor:
+    """Worker pool that renders segments in submission order."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.TTS_WORKERS,
+            thread_name_prefix="tts"
+        )
+    return _executor
+
+
+def split_for_tts(text: str, max_chars: int) -> List[str]:
+    """Split text into pieces of at most max_chars, preferring sentence ends."""
+    pieces = []
+    current = ""
+    for sentence in re.split(r'(?<=[.!?])\s+', text):
+        while len(sentence) > max_chars:
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def get_audio_id(text: str, voice: str, engine: Optional[TTSEngine] = None) -> str:
+    """Content hash identifying the audio for (engine, voice, text)."""
+    engine = engine or get_tts_engine()
+    key = hashlib.sha256(f"{engine.name}|{voice}|{text}".encode("utf-8")).hexdigest()
+    return f"{key}.{engine.file_extension}"
+
+
+def get_audio_path(audio_id: str) -> str:
+    """On-disk location of a cached audio file (sharded by hash prefix)."""
+    return os.path.join(settings.AUDIO_CACHE_DIR, audio_id[:2], audio_id)
+
+
+def is_audio_cached(audio_id: str) -> bool:
+    return os.path.exists(get_audio_path(audio_id))
+
+
+def _render_segment(engine: TTSEngine, audio_id: str, text: str, voice: str) -> str:
+    """Synthesize one segment and write it atomically into the cache."""
+    path = get_audio_path(audio_id)
+    if not os.path.exists(path):
+        audio = engine.synthesize(text, voice)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+
+    # Failed renders stay in _pending so their status can be reported
+    with _lock:
+        _pending.pop(audio_id, None)
+    return path
+
+
+def _failed(future: Future) -> bool:
+    """Done with an error, or cancelled (exception() would raise CancelledError)."""
+    return future.done() and (future.cancelled() or future.exception() is not None)
+
+
+def submit_segment(text: str, voice: Optional[str] = None) -> dict:
+    """
+    Queue a segment for synthesis unless it is cached or already queued.
+
+    Returns:
+        Dict with audio_id, status ("ready" or "pending") and the future
+        (None when the audio is already cached)
+    """
+    engine = get_tts_engine()
+    voice = voice or settings.TTS_VOICE
+    audio_id = get_audio_id(text, voice, engine)
+
+    cached = is_audio_cached(audio_id)
+    record_cache("tts_audio", cached)
+    if cached:
+        return {"audio_id": audio_id, "status": "ready", "future": None}
+
+    with _lock:
+        future = _pending.get(audio_id)
+        if future is None or _failed(future):
+            future = get_tts_executor().submit(_render_segment, engine, audio_id, text, voice)
+            _pending[audio_id] = future
+
+    return {"audio_id": audio_id, "status": "pending", "future": future}
+
+
+def submit_segments(texts: List[str], voice: Optional[str] = None) -> List[dict]:
+    """Queue segments in reading order so the first one is rendered first."""
+    return [submit_segment(text, voice) for text in texts]
+
+
+def get_audio_status(audio_id: str) -> str:
+    """One of "ready", "pending", "failed" or "missing"."""
+    if is_audio_cached(audio_id):
+        return "ready"
+    with _lock:
+        future = _pending.get(audio_id)
+    if future is None:
+        return "missing"
+    if _failed(future):
+        return "failed"
+    return "pending"
+
+
+def get_audio_url(audio_id: str) -> str:
+    return f"/api/read-aloud/audio/{audio_id}"
+
+
+def get_audio_content_type(audio_id: str) -> str:
+    return CONTENT_TYPES.get(audio_id.rsplit(".", 1)[-1], "application/octet-stream")
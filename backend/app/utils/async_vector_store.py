@@ -0,0 +1,83 @@
+# Async facade over vector_store.py (blocking Chroma + embedding calls run on the IO pool)
+from typing import Optional, Tuple
+from app.utils import vector_store
+from app.utils.hybrid_retriever import hybrid_search, hybrid_search_batch
+from app.utils.executors import run_io
+
+
+async def aadd_documents_to_store(
+    texts: list,
+    metadatas: list = None,
+    document_id: str = None,
+    tenant_id: str = None
+) -> bool:
+    return await run_io(vector_store.add_documents_to_store, texts, metadatas, document_id, tenant_id)
+
+
+async def arevise_document(document_id: str, texts: list, metadatas: list) -> Optional[dict]:
+    return await run_io(vector_store.revise_document, document_id, texts, metadatas)
+
+
+async def adocument_exists(document_id: str) -> bool:
+    return await run_io(vector_store.document_exists, document_id)
+
+
+async def aget_document_by_id(document_id: str, pages: Optional[Tuple[int, int]] = None) -> Optional[dict]:
+    return await run_io(vector_store.get_document_by_id, document_id, pages)
+
+
+async def aget_document_chunks(
+    document_id: str,
+    include_embeddings: bool = False,
+    pages: Optional[Tuple[int, int]] = None
+) -> Optional[dict]:
+    return await run_io(vector_store.get_document_chunks, document_id, include_embeddings, pages)
+
+
+async def alist_all_documents(tenant_id: str = None) -> list:
+    return await run_io(vector_store.list_all_documents, tenant_id)
+
+
+async def asearch_documents(
+    query: str,
+    k: int = 3,
+    document_id: str = None,
+    pages: Optional[Tuple[int, int]] = None
+) -> list:
+    return await run_io(vector_store.search_documents, query, k, document_id, pages)
+
+
+async def ahybrid_search(
+    query: str,
+    k: int = 3,
+    document_id: str = None,
+    mode: str = "auto",
+    pages: Optional[Tuple[int, int]] = None
+) -> list:
+    return await run_io(hybrid_search, query, k, document_id, mode, pages)
+
+
+async def ahybrid_search_batch(
+    queries: list,
+    k: int = 3,
+    document_id: Optional[str] = None,
+    mode: str = "auto",
+    pages: Optional[Tuple[int, int]] = None
+) -> list:
+    return await run_io(hybrid_search_batch, queries, k, document_id, mode, pages)
+
+
+async def adelete_document_by_id(document_id: str) -> bool:
+    return await run_io(vector_store.delete_document_by_id, document_id)
+
+
+async def adelete_documents(document_ids: list) -> list:
+    return await run_io(vector_store.delete_documents, document_ids)
+
+
+async def adelete_tenant_documents(tenant_id: str) -> list:
+    return await run_io(vector_store.delete_tenant_documents, tenant_id)
+
+
+async def aget_collection_stats() -> dict:
+    return await run_io(vector_store.get_collection_stats)
@@ -0,0 +1,200 @@
+# Query-aware context packing: pick the sentences that answer the question within a token budget
+import math
+import re
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from app.config import settings
+from app.utils.helpers import split_sentence_spans
+from app.utils.lexical_index import tokenize
+
+# Context windows of the chat models we call; the packed context never
+# takes more than what is left after the prompt template and the answer.
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+    "gpt-4": 8192,
+}
+RESERVED_TOKENS = 1500  # Template, conversation history and the answer
+GAP_MARKER = " ... "
+
+_encoders = {}
+_encoder_lock = threading.Lock()
+
+
+def get_encoder(model: str):
+    """tiktoken encoder for a model, or None when it cannot be loaded (offline)."""
+    with _encoder_lock:
+        if model not in _encoders:
+            try:
+                import tiktoken
+                try:
+                    _encoders[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    _encoders[model] = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                print(f"⚠️ tiktoken unavailable for {model}, estimating tokens: {e}")
+                _encoders[model] = None
+        return _encoders[model]
+
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    encoder = get_encoder(model)
+    if encoder is None:
+        # Conservative estimate (~3.5 characters per token for English)
+        return math.ceil(len(text) / 3.5)
+    return len(encoder.encode(text))
+
+
+def truncate_tokens(text: str, budget: int, model: str = "gpt-3.5-turbo") -> str:
+    """Longest prefix of text within budget tokens."""
+    encoder = get_encoder(model)
+    if encoder is None:
+        return text[:int(budget * 3.5)]
+    return encoder.decode(encoder.encode(text)[:budget])
+
+
+def get_context_budget(model: str = "gpt-3.5-turbo") -> int:
+    """Token budget for packed context: the configured size, capped by the model window."""
+    window = MODEL_CONTEXT_WINDOWS.get(model, 8192)
+    return max(0, min(settings.QA_CONTEXT_TOKENS, window - RESERVED_TOKENS))
+
+
+def _normalize(sentence: str) -> str:
+    return re.sub(r"\s+", " ", sentence).strip().lower()
+
+
+def split_candidates(chunks: List[str]) -> List[Dict]:
+    """
+    Sentences of the retrieved chunks, without the copies chunk overlap creates.
+
+    Adjacent chunks share CHUNK_OVERLAP characters, so the same sentence
+    shows up twice, and a chunk can start with the tail of a sentence kept
+    from the previous one. Repeated sentences are dropped (set lookup), and
+    so is a chunk's first sentence when it ends a sentence already kept.
+    """
+    candidates = []
+    seen = set()
+
+    for rank, chunk in enumerate(chunks):
+        for position, (start, end) in enumerate(split_sentence_spans(chunk)):
+            sentence = chunk[start:end]
+            normalized = _normalize(sentence)
+            if not normalized or normalized in seen:
+                continue
+            if position == 0 and candidates and any(kept.endswith(normalized) for kept in seen):
+                continue
+            seen.add(normalized)
+            candidates.append({
+                "text": sentence,
+                "chunk": rank,
+                "position": len(candidates)
+            })
+
+    return candidates
+
+
+def score_sentences(query: str, sentences: List[str]) -> np.ndarray:
+    """
+    Lexical relevance of each sentence to the query.
+
+    Query terms are weighted by inverse sentence frequency over the
+    candidates and matches are length-normalized, computed as one
+    (sentences x query terms) presence matrix.
+    """
+    query_terms = sorted(set(tokenize(query)))
+    if not query_terms or not sentences:
+        return np.zeros(len(sentences), dtype=np.float32)
+
+    term_ids = {term: i for i, term in enumerate(query_terms)}
+    presence = np.zeros((len(sentences), len(query_terms)), dtype=np.float32)
+    lengths = np.ones(len(sentences), dtype=np.float32)
+
+    for row, sentence in enumerate(sentences):
+        tokens = tokenize(sentence)
+        lengths[row] = max(len(tokens), 1)
+        for token in tokens:
+            col = term_ids.get(token)
+            if col is not None:
+                presence[row, col] = 1.0
+
+    df = presence.sum(axis=0)
+    idf = np.log(1 + (len(sentences) - df + 0.5) / (df + 0.5))
+    return (presence @ idf) / np.sqrt(lengths)
+
+
+def pack_context(
+    query: str,
+    chunks: List[str],
+    model: str = "gpt-3.5-turbo",
+    budget: Optional[int] = None
+) -> str:
+    """
+    Build the prompt context from retrieved chunks (best first).
+
+    Sentences are scored against the query, with a small bonus for the
+    retrieval rank of their chunk and for neighbouring a relevant sentence
+    (answers often span two sentences). The best sentences are taken until
+    the token budget is full and emitted in document order; gaps between
+    kept runs are marked with an ellipsis and chunks are separated by a
+    blank line.
+
+    Returns:
+        Context string of at most `budget` tokens
+    """
+    budget = get_context_budget(model) if budget is None else budget
+    candidates = split_candidates(chunks)
+    if not candidates or budget <= 0:
+        return ""
+
+    texts = [c["text"] for c in candidates]
+    relevance = score_sentences(query, texts)
+    if relevance.max() > 0:
+        relevance = relevance / relevance.max()
+
+    ranks = np.array([c["chunk"] for c in candidates], dtype=np.float32)
+    same_chunk_prev = np.r_[False, ranks[1:] == ranks[:-1]]
+    same_chunk_next = np.r_[ranks[:-1] == ranks[1:], False]
+    neighbours = np.zeros_like(relevance)
+    neighbours[1:] = np.where(same_chunk_prev[1:], relevance[:-1], 0)
+    neighbours[:-1] = np.maximum(neighbours[:-1], np.where(same_chunk_next[:-1], relevance[1:], 0))
+
+    scores = relevance + 0.3 * neighbours + 0.1 / (1 + ranks)
+    order = np.argsort(-scores, kind="stable")
+
+    separator_tokens = count_tokens(GAP_MARKER, model)
+    selected = []
+    used = 0
+    for i in order:
+        cost = count_tokens(texts[i], model) + separator_tokens
+        if used + cost > budget:
+            continue
+        selected.append(int(i))
+        used += cost
+
+    def assemble(indices: List[int]) -> str:
+        parts = []
+        previous = None
+        for i in sorted(indices):
+            if previous is None:
+                parts.append(texts[i])
+            elif candidates[i]["chunk"] != candidates[previous]["chunk"]:
+                parts.append("\n\n" + texts[i])
+            elif i == previous + 1:
+                parts.append(" " + texts[i])
+            else:
+                parts.append(GAP_MARKER + texts[i])
+            previous = i
+        return "".join(parts)
+
+    # Per-sentence costs are estimates of the joined string; trim to the exact budget
+    context = assemble(selected)
+    while selected and count_tokens(context, model) > budget:
+        selected.pop()
+        context = assemble(selected)
+
+    if not selected:
+        # Not even the best sentence fits (e.g. text without sentence breaks): cut it to the budget
+        return truncate_tokens(texts[int(order[0])], budget, model)
+    return context
@@ -0,0 +1,197 @@
+# Per-document artifacts built once at ingestion (sentence offsets, chunk vectors)
+import os
+import shutil
+from typing import List, Optional
+import numpy as np
+from app.config import settings
+from app.utils.helpers import document_path, is_valid_document_id, split_sentence_spans, reconstruct_text_from_chunks
+from app.utils.vector_store import get_document_chunks
+
+TEXT_FILE = "text.txt"
+SENTENCES_FILE = "sentences.npy"  # (n, 2) int64 byte offsets into text.txt
+SENTENCE_CHUNKS_FILE = "sentence_chunks.npy"  # (n,) int32 chunk index per sentence
+CHUNK_EMBEDDINGS_FILE = "chunk_embeddings.npy"  # (chunks, dim) float32
+
+
+def get_index_dir(document_id: str) -> str:
+    """Directory holding a document's index files (ValueError for an invalid document_id)."""
+    return document_path(settings.DOCUMENT_INDEX_DIR, document_id)
+
+
+def _utf8_offsets(text: str) -> np.ndarray:
+    """
+    Byte offset of every character position in the UTF-8 encoding of text.
+
+    Returns an array of len(text) + 1 entries so that the byte span of
+    text[a:b] is (offsets[a], offsets[b]).
+    """
+    codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    widths = 1 + (codepoints >= 0x80) + (codepoints >= 0x800) + (codepoints >= 0x10000)
+    offsets = np.zeros(len(codepoints) + 1, dtype=np.int64)
+    np.cumsum(widths, out=offsets[1:])
+    return offsets
+
+
+def build_document_index(
+    document_id: str,
+    text: str,
+    chunk_size: int = None,
+    overlap: int = None,
+    chunk_starts: Optional[List[int]] = None
+) -> int:
+    """
+    Segment the document into sentences once and store the results.
+
+    Writes the UTF-8 text, sentence byte offsets and the chunk each
+    sentence belongs to (by its midpoint). Chunk boundaries are the given
+    chunk_starts (page-aligned chunks), else those of chunk_text.
+
+    Returns:
+        Number of sentences indexed
+    """
+    chunk_size = chunk_size or settings.CHUNK_SIZE
+    overlap = settings.CHUNK_OVERLAP if overlap is None else overlap
+    step = chunk_size - overlap
+
+    index_dir = get_index_dir(document_id)
+    os.makedirs(index_dir, exist_ok=True)
+
+    spans = np.asarray(split_sentence_spans(text), dtype=np.int64).reshape(-1, 2)
+
+    midpoints = (spans[:, 0] + spans[:, 1]) // 2
+    if chunk_starts:
+        positions = np.searchsorted(np.asarray(chunk_starts, dtype=np.int64), midpoints, side="right") - 1
+        sentence_chunks = np.maximum(positions, 0).astype(np.int32)
+    else:
+        num_chunks = max(1, -(-len(text) // step))
+        sentence_chunks = np.minimum(midpoints // step, num_chunks - 1).astype(np.int32)
+
+    byte_spans = spans if text.isascii() else _utf8_offsets(text)[spans]
+
+    with open(os.path.join(index_dir, TEXT_FILE), "wb") as f:
+        f.write(text.encode("utf-8"))
+    np.save(os.path.join(index_dir, SENTENCES_FILE), byte_spans)
+    np.save(os.path.join(index_dir, SENTENCE_CHUNKS_FILE), sentence_chunks)
+
+    return len(spans)
+
+
+def save_chunk_embeddings(document_id: str, embeddings) -> None:
+    """Store the document's chunk vectors (ordered by chunk_index) as float32."""
+    index_dir = get_index_dir(document_id)
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(
+        os.path.join(index_dir, CHUNK_EMBEDDINGS_FILE),
+        np.asarray(embeddings, dtype=np.float32)
+    )
+
+
+def has_document_index(document_id: str, with_embeddings: bool = False) -> bool:
+    """Check whether the sentence index (and optionally chunk vectors) exist."""
+    if not is_valid_document_id(document_id):
+        return False
+    index_dir = get_index_dir(document_id)
+    required = [TEXT_FILE, SENTENCES_FILE, SENTENCE_CHUNKS_FILE]
+    if with_embeddings:
+        required.append(CHUNK_EMBEDDINGS_FILE)
+    return all(os.path.exists(os.path.join(index_dir, name)) for name in required)
+
+
+def get_text_path(document_id: str) -> str:
+    """Path of the stored UTF-8 document text."""
+    return os.path.join(get_index_dir(document_id), TEXT_FILE)
+
+
+def get_sentence_count(document_id: str) -> int:
+    """Number of indexed sentences (reads only the .npy header)."""
+    spans = np.load(os.path.join(get_index_dir(document_id), SENTENCES_FILE), mmap_mode="r")
+    return spans.shape[0]
+
+
+def load_sentences(document_id: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+    """Read sentences [start, stop) by slicing the memory-mapped text."""
+    index_dir = get_index_dir(document_id)
+    spans = np.load(os.path.join(index_dir, SENTENCES_FILE), mmap_mode="r")[start:stop]
+    if len(spans) == 0:
+        return []
+
+    data = np.memmap(os.path.join(index_dir, TEXT_FILE), dtype=np.uint8, mode="r")
+    return [
+        data[begin:end].tobytes().decode("utf-8", errors="replace")
+        for begin, end in spans
+    ]
+
+
+def load_sentence_vectors(document_id: str) -> np.ndarray:
+    """
+    One vector per sentence, taken from the stored chunk embeddings.
+
+    The chunk matrix is memory-mapped, so no embedding calls are made and
+    only the rows actually referenced are paged in.
+    """
+    index_dir = get_index_dir(document_id)
+    chunk_vectors = np.load(os.path.join(index_dir, CHUNK_EMBEDDINGS_FILE), mmap_mode="r")
+    sentence_chunks = np.load(os.path.join(index_dir, SENTENCE_CHUNKS_FILE))
+    sentence_chunks = np.minimum(sentence_chunks, len(chunk_vectors) - 1)
+    return chunk_vectors[sentence_chunks]
+
+
+def chunk_starts_of(metadatas: List[dict]) -> Optional[List[int]]:
+    """Character offset of every chunk, or None for chunks stored without one."""
+    starts = [(metadata or {}).get("char_start") for metadata in metadatas]
+    return None if not starts or None in starts else starts
+
+
+def index_document(document_id: str, text: str, chunk_starts: Optional[List[int]] = None) -> int:
+    """
+    Build the full index for a freshly stored (or revised) document.
+
+    Chunk vectors are copied from the vector store, where they were
+    computed during ingestion. Returns the number of sentences indexed.
+    """
+    num_sentences = build_document_index(document_id, text, chunk_starts=chunk_starts)
+
+    chunks = get_document_chunks(document_id, include_embeddings=True)
+    if chunks:
+        save_chunk_embeddings(document_id, chunks["embeddings"])
+
+    return num_sentences
+
+
+def ensure_document_index(document_id: str, with_embeddings: bool = False) -> bool:
+    """
+    Make sure a stored document has its index, building it if missing.
+
+    Documents uploaded before indexing existed are rebuilt from their
+    chunks (and stored vectors) in the vector store; no embedding calls are
+    made. Returns False if the document does not exist.
+    """
+    if not is_valid_document_id(document_id):
+        return False
+    if has_document_index(document_id, with_embeddings=with_embeddings):
+        return True
+
+    chunks = get_document_chunks(document_id, include_embeddings=with_embeddings)
+    if not chunks:
+        return False
+
+    if not has_document_index(document_id):
+        starts = chunk_starts_of(chunks["metadatas"])
+        text = reconstruct_text_from_chunks(chunks["texts"], settings.CHUNK_OVERLAP, starts)
+        build_document_index(document_id, text, chunk_starts=starts)
+
+    if with_embeddings:
+        save_chunk_embeddings(document_id, chunks["embeddings"])
+
+    return True
+
+
+def delete_document_index(document_id: str) -> bool:
+    """Remove a document's index directory."""
+    if not is_valid_document_id(document_id):
+        return False
+    index_dir = get_index_dir(document_id)
+    if os.path.exists(index_dir):
+        shutil.rmtree(index_dir)
+        return True
+    return False
@@ -0,0 +1,201 @@
+# Embedding backends selected via Settings (OpenAI, local ONNX on CPU, deterministic hashing)
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from app.config import settings
+from app.utils.usage_tracker import TrackedEmbeddings
+from app.utils.metrics import record_cache
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic feature-hashing embedder for tests and offline benchmarks.
+
+    Words and word bigrams are hashed (blake2b, stable across processes)
+    into signed buckets and L2-normalized, so texts sharing vocabulary get
+    similar vectors. No model, no network.
+    """
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        tokens = re.findall(r"\w+", text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dimensions] += 1.0 if (value >> 63) else -1.0
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class LocalOnnxEmbeddings(Embeddings):
+    """
+    Sentence-transformer style model exported to ONNX, run on CPU.
+
+    The model directory must contain tokenizer.json and model.onnx (or
+    model_quantized.onnx when quantized=True). Inputs are embedded in
+    batches with mean pooling over the attention mask; recent query
+    vectors are kept in a small LRU cache.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        batch_size: int = 32,
+        num_threads: int = 0,
+        max_length: int = 256,
+        quantized: bool = False,
+        query_cache_size: int = 1024
+    ):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ValueError(
+                f"EMBEDDING_BACKEND=local needs onnxruntime and tokenizers ({e}); "
+                "install them with pip install -r requirements.txt"
+            ) from e
+
+        model_file = "model_quantized.onnx" if quantized else "model.onnx"
+        model_file_path = os.path.join(model_path, model_file)
+        if not os.path.exists(model_file_path):
+            # Some exports keep the graph under onnx/
+            model_file_path = os.path.join(model_path, "onnx", model_file)
+        if not os.path.exists(model_file_path):
+            raise ValueError(f"No {model_file} in EMBEDDING_MODEL_PATH={model_path} (or its onnx/ folder)")
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(
+            model_file_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        self.batch_size = batch_size
+        self.query_cache_size = query_cache_size
+        self._query_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[i:i + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._cache_lock:
+            cached = self._query_cache.get(text)
+            if cached is not None:
+                self._query_cache.move_to_end(text)
+        record_cache("query_embedding", cached is not None)
+        if cached is not None:
+            return cached
+
+        vector = self._embed_batch([text])[0].tolist()
+
+        with self._cache_lock:
+            self._query_cache[text] = vector
+            if len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        return vector
+
+
+def create_embeddings(backend: str = None) -> Embeddings:
+    """Build the embedding backend named in settings.EMBEDDING_BACKEND."""
+    backend = backend or settings.EMBEDDING_BACKEND
+
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(
+            model=settings.DEFAULT_EMBEDDING_MODEL,
+            openai_api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None,
+            # Compatible servers take raw strings; skips tiktoken pre-tokenization
+            check_embedding_ctx_length=not settings.OPENAI_BASE_URL
+        )
+
+    if backend == "local":
+        if not settings.EMBEDDING_MODEL_PATH:
+            raise ValueError("EMBEDDING_MODEL_PATH must be set for the local embedding backend")
+        return LocalOnnxEmbeddings(
+            settings.EMBEDDING_MODEL_PATH,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            num_threads=settings.EMBEDDING_THREADS,
+            quantized=settings.EMBEDDING_QUANTIZED
+        )
+
+    if backend == "hashing":
+        return HashingEmbeddings(settings.EMBEDDING_DIMENSIONS)
+
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+def get_embedding_model_name(backend: str = None) -> str:
+    """Model name used for usage accounting."""
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend == "openai":
+        return settings.DEFAULT_EMBEDDING_MODEL
+    if backend == "local":
+        return f"local:{os.path.basename(os.path.normpath(settings.EMBEDDING_MODEL_PATH))}"
+    return backend
+
+
+def get_embeddings() -> Embeddings:
+    """Get or create the shared embedding backend (wrapped for usage accounting)."""
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                _embeddings = TrackedEmbeddings(
+                    create_embeddings(),
+                    get_embedding_model_name(),
+                    count_tokens=settings.EMBEDDING_BACKEND == "openai"
+                )
+    return _embeddings
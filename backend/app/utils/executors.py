@@ -0,0 +1,226 @@
+# Dedicated executors for blocking work and an event-loop stall monitor
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Optional
+from app.config import settings
+from app.utils.metrics import gauge, register_collector
+
+_io_executor = None
+_cpu_executor = None
+_fanout_executor = None
+_executor_lock = threading.Lock()
+
+EXECUTOR_QUEUE = gauge("scholarnet_executor_queue_size", "Work items waiting for a worker", ("pool",))
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """Thread pool for blocking IO (Chroma, network embeddings, file access)."""
+    global _io_executor
+    if _io_executor is None:
+        with _executor_lock:
+            if _io_executor is None:
+                _io_executor = ThreadPoolExecutor(
+                    max_workers=settings.IO_THREAD_WORKERS,
+                    thread_name_prefix="io"
+                )
+    return _io_executor
+
+
+def get_cpu_executor() -> ProcessPoolExecutor:
+    """Process pool for CPU-bound work (PDF extraction, clustering, segmentation)."""
+    global _cpu_executor
+    if _cpu_executor is None:
+        with _executor_lock:
+            if _cpu_executor is None:
+                # Never fork: a forked child inherits the parent's threads' locks
+                # (IO pool, Chroma, tokenizers) mid-use and can deadlock on them
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _cpu_executor = ProcessPoolExecutor(
+                    max_workers=settings.CPU_PROCESS_WORKERS,
+                    mp_context=multiprocessing.get_context(method)
+                )
+    return _cpu_executor
+
+
+def get_fanout_executor() -> ThreadPoolExecutor:
+    """
+    Thread pool for fanning a query out over vector store partitions.
+
+    Kept separate from the IO pool because fan-out is started from code
+    already running on an IO thread; sharing that pool could deadlock it.
+    """
+    global _fanout_executor
+    if _fanout_executor is None:
+        with _executor_lock:
+            if _fanout_executor is None:
+                _fanout_executor = ThreadPoolExecutor(
+                    max_workers=settings.VECTOR_FANOUT_WORKERS,
+                    thread_name_prefix="fanout"
+                )
+    return _fanout_executor
+
+
+def _collect_queue_sizes():
+    for pool, executor in (("io", _io_executor), ("fanout", _fanout_executor)):
+        EXECUTOR_QUEUE.set(executor._work_queue.qsize() if executor else 0, pool=pool)
+    # Submitted but unfinished (queued or running) process-pool items
+    EXECUTOR_QUEUE.set(len(_cpu_executor._pending_work_items) if _cpu_executor else 0, pool="cpu")
+
+
+register_collector(_collect_queue_sizes)
+
+
+async def run_io(func: Callable, *args, **kwargs):
+    """
+    Run a blocking IO function on the IO thread pool.
+
+    The caller's context variables (e.g. request usage accounting) are
+    carried over to the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_io_executor(),
+        functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+async def run_cpu(func: Callable, *args, **kwargs):
+    """
+    Run a CPU-bound function on the process pool.
+
+    func and its arguments must be picklable (module-level functions).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_cpu_executor(),
+        functools.partial(func, *args, **kwargs)
+    )
+
+
+def shutdown_executors():
+    """Shut down the pools (called on application shutdown)."""
+    global _io_executor, _cpu_executor, _fanout_executor
+    with _executor_lock:
+        if _fanout_executor is not None:
+            _fanout_executor.shutdown(wait=False, cancel_futures=True)
+            _fanout_executor = None
+        if _io_executor is not None:
+            _io_executor.shutdown(wait=False, cancel_futures=True)
+            _io_executor = None
+        if _cpu_executor is not None:
+            _cpu_executor.shutdown(wait=False, cancel_futures=True)
+            _cpu_executor = None
+
+
+class LoopStallMonitor:
+    """
+    Debug helper that reports event-loop stalls above a threshold.
+
+    A heartbeat task measures how late each wakeup is; a watchdog thread
+    captures the loop thread's stack while a stall is in progress so the
+    blocking call can be identified. asyncio debug mode is enabled too,
+    which logs every callback slower than the threshold.
+    """
+
+    def __init__(self, threshold_ms: float, interval_ms: float = 50, history: int = 100):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.stalls = deque(maxlen=history)
+        self.total_stalls = 0
+        self.max_stall_ms = 0.0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id = None
+        self._stall_stack = None
+        self._task = None
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        loop.set_debug(True)
+        loop.slow_callback_duration = self.threshold
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-stall-watchdog", daemon=True)
+        self._watchdog.start()
+        print(f"🐢 Loop stall monitor enabled (threshold {self.threshold * 1000:.0f} ms)")
+
+    def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag = now - expected
+            if lag >= self.threshold:
+                self._record(lag)
+
+    def _watch(self):
+        # Grab the loop thread's stack once per stall, while it is still blocked
+        while not self._stop.wait(self.interval):
+            blocked_for = time.monotonic() - self._last_beat - self.interval
+            if blocked_for >= self.threshold and self._stall_stack is None:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._stall_stack = "".join(traceback.format_stack(frame)[-8:])
+
+    def _record(self, lag: float):
+        lag_ms = round(lag * 1000, 1)
+        stack = self._stall_stack
+        self._stall_stack = None
+        self.total_stalls += 1
+        self.max_stall_ms = max(self.max_stall_ms, lag_ms)
+        self.stalls.append({
+            "at": time.time(),
+            "duration_ms": lag_ms,
+            "stack": stack
+        })
+        print(f"🐢 Event loop stalled for {lag_ms} ms")
+        if stack:
+            print(stack)
+
+    def report(self) -> dict:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "total_stalls": self.total_stalls,
+            "max_stall_ms": self.max_stall_ms,
+            "recent": list(self.stalls)
+        }
+
+
+_loop_monitor: Optional[LoopStallMonitor] = None
+
+
+def start_loop_monitor() -> Optional[LoopStallMonitor]:
+    """Start the stall monitor if LOOP_STALL_DEBUG is enabled."""
+    global _loop_monitor
+    if settings.LOOP_STALL_DEBUG and _loop_monitor is None:
+        _loop_monitor = LoopStallMonitor(settings.LOOP_STALL_THRESHOLD_MS)
+        _loop_monitor.start()
+    return _loop_monitor
+
+
+def stop_loop_monitor():
+    global _loop_monitor
+    if _loop_monitor is not None:
+        _loop_monitor.stop()
+        _loop_monitor = None
+
+
+def get_loop_monitor() -> Optional[LoopStallMonitor]:
+    return _loop_monitor
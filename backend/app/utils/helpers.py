@@ -1,7 +1,9 @@
 # Utility functions
+import bisect
+import hashlib
 import os
 import re
-from typing import List
+from typing import List, Optional, Tuple
 
 
 def clean_text(text: str) -> str:
@@ -27,6 +29,203 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[st
     return chunks
 
 
+def page_chunk_spans(
+    page_starts: List[int],
+    text_length: int,
+    chunk_size: int = 1000,
+    overlap: int = 200
+) -> List[Tuple[int, int]]:
+    """
+    Character (start, end) spans of overlapping chunks that restart at every page.
+    
+    Within a page, windows overlap as in chunk_text; no chunk crosses a page
+    break, so editing one page leaves the chunks of every other page (and
+    their content hashes) unchanged.
+    """
+    spans = []
+    bounds = list(page_starts) + [text_length]
+    
+    for page_start, page_end in zip(bounds, bounds[1:]):
+        start = page_start
+        while start < page_end:
+            end = min(start + chunk_size, page_end)
+            spans.append((start, end))
+            if end == page_end:
+                break
+            start = end - overlap
+    
+    return spans
+
+
+def chunk_hash(text: str) -> str:
+    """Content hash identifying a chunk across re-uploads of a document."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def page_span(page_starts: List[int], start: int, end: int) -> Tuple[int, int]:
+    """
+    First and last page (1-based) touched by the character span [start, end).
+    
+    page_starts holds each page's start offset in the text, in page order.
+    """
+    first = bisect.bisect_right(page_starts, start)
+    last = bisect.bisect_right(page_starts, max(start, end - 1))
+    return max(first, 1), max(last, 1)
+
+
+# Open-ended page ranges ("page 40 onwards") use this as the last page
+LAST_PAGE = 2 ** 31 - 1
+
+# Document ids name files and directories (document index, lexical index, local partitions)
+DOCUMENT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+def is_valid_document_id(document_id) -> bool:
+    """Uploads get UUIDs; anything outside [A-Za-z0-9_-] could escape a storage directory."""
+    return isinstance(document_id, str) and DOCUMENT_ID_PATTERN.match(document_id) is not None
+
+
+def document_path(base_dir: str, document_id: str, suffix: str = "") -> str:
+    """
+    Path of a per-document file or directory directly inside base_dir.
+    
+    Raises:
+        ValueError: For an invalid document_id, or a path that resolves
+            outside base_dir (e.g. through a symlink)
+    """
+    if not is_valid_document_id(document_id):
+        raise ValueError(f"Invalid document_id: {document_id!r}")
+    base = os.path.realpath(base_dir)
+    resolved = os.path.realpath(os.path.join(base, document_id + suffix))
+    if os.path.dirname(resolved) != base:
+        raise ValueError(f"Path of document {document_id} leaves {base_dir}")
+    return os.path.join(base_dir, document_id + suffix)
+
+
+
+def parse_page_range(page_start: Optional[int], page_end: Optional[int]) -> Optional[Tuple[int, int]]:
+    """
+    (first, last) 1-based inclusive page range from optional request bounds.
+    
+    Returns None when neither bound is given; raises ValueError for
+    non-positive or reversed bounds.
+    """
+    if page_start is None and page_end is None:
+        return None
+    first = page_start or 1
+    last = page_end or LAST_PAGE
+    if first < 1 or last < first:
+        raise ValueError(f"Invalid page range {page_start}-{page_end}")
+    return first, last
+
+
+def describe_page_range(pages: Tuple[int, int]) -> str:
+    first, last = pages
+    if last == LAST_PAGE:
+        return f"pages {first}+"
+    return f"page {first}" if first == last else f"pages {first}-{last}"
+
+
+def reconstruct_text_from_chunks(
+    chunks: List[str],
+    overlap: int = 200,
+    starts: Optional[List[int]] = None
+) -> str:
+    """
+    Rebuild the original text from ordered chunks.
+    
+    Without starts the chunks are assumed to come from chunk_text; with
+    each chunk's character offset (page-aligned chunks) overlaps are cut
+    exactly and gaps left by dropped blank chunks are filled with newlines.
+    """
+    if not chunks:
+        return ""
+    if starts is None:
+        return chunks[0] + "".join(chunk[overlap:] for chunk in chunks[1:])
+    
+    parts = []
+    length = 0
+    for chunk, start in zip(chunks, starts):
+        if start > length:
+            parts.append("\n" * (start - length))
+            length = start
+        parts.append(chunk[length - start:])
+        length = max(length, start + len(chunk))
+    return "".join(parts)
+
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+MIN_SENTENCE_LENGTH = 10
+
+
+def split_sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    Split text into sentences and return their (start, end) character spans.
+    
+    Whitespace around each sentence is excluded and sentences of
+    MIN_SENTENCE_LENGTH characters or fewer are dropped.
+    """
+    spans = []
+    start = 0
+    boundaries = [m.start() for m in SENTENCE_BOUNDARY.finditer(text)] + [len(text)]
+    
+    for end in boundaries:
+        sentence = text[start:end]
+        stripped = sentence.strip()
+        if len(stripped) > MIN_SENTENCE_LENGTH:
+            offset = start + (len(sentence) - len(sentence.lstrip()))
+            spans.append((offset, offset + len(stripped)))
+        match = SENTENCE_BOUNDARY.match(text, end)
+        start = match.end() if match else end
+    
+    return spans
+
+
+def parse_range_header(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range HTTP Range header ("bytes=start-end").
+    
+    Returns:
+        Inclusive (start, end) byte positions, or None if the header is
+        absent or not a byte range (serve the whole resource)
+    
+    Raises:
+        ValueError: If the range cannot be satisfied for this size
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    
+    spec = range_header[len("bytes="):].split(",")[0].strip()
+    start_str, _, end_str = spec.partition("-")
+    
+    if not start_str:
+        # Suffix range: the last N bytes
+        length = int(end_str)
+        if length <= 0 or size == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(0, size - length), size - 1
+    
+    start = int(start_str)
+    end = int(end_str) if end_str else size - 1
+    if start >= size or end < start:
+        raise ValueError("Unsatisfiable range")
+    
+    return start, min(end, size - 1)
+
+
+def iter_file_range(path: str, start: int, end: int, block_size: int = 64 * 1024):
+    """Yield bytes [start, end] (inclusive) of a file in blocks."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
 def ensure_directory(path: str):
     """Ensure directory exists."""
     os.makedirs(path, exist_ok=True)
@@ -0,0 +1,182 @@
+# Hybrid lexical (BM25) + dense retrieval with a lexical-only fast path
+from typing import List, Optional, Tuple
+from langchain_core.documents import Document
+from app.config import settings
+from app.utils.metrics import timed_stage
+from app.utils.lexical_index import (
+    build_lexical_index,
+    get_lexical_index,
+    lexical_search,
+    tokenize
+)
+from app.utils.vector_store import search_documents, search_documents_batch, get_document_chunks
+
+QUESTION_WORDS = frozenset([
+    "what", "why", "how", "when", "where", "which", "who", "whom", "whose",
+    "explain", "describe", "compare", "define", "tell", "is", "are", "does", "do", "can"
+])
+
+
+def is_keyword_query(query: str) -> bool:
+    """
+    Detect queries that lexical search alone answers well.
+
+    Quoted phrases and short, non-question queries (acronyms, formula or
+    term names such as "ReLU", "Bayes theorem", "F1-score") qualify.
+    """
+    stripped = query.strip()
+    if len(stripped) >= 2 and stripped[0] == stripped[-1] == '"':
+        return True
+
+    words = stripped.rstrip("?").split()
+    if not words or len(words) > settings.KEYWORD_QUERY_MAX_WORDS:
+        return False
+
+    return words[0].lower() not in QUESTION_WORDS and not stripped.endswith("?")
+
+
+def ensure_lexical_index(document_id: str) -> bool:
+    """Build the lexical index for a document stored before indexing existed."""
+    if get_lexical_index(document_id) is not None:
+        return True
+
+    chunks = get_document_chunks(document_id)
+    if not chunks:
+        return False
+
+    build_lexical_index(document_id, chunks["texts"], chunks["metadatas"])
+    return True
+
+
+def _lexical_documents(hits: List[dict]) -> List[Tuple[Document, float]]:
+    return [
+        (
+            Document(
+                page_content=hit["text"],
+                metadata={key: hit[key] for key in ("document_id", "chunk_index", "page_start", "page_end") if key in hit}
+            ),
+            hit["score"]
+        )
+        for hit in hits
+    ]
+
+
+def _chunk_key(metadata: dict, fallback: str) -> tuple:
+    if metadata and "document_id" in metadata and "chunk_index" in metadata:
+        return metadata["document_id"], metadata["chunk_index"]
+    return None, fallback
+
+
+@timed_stage("hybrid_search")
+def hybrid_search(
+    query: str,
+    k: int = 3,
+    document_id: Optional[str] = None,
+    mode: str = "auto",
+    pages: Optional[Tuple[int, int]] = None
+) -> List[Tuple[Document, float]]:
+    """
+    Retrieve the top-k chunks for a query.
+
+    Modes:
+        auto: lexical-only for keyword-like queries (no embedding call),
+              hybrid otherwise
+        hybrid: fuse BM25 and dense rankings with weighted reciprocal rank fusion
+        lexical / dense: a single retriever
+
+    pages=(first, last) restricts a document search to chunks overlapping
+    that page range, in both retrievers.
+
+    Returns:
+        List of (Document, score) pairs, best first. Scores are fused
+        ranks (higher is better) except in dense mode (Chroma distances).
+    """
+    if document_id:
+        try:
+            ensure_lexical_index(document_id)
+        except Exception as e:
+            print(f"Error building lexical index: {e}")
+
+    candidates = max(k, settings.HYBRID_CANDIDATES)
+
+    if mode == "dense":
+        return search_documents(query, k=k, document_id=document_id, pages=pages)
+
+    if mode in ("auto", "lexical") and (mode == "lexical" or is_keyword_query(query)):
+        lexical_hits = lexical_search(query, k=k, document_id=document_id, pages=pages)
+        if lexical_hits or mode == "lexical":
+            return _lexical_documents(lexical_hits)
+
+    lexical_hits = lexical_search(query, k=candidates, document_id=document_id, pages=pages) if tokenize(query) else []
+    dense_hits = search_documents(query, k=candidates, document_id=document_id, pages=pages)
+    return _fuse(lexical_hits, dense_hits, k)
+
+
+def _fuse(lexical_hits: List[dict], dense_hits: list, k: int) -> List[Tuple[Document, float]]:
+    """Weighted reciprocal rank fusion of a BM25 and a dense ranking."""
+    rrf_k = settings.HYBRID_RRF_K
+    fused = {}
+
+    for rank, (doc, _) in enumerate(_lexical_documents(lexical_hits)):
+        key = _chunk_key(doc.metadata, doc.page_content)
+        entry = fused.setdefault(key, [doc, 0.0])
+        entry[1] += settings.HYBRID_LEXICAL_WEIGHT / (rrf_k + rank + 1)
+
+    for rank, (doc, _) in enumerate(dense_hits):
+        key = _chunk_key(doc.metadata, doc.page_content)
+        entry = fused.setdefault(key, [doc, 0.0])
+        # Prefer the dense copy: it carries the full chunk metadata
+        entry[0] = doc
+        entry[1] += settings.HYBRID_DENSE_WEIGHT / (rrf_k + rank + 1)
+
+    ranked = sorted(fused.values(), key=lambda item: -item[1])
+    return [(doc, score) for doc, score in ranked[:k]]
+
+
+@timed_stage("hybrid_search_batch")
+def hybrid_search_batch(
+    queries: List[str],
+    k: int = 3,
+    document_id: Optional[str] = None,
+    mode: str = "auto",
+    pages: Optional[Tuple[int, int]] = None
+) -> List[List[Tuple[Document, float]]]:
+    """
+    hybrid_search for several queries at once.
+
+    Keyword queries are still answered by BM25 alone; the others share one
+    embedding request and one vector query per partition.
+
+    Returns:
+        One result list per query, in order
+    """
+    if document_id:
+        try:
+            ensure_lexical_index(document_id)
+        except Exception as e:
+            print(f"Error building lexical index: {e}")
+
+    candidates = max(k, settings.HYBRID_CANDIDATES)
+    results: List[Optional[List[Tuple[Document, float]]]] = [None] * len(queries)
+    dense_queries = []
+
+    for i, query in enumerate(queries):
+        if mode in ("auto", "lexical") and (mode == "lexical" or is_keyword_query(query)):
+            lexical_hits = lexical_search(query, k=k, document_id=document_id, pages=pages)
+            if lexical_hits or mode == "lexical":
+                results[i] = _lexical_documents(lexical_hits)
+                continue
+        dense_queries.append(i)
+
+    dense_k = k if mode == "dense" else candidates
+    dense_results = search_documents_batch([queries[i] for i in dense_queries], k=dense_k, document_id=document_id, pages=pages)
+
+    for i, dense_hits in zip(dense_queries, dense_results):
+        if mode == "dense":
+            results[i] = dense_hits
+            continue
+        query = queries[i]
+        lexical_hits = lexical_search(query, k=candidates, document_id=document_id, pages=pages) if tokenize(query) else []
+        results[i] = _fuse(lexical_hits, dense_hits, k)
+
+    return results
@@ -0,0 +1,318 @@
+# BM25 inverted index per document, built at ingestion and stored next to Chroma
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.config import settings
+from app.utils.helpers import document_path, is_valid_document_id
+from app.utils.metrics import record_cache
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[\-_+.'][a-z0-9]+)*")
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in into is it its
+me my of on or so than that the their then there these they this to was were what when
+where which who why will with you your about explain tell describe
+""".split())
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_index_cache: "OrderedDict[str, LexicalIndex]" = OrderedDict()  # LRU, at most LEXICAL_INDEX_CACHE_SIZE
+_cache_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords (keeps acronyms, formula names, numbers)."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def get_lexical_index_path(document_id: str) -> str:
+    return document_path(settings.LEXICAL_INDEX_DIR, document_id, ".npz")
+
+
+def _file_version(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class LexicalIndex:
+    """
+    Compact BM25 index over one document's chunks.
+
+    Postings are stored CSR-style: for term t, the chunks containing it are
+    chunk_ids[offsets[t]:offsets[t + 1]] with term frequencies in tfs.
+    Chunk texts are kept as one UTF-8 blob so lexical hits can be returned
+    without a vector store round trip. Chunk page spans are kept too when
+    the document was ingested with them, for page-range filtering.
+    """
+
+    def __init__(self, document_id: str, arrays: dict):
+        self.document_id = document_id
+        self.terms = arrays["terms"]
+        self.offsets = arrays["offsets"]
+        self.chunk_ids = arrays["chunk_ids"]
+        self.tfs = arrays["tfs"]
+        self.chunk_lengths = arrays["chunk_lengths"]
+        self.chunk_indices = arrays["chunk_indices"]
+        self.text_blob = arrays["text_blob"]
+        self.text_offsets = arrays["text_offsets"]
+        self.page_starts = arrays.get("page_starts")
+        self.page_ends = arrays.get("page_ends")
+        self.version: Optional[int] = None  # mtime of the file it was saved to / loaded from
+        self.num_chunks = len(self.chunk_lengths)
+        self.avg_length = float(self.chunk_lengths.mean()) if self.num_chunks else 0.0
+        self._term_ids = {term: i for i, term in enumerate(self.terms.tolist())}
+
+    @classmethod
+    def build(
+        cls,
+        document_id: str,
+        texts: List[str],
+        chunk_indices: List[int],
+        page_spans: Optional[List[Tuple[int, int]]] = None
+    ) -> "LexicalIndex":
+        counts = [Counter(tokenize(text)) for text in texts]
+        vocabulary = sorted(set().union(*counts)) if counts else []
+        term_ids = {term: i for i, term in enumerate(vocabulary)}
+
+        postings: List[List[Tuple[int, int]]] = [[] for _ in vocabulary]
+        for chunk_id, counter in enumerate(counts):
+            for term, tf in counter.items():
+                postings[term_ids[term]].append((chunk_id, tf))
+
+        sizes = np.fromiter((len(p) for p in postings), dtype=np.int64, count=len(postings))
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        flat = [pair for plist in postings for pair in plist]
+
+        encoded = [text.encode("utf-8") for text in texts]
+        text_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=text_offsets[1:])
+
+        arrays = {
+            "terms": np.array(vocabulary, dtype=str),
+            "offsets": offsets,
+            "chunk_ids": np.array([c for c, _ in flat], dtype=np.int32),
+            "tfs": np.minimum(np.array([tf for _, tf in flat], dtype=np.int64), 65535).astype(np.uint16),
+            "chunk_lengths": np.array([sum(c.values()) for c in counts], dtype=np.int32),
+            "chunk_indices": np.array(chunk_indices, dtype=np.int32),
+            "text_blob": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            "text_offsets": text_offsets,
+        }
+        if page_spans is not None:
+            arrays["page_starts"] = np.array([start for start, _ in page_spans], dtype=np.int32)
+            arrays["page_ends"] = np.array([end for _, end in page_spans], dtype=np.int32)
+        return cls(document_id, arrays)
+
+    def save(self):
+        os.makedirs(settings.LEXICAL_INDEX_DIR, exist_ok=True)
+        path = get_lexical_index_path(self.document_id)
+        tmp_path = f"{path}.tmp.npz"
+        pages = {}
+        if self.page_starts is not None:
+            pages = {"page_starts": self.page_starts, "page_ends": self.page_ends}
+        np.savez(
+            tmp_path,
+            **pages,
+            terms=self.terms,
+            offsets=self.offsets,
+            chunk_ids=self.chunk_ids,
+            tfs=self.tfs,
+            chunk_lengths=self.chunk_lengths,
+            chunk_indices=self.chunk_indices,
+            text_blob=self.text_blob,
+            text_offsets=self.text_offsets,
+        )
+        os.replace(tmp_path, path)
+        self.version = _file_version(path)
+
+    @classmethod
+    def load(cls, document_id: str) -> "LexicalIndex":
+        path = get_lexical_index_path(document_id)
+        version = _file_version(path)
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        index = cls(document_id, arrays)
+        index.version = version
+        return index
+
+    def chunk_text(self, chunk_id: int) -> str:
+        start, end = self.text_offsets[chunk_id], self.text_offsets[chunk_id + 1]
+        return self.text_blob[start:end].tobytes().decode("utf-8")
+
+    def score(self, query_tokens: List[str]) -> np.ndarray:
+        """BM25 score of every chunk for the query tokens."""
+        scores = np.zeros(self.num_chunks, dtype=np.float32)
+        if not self.num_chunks:
+            return scores
+
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self.chunk_lengths / max(self.avg_length, 1e-9))
+
+        for term in set(query_tokens):
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            ids = self.chunk_ids[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            df = end - start
+            idf = np.log(1 + (self.num_chunks - df + 0.5) / (df + 0.5))
+            scores[ids] += idf * tf * (BM25_K1 + 1) / (tf + length_norm[ids])
+
+        return scores
+
+    def page_span(self, chunk_id: int) -> Optional[Tuple[int, int]]:
+        if self.page_starts is None:
+            return None
+        return int(self.page_starts[chunk_id]), int(self.page_ends[chunk_id])
+
+    def search(
+        self,
+        query_tokens: List[str],
+        k: int,
+        pages: Optional[Tuple[int, int]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Top-k (chunk_id, score) pairs with a positive score.
+
+        pages=(first, last) keeps only chunks overlapping that page range
+        (none for an index built without page spans).
+        """
+        scores = self.score(query_tokens)
+        if pages:
+            if self.page_starts is None:
+                return []
+            first, last = pages
+            scores[(self.page_starts > last) | (self.page_ends < first)] = 0
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) == 0:
+            return []
+        top = hits[np.argsort(-scores[hits], kind="stable")[:k]]
+        return [(int(i), float(scores[i])) for i in top]
+
+
+def build_lexical_index(document_id: str, texts: List[str], metadatas: Optional[List[dict]] = None) -> int:
+    """Build and persist a document's index. Returns the vocabulary size."""
+    metadatas = [m or {} for m in metadatas] if metadatas else [{} for _ in texts]
+    chunk_indices = [m.get("chunk_index", i) for i, m in enumerate(metadatas)]
+    page_spans = None
+    if texts and all("page_start" in m and "page_end" in m for m in metadatas):
+        page_spans = [(m["page_start"], m["page_end"]) for m in metadatas]
+    index = LexicalIndex.build(document_id, texts, chunk_indices, page_spans)
+    index.save()
+    _cache_index(index)
+    return len(index.terms)
+
+
+def get_lexical_index(document_id: str) -> Optional[LexicalIndex]:
+    """
+    Load (and cache) a document's index, or None if it was never built.
+
+    A cached index is reloaded when its file changed, e.g. after another
+    worker re-ingested a revised upload of the document.
+    """
+    if not is_valid_document_id(document_id):
+        return None
+    version = _file_version(get_lexical_index_path(document_id))
+    with _cache_lock:
+        index = _index_cache.get(document_id)
+        if index is not None and index.version != version:
+            del _index_cache[document_id]
+            index = None
+        elif index is not None:
+            _index_cache.move_to_end(document_id)
+    record_cache("lexical_index", index is not None)
+    if index is not None:
+        return index
+
+    if version is None:
+        return None
+
+    index = LexicalIndex.load(document_id)
+    _cache_index(index)
+    return index
+
+
+def _cache_index(index: LexicalIndex) -> None:
+    with _cache_lock:
+        _index_cache[index.document_id] = index
+        _index_cache.move_to_end(index.document_id)
+        while len(_index_cache) > settings.LEXICAL_INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+
+
+def list_lexical_documents() -> List[str]:
+    """Document IDs that have a persisted lexical index."""
+    if not os.path.isdir(settings.LEXICAL_INDEX_DIR):
+        return []
+    return [
+        name[:-len(".npz")]
+        for name in os.listdir(settings.LEXICAL_INDEX_DIR)
+        if name.endswith(".npz") and not name.endswith(".tmp.npz")
+    ]
+
+
+def lexical_search(
+    query: str,
+    k: int = 3,
+    document_id: Optional[str] = None,
+    pages: Optional[Tuple[int, int]] = None
+) -> List[dict]:
+    """
+    BM25 search within one document, or across every indexed document.
+
+    Args:
+        pages: (first, last) page range, applied to a single-document search
+
+    Returns:
+        List of dicts with document_id, chunk_index, text and score
+        (plus page_start/page_end when known), best first
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+
+    document_ids = [document_id] if document_id else list_lexical_documents()
+    results = []
+
+    for doc_id in document_ids:
+        index = get_lexical_index(doc_id)
+        if index is None:
+            continue
+        for chunk_id, score in index.search(tokens, k, pages if document_id else None):
+            hit = {
+                "document_id": doc_id,
+                "chunk_index": int(index.chunk_indices[chunk_id]),
+                "text": index.chunk_text(chunk_id),
+                "score": score
+            }
+            span = index.page_span(chunk_id)
+            if span:
+                hit["page_start"], hit["page_end"] = span
+            results.append(hit)
+
+    results.sort(key=lambda r: -r["score"])
+    return results[:k]
+
+
+def delete_lexical_index(document_id: str) -> bool:
+    """Remove a document's index from disk and cache."""
+    if not is_valid_document_id(document_id):
+        return False
+    with _cache_lock:
+        _index_cache.pop(document_id, None)
+    path = get_lexical_index_path(document_id)
+    if os.path.exists(path):
+        os.remove(path)
+        return True
+    return False
+
+
+def clear_lexical_cache():
+    """Drop all cached indexes (after the store is cleared)."""
+    with _cache_lock:
+        _index_cache.clear()
@@ -0,0 +1,625 @@
+# In-process vector index: per-document partitions, float32/int8 vectors, IVF + exact search
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.config import settings
+from app.utils.helpers import document_path, is_valid_document_id
+from app.utils.metrics import record_cache
+
+VECTORS_FILE = "vectors.npy"  # (n, d) float32, or int8 when quantized
+SCALES_FILE = "scales.npy"  # (n,) float32 per-row scale for int8 vectors
+CENTROIDS_FILE = "ivf_centroids.npy"  # (nlist, d) float32
+LIST_OFFSETS_FILE = "ivf_offsets.npy"  # (nlist + 1,) int64, rows are stored sorted by list
+COLUMNS_FILE = "columns.json"  # constant metadata + column layout
+TEXT_BLOB_FILE = "texts.bin"
+TEXT_OFFSETS_FILE = "text_offsets.npy"
+CORPUS_META_FILE = "corpus_ivf.json"  # current version of the corpus-wide coarse quantizer
+CORPUS_CENTROIDS_FILE = "corpus_centroids_v{version}.npy"  # (nlist, d) float32, shared by all partitions
+CORPUS_LISTS_FILE = "corpus_lists_v{version}.npy"  # (n,) int32 corpus list of each partition row
+
+
+def _normalize(X: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(X, axis=-1, keepdims=True)
+    return X / np.maximum(norms, 1e-12)
+
+
+def quantize_int8(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization. Returns (codes, scales)."""
+    scales = np.abs(X).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(X / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def train_ivf(X: np.ndarray, nlist: int, iterations: int = 10, seed: int = 42) -> np.ndarray:
+    """Spherical k-means (on a sample for large inputs) for the IVF coarse quantizer."""
+    rng = np.random.default_rng(seed)
+    sample = X if len(X) <= nlist * 64 else X[rng.choice(len(X), nlist * 64, replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = _normalize(sums)
+
+    return centroids.astype(np.float32)
+
+
+def assign_lists(X: np.ndarray, centroids: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+    """Nearest centroid of every row, in batches so X @ centroids.T stays small."""
+    assign = np.empty(len(X), dtype=np.int32)
+    for start in range(0, len(X), batch_size):
+        assign[start:start + batch_size] = np.argmax(X[start:start + batch_size] @ centroids.T, axis=1)
+    return assign
+
+
+def _top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(scores) > k:
+        top = np.argpartition(-scores, k)[:k]
+    else:
+        top = np.arange(len(scores))
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return rows[top], scores[top]
+
+
+class Partition:
+    """
+    One document's vectors and metadata, memory-mapped from disk.
+
+    Metadata is columnar: keys whose value is the same for every chunk are
+    stored once in columns.json, varying integer keys as .npy columns and
+    chunk texts as one UTF-8 blob with offsets.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, COLUMNS_FILE)) as f:
+            self.layout = json.load(f)
+
+        self.vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+        self.quantized = self.vectors.dtype == np.int8
+        self.scales = np.load(os.path.join(path, SCALES_FILE)) if self.quantized else None
+
+        centroids_path = os.path.join(path, CENTROIDS_FILE)
+        self.centroids = np.load(centroids_path) if os.path.exists(centroids_path) else None
+        self.list_offsets = np.load(os.path.join(path, LIST_OFFSETS_FILE)) if self.centroids is not None else None
+
+        self.columns = {
+            name: np.load(os.path.join(path, f"col_{name}.npy"))
+            for name in self.layout["int_columns"]
+        }
+        self.text_offsets = np.load(os.path.join(path, TEXT_OFFSETS_FILE))
+        self.text_blob = np.memmap(os.path.join(path, TEXT_BLOB_FILE), dtype=np.uint8, mode="r") \
+            if self.text_offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def dimension(self) -> int:
+        return self.vectors.shape[1]
+
+    def text(self, row: int) -> str:
+        start, end = self.text_offsets[row], self.text_offsets[row + 1]
+        return self.text_blob[start:end].tobytes().decode("utf-8")
+
+    def metadata(self, row: int) -> dict:
+        metadata = dict(self.layout["constants"])
+        for name, column in self.columns.items():
+            metadata[name] = int(column[row])
+        for name, values in self.layout["sparse"].items():
+            if str(row) in values:
+                metadata[name] = values[str(row)]
+        return metadata
+
+    def dequantize(self, rows) -> np.ndarray:
+        vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.quantized:
+            vectors *= self.scales[rows][:, None]
+        return vectors
+
+    def _score_rows(self, query: np.ndarray, start: int, end: int) -> np.ndarray:
+        scores = np.asarray(self.vectors[start:end], dtype=np.float32) @ query
+        if self.quantized:
+            scores *= self.scales[start:end]
+        return scores
+
+    def int_column(self, name: str) -> Optional[np.ndarray]:
+        """Integer metadata values of every row (constant columns expanded), None if absent."""
+        if name in self.columns:
+            return self.columns[name]
+        if name in self.layout["constants"]:
+            return np.full(len(self), self.layout["constants"][name], dtype=np.int64)
+        return None
+
+    def page_mask(self, pages: Tuple[int, int]) -> np.ndarray:
+        """Rows whose page span overlaps pages=(first, last); none without page metadata."""
+        starts, ends = self.int_column("page_start"), self.int_column("page_end")
+        if starts is None or ends is None:
+            return np.zeros(len(self), dtype=bool)
+        first, last = pages
+        return (starts <= last) & (ends >= first)
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        nprobe: int,
+        mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k (rows, cosine similarities): exact for small partitions, IVF otherwise.
+
+        With a row mask (e.g. a page range) only those rows are scored, exactly.
+        """
+        if mask is not None:
+            rows = np.flatnonzero(mask)
+            scores = self.dequantize(rows) @ query if len(rows) else np.zeros(0, dtype=np.float32)
+        elif self.centroids is None:
+            scores = self._score_rows(query, 0, len(self))
+            rows = np.arange(len(self))
+        else:
+            probe = np.argsort(-(self.centroids @ query))[:nprobe]
+            spans = [(self.list_offsets[c], self.list_offsets[c + 1]) for c in probe]
+            rows = np.concatenate([np.arange(s, e) for s, e in spans]) if spans else np.zeros(0, dtype=np.int64)
+            scores = np.concatenate([self._score_rows(query, s, e) for s, e in spans]) if spans else np.zeros(0, dtype=np.float32)
+
+        return _top_k(rows, scores, k)
+
+
+def write_partition(
+    path: str,
+    embeddings,
+    texts: List[str],
+    metadatas: List[dict],
+    corpus: Optional[Tuple[int, int, np.ndarray]] = None
+) -> None:
+    """
+    Write a partition atomically (build in a temp dir, then swap).
+
+    corpus=(version, trained_on, centroids) also saves each row's list
+    under the corpus-wide coarse quantizer.
+    """
+    X = _normalize(np.asarray(embeddings, dtype=np.float32))
+    n = len(X)
+
+    # IVF: reorder rows so each inverted list is a contiguous slice
+    order = np.arange(n)
+    centroids = None
+    list_offsets = None
+    if n > settings.LOCAL_INDEX_EXACT_THRESHOLD:
+        nlist = max(1, int(np.sqrt(n)))
+        centroids = train_ivf(X, nlist)
+        assign = np.argmax(X @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=nlist), out=list_offsets[1:])
+
+    X = X[order]
+    texts = [texts[i] for i in order]
+    metadatas = [metadatas[i] for i in order]
+
+    # Columnar metadata
+    keys = sorted({key for m in metadatas for key in m})
+    constants, int_columns, sparse = {}, {}, {}
+    for key in keys:
+        values = [m.get(key) for m in metadatas]
+        if all(v == values[0] for v in values) and key in metadatas[0]:
+            constants[key] = values[0]
+        elif all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+            int_columns[key] = np.array(values, dtype=np.int64)
+        else:
+            sparse[key] = {str(i): v for i, v in enumerate(values) if v is not None}
+
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    if settings.LOCAL_INDEX_QUANTIZATION == "int8":
+        codes, scales = quantize_int8(X)
+        np.save(os.path.join(tmp_path, VECTORS_FILE), codes)
+        np.save(os.path.join(tmp_path, SCALES_FILE), scales)
+    else:
+        np.save(os.path.join(tmp_path, VECTORS_FILE), X)
+
+    if centroids is not None:
+        np.save(os.path.join(tmp_path, CENTROIDS_FILE), centroids)
+        np.save(os.path.join(tmp_path, LIST_OFFSETS_FILE), list_offsets)
+    if corpus is not None:
+        version, _, corpus_centroids = corpus
+        np.save(os.path.join(tmp_path, CORPUS_LISTS_FILE.format(version=version)), assign_lists(X, corpus_centroids))
+
+    for name, column in int_columns.items():
+        np.save(os.path.join(tmp_path, f"col_{name}.npy"), column)
+
+    encoded = [t.encode("utf-8") for t in texts]
+    text_offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=text_offsets[1:])
+    with open(os.path.join(tmp_path, TEXT_BLOB_FILE), "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(os.path.join(tmp_path, TEXT_OFFSETS_FILE), text_offsets)
+
+    with open(os.path.join(tmp_path, COLUMNS_FILE), "w") as f:
+        json.dump({
+            "count": n,
+            "constants": constants,
+            "int_columns": list(int_columns),
+            "sparse": sparse
+        }, f)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+class CorpusPosting:
+    """
+    Rows of every partition grouped by corpus IVF list (CSR: list -> (document, row)).
+
+    Lets a cross-document query open only the partitions that hold rows
+    in the probed lists, instead of every partition.
+    """
+
+    def __init__(self, version: int, nlist: int, doc_lists: Dict[str, np.ndarray]):
+        self.version = version
+        self.doc_ids = sorted(doc_lists)
+        self.doc_set = frozenset(self.doc_ids)
+        assigns = [doc_lists[doc_id] for doc_id in self.doc_ids]
+        lists = np.concatenate(assigns) if assigns else np.zeros(0, dtype=np.int32)
+        docs = np.concatenate([np.full(len(a), i, dtype=np.int32) for i, a in enumerate(assigns)]) \
+            if assigns else np.zeros(0, dtype=np.int32)
+        rows = np.concatenate([np.arange(len(a), dtype=np.int32) for a in assigns]) \
+            if assigns else np.zeros(0, dtype=np.int32)
+
+        order = np.argsort(lists, kind="stable")
+        self.docs = docs[order]
+        self.rows = rows[order]
+        self.offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(lists, minlength=nlist), out=self.offsets[1:])
+
+    def select(self, probe: np.ndarray) -> Dict[str, np.ndarray]:
+        """Rows (sorted) of each document that fall in the probed lists."""
+        spans = [slice(self.offsets[c], self.offsets[c + 1]) for c in probe]
+        docs = np.concatenate([self.docs[span] for span in spans])
+        rows = np.concatenate([self.rows[span] for span in spans])
+        order = np.lexsort((rows, docs))
+        docs, rows = docs[order], rows[order]
+        starts = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]]) if len(docs) else []
+        ends = list(starts[1:]) + [len(docs)]
+        return {self.doc_ids[docs[start]]: rows[start:end] for start, end in zip(starts, ends)}
+
+
+class LocalVectorIndex:
+    """
+    Directory of per-document partitions with an LRU of open partitions.
+
+    Every partition is independent, so deleting a document is a directory
+    removal and a filtered query touches only that document's vectors.
+    Cross-document queries use a corpus-wide IVF coarse quantizer once the
+    total across partitions passes LOCAL_INDEX_EXACT_THRESHOLD.
+    """
+
+    def __init__(self, root: str, max_open_partitions: int = 256):
+        self.root = root
+        self.max_open = max_open_partitions
+        self._open: "OrderedDict[str, Partition]" = OrderedDict()
+        self._lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+        self._corpus: Optional[Tuple[int, int, np.ndarray]] = None  # (version, trained_on, centroids)
+        self._corpus_mtime: Optional[int] = None  # of CORPUS_META_FILE when _corpus was loaded
+        self._doc_lists: Dict[str, np.ndarray] = {}  # corpus list of each row, per document
+        self._posting: Optional[CorpusPosting] = None
+        self._current_corpus()
+
+    def _current_corpus(self) -> Optional[Tuple[int, int, np.ndarray]]:
+        """The corpus quantizer, reloaded when another worker retrained it."""
+        try:
+            mtime = os.stat(os.path.join(self.root, CORPUS_META_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._corpus_mtime:
+            with self._lock:
+                if mtime != self._corpus_mtime:
+                    self._corpus = self._load_corpus_ivf() if mtime is not None else None
+                    self._corpus_mtime = mtime
+                    self._doc_lists = {}
+                    self._posting = None
+        return self._corpus
+
+    def _load_corpus_ivf(self) -> Optional[Tuple[int, int, np.ndarray]]:
+        meta_path = os.path.join(self.root, CORPUS_META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            centroids = np.load(os.path.join(self.root, CORPUS_CENTROIDS_FILE.format(version=meta["version"])))
+            print(f"🗂️ Loaded corpus IVF: {len(centroids)} lists")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Ignoring corpus IVF in {self.root}: {e}")
+            return None
+        return meta["version"], meta["trained_on"], centroids
+
+    def _sample_vectors(self, size: int, total: int, seed: int = 42) -> np.ndarray:
+        """About `size` rows drawn from every partition in proportion to its size."""
+        rng = np.random.default_rng(seed)
+        samples = []
+        for doc_id in self.document_ids():
+            part = self.partition(doc_id)
+            if part is None or len(part) == 0:
+                continue
+            take = min(len(part), max(1, int(np.ceil(size * len(part) / total))))
+            samples.append(part.dequantize(np.sort(rng.choice(len(part), take, replace=False))))
+        return _normalize(np.concatenate(samples))
+
+    def _refresh_corpus_ivf(self) -> None:
+        """
+        Train the corpus coarse quantizer once the corpus outgrows exact search.
+
+        Documents rarely pass the threshold on their own, so it applies to
+        the total; centroids are retrained whenever the corpus has doubled.
+        """
+        total = self.count()
+        if total <= settings.LOCAL_INDEX_EXACT_THRESHOLD:
+            return
+        corpus = self._current_corpus()
+        if corpus is not None and total < 2 * corpus[1]:
+            return
+
+        nlist = max(1, int(np.sqrt(total)))
+        centroids = train_ivf(self._sample_vectors(nlist * 64, total), nlist)
+        # Unique across workers, so two concurrent retrains never mix list files
+        version = time.time_ns()
+
+        # Row assignments first, then the centroids, then the pointer to them
+        doc_lists = {}
+        for doc_id in self.document_ids():
+            part = self.partition(doc_id)
+            if part is not None:
+                doc_lists[doc_id] = assign_lists(part.dequantize(np.arange(len(part))), centroids)
+                self._save_lists(doc_id, version, doc_lists[doc_id])
+        centroids_path = os.path.join(self.root, CORPUS_CENTROIDS_FILE.format(version=version))
+        np.save(f"{centroids_path}.tmp.npy", centroids)
+        os.replace(f"{centroids_path}.tmp.npy", centroids_path)
+        meta_path = os.path.join(self.root, CORPUS_META_FILE)
+        with open(f"{meta_path}.tmp", "w") as f:
+            json.dump({"version": version, "trained_on": total, "nlist": nlist}, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+        self._corpus = (version, total, centroids)
+        self._corpus_mtime = os.stat(meta_path).st_mtime_ns
+        self._doc_lists = doc_lists
+        self._posting = None
+        print(f"🗂️ Trained corpus IVF: {nlist} lists over {total} vectors")
+
+        # Files of earlier versions (workers still on one keep their postings in memory)
+        current = {os.path.basename(centroids_path), CORPUS_LISTS_FILE.format(version=version)}
+        for directory in [self.root] + [self._path(doc_id) for doc_id in doc_lists]:
+            for name in os.listdir(directory):
+                if name.startswith(("corpus_centroids_v", "corpus_lists_v")) and name not in current:
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except OSError:
+                        pass
+
+    def _save_lists(self, document_id: str, version: int, assign: np.ndarray) -> None:
+        lists_path = os.path.join(self._path(document_id), CORPUS_LISTS_FILE.format(version=version))
+        np.save(f"{lists_path}.tmp.npy", assign)
+        os.replace(f"{lists_path}.tmp.npy", lists_path)
+
+    def _load_lists(self, document_id: str, version: int, centroids: np.ndarray) -> Optional[np.ndarray]:
+        """A document's row lists: saved at write/retrain time, else assigned once and saved."""
+        lists_path = os.path.join(self._path(document_id), CORPUS_LISTS_FILE.format(version=version))
+        try:
+            return np.load(lists_path)
+        except FileNotFoundError:
+            pass
+        part = self.partition(document_id)
+        if part is None:
+            return None
+        assign = assign_lists(part.dequantize(np.arange(len(part))), centroids)
+        try:
+            self._save_lists(document_id, version, assign)
+        except OSError:
+            pass
+        return assign
+
+    def _corpus_posting(self, document_ids: List[str]) -> Optional[Tuple[np.ndarray, CorpusPosting]]:
+        """(centroids, posting) covering document_ids, or None below the IVF threshold."""
+        corpus = self._current_corpus()
+        if corpus is None:
+            return None
+        version, _, centroids = corpus
+        posting = self._posting
+        if posting is not None and posting.version == version and posting.doc_set == set(document_ids):
+            return centroids, posting
+
+        with self._lock:
+            if self._corpus is None or self._corpus[0] != version:
+                return None
+            # Documents written or deleted since (possibly by another worker)
+            for doc_id in set(self._doc_lists) - set(document_ids):
+                del self._doc_lists[doc_id]
+            for doc_id in set(document_ids) - set(self._doc_lists):
+                assign = self._load_lists(doc_id, version, centroids)
+                if assign is not None:
+                    self._doc_lists[doc_id] = assign
+            posting = CorpusPosting(version, len(centroids), self._doc_lists)
+            self._posting = posting
+        return centroids, posting
+
+    def _path(self, document_id: str) -> str:
+        return document_path(self.root, document_id)
+
+    def document_ids(self) -> List[str]:
+        return [
+            name for name in os.listdir(self.root)
+            if not name.endswith(".tmp") and os.path.isdir(os.path.join(self.root, name))
+        ]
+
+    def has_document(self, document_id: str) -> bool:
+        if not is_valid_document_id(document_id):
+            return False
+        return os.path.isdir(self._path(document_id))
+
+    def partition(self, document_id: str) -> Optional[Partition]:
+        with self._lock:
+            part = self._open.get(document_id)
+            record_cache("local_index_partition", part is not None)
+            if part is not None:
+                self._open.move_to_end(document_id)
+                return part
+            if not self.has_document(document_id):
+                return None
+            part = Partition(self._path(document_id))
+            self._open[document_id] = part
+            if len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+            return part
+
+    def add(self, document_id: str, embeddings, texts: List[str], metadatas: List[dict]) -> None:
+        """Add chunks to a document's partition (rewriting it if it already exists)."""
+        if not texts:
+            return
+        with self._lock:
+            existing = self.get(document_id)
+            if existing:
+                embeddings = np.concatenate([existing["embeddings"], np.asarray(embeddings, dtype=np.float32)])
+                texts = existing["texts"] + list(texts)
+                metadatas = existing["metadatas"] + list(metadatas)
+            self._open.pop(document_id, None)
+            self._invalidate_lists(document_id)
+            write_partition(self._path(document_id), embeddings, texts, metadatas, self._current_corpus())
+            self._refresh_corpus_ivf()
+
+    def replace(self, document_id: str, embeddings, texts: List[str], metadatas: List[dict]) -> None:
+        """Rewrite a document's partition with exactly these chunks."""
+        with self._lock:
+            self._open.pop(document_id, None)
+            self._invalidate_lists(document_id)
+            write_partition(self._path(document_id), embeddings, texts, metadatas, self._current_corpus())
+            self._refresh_corpus_ivf()
+
+    def _invalidate_lists(self, document_id: str) -> None:
+        self._doc_lists.pop(document_id, None)
+        self._posting = None
+
+    def get(self, document_id: str, pages: Optional[Tuple[int, int]] = None) -> Optional[Dict]:
+        """All chunks of a document (or those overlapping pages=(first, last)), ordered by chunk_index."""
+        part = self.partition(document_id)
+        if part is None:
+            return None
+        rows = np.flatnonzero(part.page_mask(pages)) if pages else range(len(part))
+        metadatas = {int(i): part.metadata(i) for i in rows}
+        order = sorted(metadatas, key=lambda i: metadatas[i].get("chunk_index", i))
+        return {
+            "texts": [part.text(i) for i in order],
+            "metadatas": [metadatas[i] for i in order],
+            "embeddings": part.dequantize(np.array(order, dtype=np.int64)) if order else np.zeros((0, part.dimension), dtype=np.float32)
+        }
+
+    def search(
+        self,
+        query_vector,
+        k: int = 3,
+        document_id: Optional[str] = None,
+        pages: Optional[Tuple[int, int]] = None
+    ) -> List[Tuple[str, str, dict, float]]:
+        """
+        Cosine top-k over one partition or all of them.
+
+        pages=(first, last) limits a single-document search to that page range.
+
+        Returns:
+            List of (text, document_id, metadata, similarity), best first
+        """
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        document_ids = [document_id] if document_id else self.document_ids()
+        hits = []
+
+        # Cross-document queries only open partitions with rows in the nearest corpus lists
+        corpus = self._corpus_posting(document_ids) if not document_id else None
+        if corpus is not None:
+            centroids, posting = corpus
+            probe = np.argsort(-(centroids @ query))[:settings.LOCAL_INDEX_NPROBE]
+            candidates = posting.select(probe)
+        else:
+            candidates = dict.fromkeys(document_ids)
+
+        for doc_id, candidate_rows in candidates.items():
+            part = self.partition(doc_id)
+            if part is None or len(part) == 0:
+                continue
+            if candidate_rows is not None:
+                # Guard against a partition rewritten since its lists were read
+                candidate_rows = candidate_rows[candidate_rows < len(part)]
+                rows, scores = _top_k(candidate_rows, part.dequantize(candidate_rows) @ query, k)
+            else:
+                mask = part.page_mask(pages) if pages and document_id else None
+                rows, scores = part.search(query, k, settings.LOCAL_INDEX_NPROBE, mask)
+            hits.extend((float(score), doc_id, int(row)) for row, score in zip(rows, scores))
+
+        hits.sort(key=lambda h: -h[0])
+        results = []
+        for score, doc_id, row in hits[:k]:
+            part = self.partition(doc_id)
+            results.append((part.text(row), doc_id, part.metadata(row), score))
+        return results
+
+    def delete(self, document_id: str) -> bool:
+        if not is_valid_document_id(document_id):
+            return False
+        with self._lock:
+            self._open.pop(document_id, None)
+            self._invalidate_lists(document_id)
+            path = self._path(document_id)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+                return True
+            return False
+
+    def count(self) -> int:
+        total = 0
+        for doc_id in self.document_ids():
+            with open(os.path.join(self._path(doc_id), COLUMNS_FILE)) as f:
+                total += json.load(f)["count"]
+        return total
+
+    def first_metadata(self, document_id: str) -> dict:
+        part = self.partition(document_id)
+        return part.metadata(0) if part is not None and len(part) else {}
+
+    def clear(self):
+        with self._lock:
+            self._open.clear()
+            self._corpus = None
+            self._corpus_mtime = None
+            self._doc_lists = {}
+            self._posting = None
+            if os.path.exists(self.root):
+                shutil.rmtree(self.root)
+            os.makedirs(self.root, exist_ok=True)
+
+
+_local_index = None
+_local_index_lock = threading.Lock()
+
+
+def get_local_index() -> LocalVectorIndex:
+    """Get or create the shared in-process index."""
+    global _local_index
+    if _local_index is None:
+        with _local_index_lock:
+            if _local_index is None:
+                _local_index = LocalVectorIndex(settings.LOCAL_INDEX_DIR)
+    return _local_index
@@ -0,0 +1,390 @@
+# Storage maintenance: orphan garbage collection, compaction and a reclaimed-bytes report
+import asyncio
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from app.config import settings
+from app.utils.executors import run_io
+from app.utils.metrics import counter, gauge
+
+# Chroma names HNSW segment directories after the segment id
+SEGMENT_DIR = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+LEASE_NAME = "maintenance"
+LEASE_SECONDS = 2 * 3600  # Expires on its own if the worker running maintenance dies
+
+RECLAIMED_BYTES = counter("scholarnet_maintenance_reclaimed_bytes_total", "Disk space freed by maintenance runs", ("store",))
+STORE_BYTES = gauge("scholarnet_store_bytes", "On-disk size of each store after the last maintenance run", ("store",))
+
+
+def store_paths() -> Dict[str, str]:
+    """On-disk stores of this app (the Chroma directory only when it is opened in-process)."""
+    paths = {}
+    if settings.VECTOR_BACKEND == "local":
+        paths["local_index"] = settings.LOCAL_INDEX_DIR
+    elif settings.CHROMA_MODE == "persistent":
+        paths["chroma"] = settings.CHROMA_DB_PATH
+    paths.update(
+        lexical=settings.LEXICAL_INDEX_DIR,
+        document_index=settings.DOCUMENT_INDEX_DIR,
+        uploads=settings.UPLOAD_DIR,
+        registry=settings.PARTITION_REGISTRY_PATH,
+        mastery=settings.MASTERY_DB_PATH
+    )
+    return paths
+
+
+def path_size(path: str, skip=()) -> int:
+    """Bytes used by a directory tree, or a file plus its SQLite -wal/-shm siblings."""
+    if not os.path.isdir(path):
+        files = [path, f"{path}-wal", f"{path}-shm"]
+        return sum(os.path.getsize(f) for f in files if os.path.isfile(f))
+
+    total = 0
+    for root, dirs, files in os.walk(path):
+        # Stores nested in another (lexical/ inside the Chroma directory) are counted once
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) not in skip]
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def measure() -> dict:
+    """Size of every store plus document and chunk counts."""
+    from app.utils.partitions import list_registered_documents
+    from app.utils.vector_store import get_collection_stats
+
+    paths = {name: os.path.abspath(path) for name, path in store_paths().items()}
+    sizes = {
+        name: path_size(path, skip={p for other, p in paths.items() if other != name})
+        for name, path in paths.items()
+    }
+    return {
+        "bytes": sizes,
+        "total_bytes": sum(sizes.values()),
+        "documents": len(list_registered_documents()),
+        "chunks": get_collection_stats().get("count", 0)
+    }
+
+
+def _old_enough(path: str) -> bool:
+    try:
+        return time.time() - os.path.getmtime(path) > settings.MAINTENANCE_GRACE_SECONDS
+    except FileNotFoundError:
+        return False
+
+
+def _remove(path: str, dry_run: bool) -> int:
+    """Delete a file or directory tree; returns the bytes it held."""
+    size = path_size(path)
+    if not dry_run:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+    return size
+
+
+def collect_uploads(dry_run: bool) -> dict:
+    """Files in UPLOAD_DIR left behind by interrupted uploads."""
+    removed, freed = 0, 0
+    if os.path.isdir(settings.UPLOAD_DIR):
+        for entry in os.scandir(settings.UPLOAD_DIR):
+            if entry.is_file() and _old_enough(entry.path):
+                freed += _remove(entry.path, dry_run)
+                removed += 1
+    return {"removed": removed, "bytes": freed}
+
+
+def collect_artifacts(dry_run: bool) -> dict:
+    """
+    Per-document files whose document is gone (lexical and document
+    indexes), and temp files of writes that never completed.
+    """
+    from app.utils.partitions import list_registered_documents
+    from app.utils.vector_store import document_exists
+
+    # path -> document it belongs to (None: temp file)
+    candidates: Dict[str, Optional[str]] = {}
+    if os.path.isdir(settings.LEXICAL_INDEX_DIR):
+        for name in os.listdir(settings.LEXICAL_INDEX_DIR):
+            path = os.path.join(settings.LEXICAL_INDEX_DIR, name)
+            if name.endswith(".tmp.npz"):
+                candidates[path] = None
+            elif name.endswith(".npz"):
+                candidates[path] = name[:-len(".npz")]
+    if os.path.isdir(settings.DOCUMENT_INDEX_DIR):
+        for entry in os.scandir(settings.DOCUMENT_INDEX_DIR):
+            if entry.is_dir():
+                candidates[entry.path] = entry.name
+    if settings.VECTOR_BACKEND == "local" and os.path.isdir(settings.LOCAL_INDEX_DIR):
+        # Partitions themselves are never collected: early ones predate the registry
+        for entry in os.scandir(settings.LOCAL_INDEX_DIR):
+            if entry.name.endswith(".tmp"):
+                candidates[entry.path] = None
+
+    registered = {entry["document_id"] for entry in list_registered_documents()}
+    exists: Dict[str, bool] = {}
+    removed, freed = 0, 0
+    for path, document_id in candidates.items():
+        if not _old_enough(path):
+            continue
+        if document_id is not None:
+            if document_id not in exists:
+                exists[document_id] = document_id in registered or document_exists(document_id)
+            if exists[document_id]:
+                continue
+        freed += _remove(path, dry_run)
+        removed += 1
+    return {"removed": removed, "bytes": freed}
+
+
+def _collect_orphans(names: set, by_collection: Dict[str, List[str]], dry_run: bool) -> Tuple[int, int]:
+    """Drop unregistered partition collections and unregistered documents' chunks; returns (collections, chunks)."""
+    from app.utils import vector_store
+    from app.utils.partitions import age_gc_candidates, forget_gc_candidates
+
+    grace = settings.MAINTENANCE_GRACE_SECONDS
+
+    # Whole partition collections nobody registered
+    orphans = [name for name in names if vector_store.is_partition_collection(name) and name not in by_collection]
+    expired = age_gc_candidates("collection", orphans, grace)
+    chunks = 0
+    for name in expired:
+        chunks += vector_store.get_partition_store(name)._collection.count()
+        if not dry_run:
+            vector_store.drop_collection(name)
+    if not dry_run:
+        forget_gc_candidates("collection", expired)
+
+    # Unregistered documents inside shared partitions
+    per_document_prefix = f"{vector_store.get_collection_name()}_d"
+    found: Dict[str, Dict[str, int]] = {}
+    for name, document_ids in by_collection.items():
+        if name not in names or not vector_store.is_partition_collection(name) or name.startswith(per_document_prefix):
+            continue
+        results = vector_store.get_partition_store(name)._collection.get(
+            where={"document_id": {"$nin": document_ids}},
+            include=["metadatas"]
+        )
+        for metadata in results.get("metadatas") or []:
+            if metadata and metadata.get("document_id"):
+                counts = found.setdefault(name, {})
+                counts[metadata["document_id"]] = counts.get(metadata["document_id"], 0) + 1
+
+    keys = [f"{name}/{doc_id}" for name, counts in found.items() for doc_id in counts]
+    expired_docs = age_gc_candidates("chunks", keys, grace)
+    for key in expired_docs:
+        name, doc_id = key.split("/", 1)
+        chunks += found[name][doc_id]
+        if not dry_run:
+            vector_store.get_partition_store(name)._collection.delete(where={"document_id": doc_id})
+    if not dry_run:
+        forget_gc_candidates("chunks", expired_docs)
+
+    return len(expired), chunks
+
+
+def collect_stale_chunks(dry_run: bool) -> dict:
+    """
+    Vector data no registered document owns.
+
+    Partition collections missing from the registry are dropped; in shared
+    (hash / tenant) partitions, chunks of unregistered documents are
+    deleted. Both are what an upload that failed between storing chunks
+    and registering the document leaves behind, so they must stay
+    orphaned for the grace period first. Registry entries whose partition
+    no longer exists are removed. The base collection is not scanned: it
+    holds documents stored before the registry existed.
+
+    With a Chroma server (CHROMA_MODE=http) other nodes write to the same
+    store with registries of their own, so nothing there can be called
+    orphaned from this node's registry; only stale registry entries are
+    removed.
+    """
+    from app.utils import vector_store
+    from app.utils.partitions import list_registered_documents, unregister_documents
+
+    entries = list_registered_documents()
+
+    if vector_store.use_local_index():
+        index = vector_store.get_local_index()
+        stale_entries = [e["document_id"] for e in entries if e["collection"] == "local" and not index.has_document(e["document_id"])]
+        if stale_entries and not dry_run:
+            unregister_documents(stale_entries)
+        return {"collections": 0, "chunks": 0, "registry_entries": len(stale_entries)}
+
+    names = set(vector_store.list_collection_names())
+    by_collection: Dict[str, List[str]] = {}
+    for entry in entries:
+        by_collection.setdefault(entry["collection"], []).append(entry["document_id"])
+
+    result = {"collections": 0, "chunks": 0}
+    if settings.CHROMA_MODE == "persistent":
+        result["collections"], result["chunks"] = _collect_orphans(names, by_collection, dry_run)
+    else:
+        result["skipped"] = "Chroma server is shared with other nodes"
+
+    # Registry entries pointing at dropped collections
+    stale_entries = [
+        doc_id for name, document_ids in by_collection.items()
+        if name != "local" and name not in names
+        for doc_id in document_ids
+    ]
+    if stale_entries and not dry_run:
+        unregister_documents(stale_entries)
+
+    result["registry_entries"] = len(stale_entries)
+    return result
+
+
+def collect_chroma_segments(dry_run: bool) -> dict:
+    """HNSW segment directories Chroma leaves on disk after a collection is dropped."""
+    db_path = os.path.join(settings.CHROMA_DB_PATH, "chroma.sqlite3")
+    if settings.VECTOR_BACKEND == "local" or settings.CHROMA_MODE != "persistent" or not os.path.exists(db_path):
+        return {"removed": 0, "bytes": 0}
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=30)
+    try:
+        live = {row[0] for row in conn.execute("SELECT id FROM segments")}
+    finally:
+        conn.close()
+
+    removed, freed = 0, 0
+    for entry in os.scandir(settings.CHROMA_DB_PATH):
+        if entry.is_dir() and SEGMENT_DIR.match(entry.name) and entry.name not in live and _old_enough(entry.path):
+            freed += _remove(entry.path, dry_run)
+            removed += 1
+    return {"removed": removed, "bytes": freed}
+
+
+def vacuum_sqlite(path: str) -> None:
+    """Rebuild a SQLite file without free pages and truncate its WAL."""
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+
+def vacuum_chroma() -> None:
+    """Purge Chroma's write-ahead log and VACUUM its SQLite file (chroma vacuum CLI)."""
+    command = [
+        sys.executable, "-c", "import sys; from chromadb.cli.cli import app; sys.argv[0] = 'chroma'; app()",
+        "vacuum", "--path", settings.CHROMA_DB_PATH, "--force",
+        "--timeout", str(settings.MAINTENANCE_VACUUM_TIMEOUT)
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True, timeout=settings.MAINTENANCE_VACUUM_TIMEOUT + 3600)
+    if completed.returncode != 0 or "Failed" in completed.stderr:
+        raise RuntimeError((completed.stderr or completed.stdout).strip()[-500:])
+
+
+def compact(dry_run: bool) -> dict:
+    """VACUUM the registry and mastery databases and, when opened in-process, Chroma."""
+    if dry_run or not settings.MAINTENANCE_VACUUM:
+        return {"skipped": True}
+
+    result = {}
+    for name, path in (("registry", settings.PARTITION_REGISTRY_PATH), ("mastery", settings.MASTERY_DB_PATH)):
+        if os.path.exists(path):
+            vacuum_sqlite(path)
+            result[name] = "vacuumed"
+
+    if settings.VECTOR_BACKEND != "local":
+        if settings.CHROMA_MODE != "persistent":
+            result["chroma"] = "skipped (Chroma server manages its own storage)"
+        elif os.path.exists(os.path.join(settings.CHROMA_DB_PATH, "chroma.sqlite3")):
+            vacuum_chroma()
+            result["chroma"] = "vacuumed"
+    return result
+
+
+def maintenance_steps() -> Dict[str, Callable[[bool], dict]]:
+    # Garbage first, so compaction reclaims the space it frees
+    return {
+        "uploads": collect_uploads,
+        "artifacts": collect_artifacts,
+        "stale_chunks": collect_stale_chunks,
+        "chroma_segments": collect_chroma_segments,
+        "compaction": compact,
+    }
+
+
+def run_maintenance(dry_run: bool = False) -> Optional[dict]:
+    """
+    Garbage-collect orphaned data, compact the stores and report the result.
+
+    Only one worker runs maintenance at a time (a lease in the registry
+    database). With dry_run nothing is deleted or compacted; the report
+    lists what would be removed.
+
+    Returns:
+        The report (also saved to the registry), or None if another
+        worker is already running maintenance
+    """
+    from app.utils.partitions import acquire_lease, release_lease, save_maintenance_report
+
+    if not acquire_lease(LEASE_NAME, LEASE_SECONDS):
+        return None
+
+    try:
+        started = time.time()
+        before = measure()
+        actions = {}
+        for name, step in maintenance_steps().items():
+            try:
+                actions[name] = step(dry_run)
+            except Exception as e:
+                print(f"❌ Maintenance step {name} failed: {e}")
+                actions[name] = {"error": str(e)}
+        after = measure()
+
+        reclaimed = {
+            store: before["bytes"][store] - after["bytes"].get(store, 0)
+            for store in before["bytes"]
+        }
+        report = {
+            "started_at": started,
+            "duration_s": round(time.time() - started, 3),
+            "dry_run": dry_run,
+            "before": before,
+            "after": after,
+            "reclaimed_bytes": reclaimed,
+            "total_reclaimed_bytes": before["total_bytes"] - after["total_bytes"],
+            "actions": actions
+        }
+        if dry_run:
+            report["reclaimable_bytes"] = sum(action.get("bytes", 0) for action in actions.values())
+        else:
+            for store, size in after["bytes"].items():
+                STORE_BYTES.set(size, store=store)
+                if reclaimed[store] > 0:
+                    RECLAIMED_BYTES.inc(reclaimed[store], store=store)
+
+        save_maintenance_report(report)
+        if dry_run:
+            print(f"🧹 Maintenance dry run: {report['reclaimable_bytes'] / 1e6:.1f} MB reclaimable")
+        else:
+            print(f"🧹 Maintenance finished in {report['duration_s']:.1f}s: {report['total_reclaimed_bytes'] / 1e6:.1f} MB reclaimed")
+        return report
+
+    finally:
+        release_lease(LEASE_NAME)
+
+
+async def maintenance_loop() -> None:
+    """Run maintenance every MAINTENANCE_INTERVAL_HOURS (started by the app lifespan)."""
+    while True:
+        await asyncio.sleep(settings.MAINTENANCE_INTERVAL_HOURS * 3600)
+        try:
+            await run_io(run_maintenance)
+        except Exception as e:
+            print(f"❌ Scheduled maintenance failed: {e}")
@@ -0,0 +1,274 @@
+# Vector store partitioning: which Chroma collection holds each document
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.config import settings
+
+PARTITION_STRATEGIES = ("single", "document", "hash", "tenant")
+
+_connection = None
+_lock = threading.Lock()
+
+
+def get_registry_db() -> sqlite3.Connection:
+    """Get or create the SQLite connection holding the document -> collection registry."""
+    global _connection
+
+    if _connection is None:
+        with _lock:
+            if _connection is None:
+                db_dir = os.path.dirname(settings.PARTITION_REGISTRY_PATH)
+                if db_dir:
+                    os.makedirs(db_dir, exist_ok=True)
+
+                conn = sqlite3.connect(settings.PARTITION_REGISTRY_PATH, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """CREATE TABLE IF NOT EXISTS document_partitions (
+                        document_id TEXT PRIMARY KEY,
+                        collection TEXT NOT NULL,
+                        tenant_id TEXT,
+                        filename TEXT,
+                        pages INTEGER NOT NULL DEFAULT 0,
+                        total_chunks INTEGER NOT NULL DEFAULT 0,
+                        created_at TEXT NOT NULL
+                    )"""
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_partitions_collection ON document_partitions (collection)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_partitions_tenant ON document_partitions (tenant_id)")
+                # Maintenance bookkeeping, shared by every worker using this registry
+                conn.execute(
+                    """CREATE TABLE IF NOT EXISTS gc_candidates (
+                        kind TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        first_seen REAL NOT NULL,
+                        PRIMARY KEY (kind, key)
+                    )"""
+                )
+                conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+                conn.execute(
+                    """CREATE TABLE IF NOT EXISTS maintenance_reports (
+                        started_at REAL PRIMARY KEY,
+                        report TEXT NOT NULL
+                    )"""
+                )
+                conn.commit()
+                _connection = conn
+
+    return _connection
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+
+def partition_for(base_name: str, document_id: str, tenant_id: Optional[str] = None) -> str:
+    """
+    Collection name for a new document under settings.VECTOR_PARTITIONING.
+
+    single: everything in the base collection (original layout)
+    document: one collection per document, so deleting it is a collection drop
+    hash: a fixed number of shards chosen by hash of document_id
+    tenant: one collection per tenant/course (untagged documents stay in the base collection)
+
+    Names are hashed to stay within Chroma's 63-character limit and charset.
+    """
+    strategy = settings.VECTOR_PARTITIONING
+
+    if strategy == "document":
+        return f"{base_name}_d{_digest(document_id)[:16]}"
+    if strategy == "hash":
+        shard = int(_digest(document_id), 16) % settings.VECTOR_HASH_SHARDS
+        return f"{base_name}_s{shard:03d}"
+    if strategy == "tenant" and tenant_id:
+        return f"{base_name}_t{_digest(tenant_id)[:16]}"
+    return base_name
+
+
+def register_document(
+    document_id: str,
+    collection: str,
+    tenant_id: Optional[str] = None,
+    filename: Optional[str] = None,
+    pages: int = 0,
+    total_chunks: int = 0
+) -> None:
+    conn = get_registry_db()
+    with _lock:
+        conn.execute(
+            """INSERT OR REPLACE INTO document_partitions
+               (document_id, collection, tenant_id, filename, pages, total_chunks, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (document_id, collection, tenant_id, filename, pages, total_chunks, datetime.now().isoformat())
+        )
+        conn.commit()
+
+
+def get_registered_documents(document_ids: List[str]) -> Dict[str, Dict]:
+    """Registry entries of many documents at once, keyed by document_id (unregistered ones are absent)."""
+    entries = {}
+    for i in range(0, len(document_ids), 500):
+        batch = document_ids[i:i + 500]
+        rows = get_registry_db().execute(
+            "SELECT document_id, collection, tenant_id FROM document_partitions"
+            f" WHERE document_id IN ({','.join('?' * len(batch))})",
+            batch
+        )
+        for row in rows:
+            entries[row[0]] = {"document_id": row[0], "collection": row[1], "tenant_id": row[2]}
+    return entries
+
+
+def get_document_collection(document_id: str) -> Optional[str]:
+    """Collection holding a document, or None for unregistered (pre-partitioning) documents."""
+    row = get_registry_db().execute(
+        "SELECT collection FROM document_partitions WHERE document_id = ?",
+        (document_id,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def get_registered_document(document_id: str) -> Optional[Dict]:
+    """Registry entry of one document, or None for unregistered (pre-partitioning) documents."""
+    row = get_registry_db().execute(
+        "SELECT collection, tenant_id FROM document_partitions WHERE document_id = ?",
+        (document_id,)
+    ).fetchone()
+    return {"document_id": document_id, "collection": row[0], "tenant_id": row[1]} if row else None
+
+
+def list_registered_documents(tenant_id: Optional[str] = None) -> List[Dict]:
+    query = "SELECT document_id, collection, tenant_id, filename, pages, total_chunks FROM document_partitions"
+    params = ()
+    if tenant_id is not None:
+        query += " WHERE tenant_id = ?"
+        params = (tenant_id,)
+
+    return [
+        {
+            "document_id": row[0],
+            "collection": row[1],
+            "tenant_id": row[2],
+            "filename": row[3],
+            "pages": row[4],
+            "total_chunks": row[5]
+        }
+        for row in get_registry_db().execute(query + " ORDER BY created_at", params)
+    ]
+
+
+def list_partitions() -> List[str]:
+    """Distinct collections that hold registered documents."""
+    rows = get_registry_db().execute("SELECT DISTINCT collection FROM document_partitions").fetchall()
+    return [row[0] for row in rows]
+
+
+def count_documents_in_collection(collection: str) -> int:
+    row = get_registry_db().execute(
+        "SELECT COUNT(*) FROM document_partitions WHERE collection = ?",
+        (collection,)
+    ).fetchone()
+    return row[0]
+
+
+def unregister_documents(document_ids: List[str]) -> None:
+    conn = get_registry_db()
+    with _lock:
+        conn.executemany(
+            "DELETE FROM document_partitions WHERE document_id = ?",
+            [(doc_id,) for doc_id in document_ids]
+        )
+        conn.commit()
+
+
+def clear_registry() -> None:
+    conn = get_registry_db()
+    with _lock:
+        conn.execute("DELETE FROM document_partitions")
+        conn.commit()
+
+
+def age_gc_candidates(kind: str, keys: List[str], grace_seconds: float) -> List[str]:
+    """
+    Record what a maintenance run found orphaned; return what is safe to delete.
+
+    A key qualifies once it has been seen orphaned for grace_seconds, so
+    the half-written state of an in-flight upload (chunks stored, registry
+    entry not yet written) is never collected. Keys no longer orphaned are
+    forgotten.
+    """
+    conn = get_registry_db()
+    now = time.time()
+    with _lock:
+        conn.executemany(
+            "INSERT OR IGNORE INTO gc_candidates (kind, key, first_seen) VALUES (?, ?, ?)",
+            [(kind, key, now) for key in keys]
+        )
+        stale = {
+            row[0] for row in conn.execute("SELECT key FROM gc_candidates WHERE kind = ?", (kind,))
+        } - set(keys)
+        conn.executemany("DELETE FROM gc_candidates WHERE kind = ? AND key = ?", [(kind, key) for key in stale])
+        conn.commit()
+        rows = conn.execute(
+            "SELECT key FROM gc_candidates WHERE kind = ? AND first_seen <= ?",
+            (kind, now - grace_seconds)
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def forget_gc_candidates(kind: str, keys: List[str]) -> None:
+    conn = get_registry_db()
+    with _lock:
+        conn.executemany("DELETE FROM gc_candidates WHERE kind = ? AND key = ?", [(kind, key) for key in keys])
+        conn.commit()
+
+
+def acquire_lease(name: str, ttl_seconds: float) -> bool:
+    """Take a named lease unless another worker holds an unexpired one."""
+    conn = get_registry_db()
+    now = time.time()
+    with _lock:
+        cursor = conn.execute(
+            """INSERT INTO leases (name, expires_at) VALUES (?, ?)
+               ON CONFLICT (name) DO UPDATE SET expires_at = excluded.expires_at
+               WHERE leases.expires_at < ?""",
+            (name, now + ttl_seconds, now)
+        )
+        conn.commit()
+    return cursor.rowcount == 1
+
+
+def release_lease(name: str) -> None:
+    conn = get_registry_db()
+    with _lock:
+        conn.execute("DELETE FROM leases WHERE name = ?", (name,))
+        conn.commit()
+
+
+def save_maintenance_report(report: Dict, keep: int = 50) -> None:
+    conn = get_registry_db()
+    with _lock:
+        conn.execute(
+            "INSERT OR REPLACE INTO maintenance_reports (started_at, report) VALUES (?, ?)",
+            (report["started_at"], json.dumps(report))
+        )
+        conn.execute(
+            """DELETE FROM maintenance_reports WHERE started_at NOT IN
+               (SELECT started_at FROM maintenance_reports ORDER BY started_at DESC LIMIT ?)""",
+            (keep,)
+        )
+        conn.commit()
+
+
+def list_maintenance_reports(limit: int = 10) -> List[Dict]:
+    """Most recent maintenance reports first."""
+    rows = get_registry_db().execute(
+        "SELECT report FROM maintenance_reports ORDER BY started_at DESC LIMIT ?",
+        (limit,)
+    ).fetchall()
+    return [json.loads(row[0]) for row in rows]
@@ -0,0 +1,142 @@
+# Opt-in sampling profiler for single requests (folded stacks + SVG flamegraph)
+import os
+import sys
+import threading
+import zlib
+from collections import Counter
+from html import escape
+from typing import Dict, Optional
+from app.config import settings
+
+# Only one profile at a time: samples are taken process-wide
+_profile_lock = threading.Lock()
+
+IDLE_FRAMES = ("wait (threading.py", "_worker (thread.py", "select (selectors.py")
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of all threads at a fixed interval.
+
+    The event loop thread and the IO pool are shared, so concurrent requests
+    show up in the same profile; profile on a quiet instance for clean results.
+    Work in the CPU process pool is not visible here.
+    """
+
+    def __init__(self, interval_ms: float = None):
+        self.interval = (interval_ms or settings.PROFILE_INTERVAL_MS) / 1000
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                # Skip idle threads: pool workers parked on their queue, the loop in select()
+                if frames and frames[0].startswith(IDLE_FRAMES):
+                    continue
+                frames.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(frames))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def folded(self) -> str:
+        """Brendan Gregg's folded format (flamegraph.pl, speedscope, inferno)."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+def render_flamegraph(stacks: Counter, title: str = "Request profile", width: int = 1200) -> str:
+    """Minimal SVG flamegraph (root at the bottom) from folded stack counts."""
+    root: Dict = {"count": 0, "children": {}}
+    for stack, count in stacks.items():
+        node = root
+        node["count"] += count
+        for frame in stack.split(";"):
+            node = node["children"].setdefault(frame, {"count": 0, "children": {}})
+            node["count"] += count
+
+    def depth(node) -> int:
+        return 1 + max((depth(child) for child in node["children"].values()), default=0)
+
+    row_height = 16
+    total = max(root["count"], 1)
+    height = (depth(root) + 1) * row_height + 30
+    rects = []
+
+    def draw(node, name, x, level):
+        w = node["count"] / total * width
+        if w < 0.5:
+            return
+        y = height - (level + 1) * row_height
+        # Warm palette, stable per frame name
+        hue = 20 + (zlib.crc32(name.encode()) % 35)
+        label = escape(name) if w > 40 else ""
+        tooltip = f"{escape(name)} ({node['count']} samples, {node['count'] / total:.1%})"
+        rects.append(
+            f'<g><title>{tooltip}</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row_height - 1}" fill="hsl({hue},90%,60%)"/>'
+            f'<text x="{x + 3:.1f}" y="{y + 11}" font-size="11">'
+            f'{label[:int(w / 7)]}</text></g>'
+        )
+        child_x = x
+        for child_name, child in sorted(node["children"].items()):
+            draw(child, child_name, child_x, level + 1)
+            child_x += child["count"] / total * width
+
+    draw(root, "all", 0.0, 0)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-family="monospace">'
+        f'<text x="4" y="16" font-size="13">{escape(title)} — {root["count"]} samples</text>'
+        + "".join(rects) + "</svg>\n"
+    )
+
+
+def try_start_profile() -> Optional[SamplingProfiler]:
+    """Start a profile unless one is already running (returns None then)."""
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = SamplingProfiler()
+    profiler.start()
+    return profiler
+
+
+def finish_profile(profiler: SamplingProfiler, name: str, title: str) -> Optional[str]:
+    """
+    Stop sampling and write `<name>.folded` and `<name>.svg` to PROFILE_DIR.
+
+    Returns:
+        Path of the SVG flamegraph, or None if writing failed
+    """
+    try:
+        profiler.stop()
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        base = os.path.join(settings.PROFILE_DIR, name)
+        with open(f"{base}.folded", "w") as f:
+            f.write(profiler.folded())
+        with open(f"{base}.svg", "w") as f:
+            f.write(render_flamegraph(profiler.stacks, title))
+        print(f"🔥 Profile written: {base}.svg ({profiler.samples} samples)")
+        return f"{base}.svg"
+    except Exception as e:
+        print(f"Error writing profile: {e}")
+        return None
+    finally:
+        _profile_lock.release()
@@ -0,0 +1,204 @@
+# Request-scoped span tracing (contextvars) with JSON-file or OTLP/HTTP export
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from app.config import settings
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    def __init__(self, trace: "Trace", name: str, parent: Optional["Span"], attributes: dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_id(64)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+            "thread": self.attributes.pop("_thread", None),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """All spans recorded while serving one sampled request."""
+
+    def __init__(self, name: str):
+        self.trace_id = _new_id(128)
+        self.name = name
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start_ns)
+        return {"trace_id": self.trace_id, "name": self.name, "spans": [s.to_dict() for s in spans]}
+
+
+def should_sample(header_value: Optional[str]) -> bool:
+    """Trace when the request asks for it (X-Trace, if TRACE_HEADER_ENABLED) or by TRACE_SAMPLE_RATE."""
+    # Clients must not be able to force a trace file per request unless allowed
+    if settings.TRACE_HEADER_ENABLED and header_value and header_value.lower() not in ("0", "false", "no"):
+        return True
+    return settings.TRACE_SAMPLE_RATE > 0 and random.random() < settings.TRACE_SAMPLE_RATE
+
+
+def start_trace(name: str) -> Trace:
+    trace = Trace(name)
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+
+def get_current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Record a span under the current one (no-op when the request is not traced).
+
+    Context variables follow asyncio tasks and run_io threads, so spans
+    opened in gathered coroutines or IO workers nest under their caller.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    current = Span(trace, name, _current_span.get(), attributes)
+    current.attributes["_thread"] = threading.current_thread().name
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace.add(current)
+
+
+def record_span(name: str, start_ns: int, end_ns: int, error: Optional[str] = None, **attributes) -> None:
+    """Add an already-finished span (e.g. an LLM call timed by a callback, or work done in a child process)."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    finished = Span(trace, name, _current_span.get(), attributes)
+    finished.attributes["_thread"] = threading.current_thread().name
+    finished.start_ns = start_ns
+    finished.end_ns = end_ns
+    finished.error = error
+    trace.add(finished)
+
+
+def _to_otlp(trace_dict: dict) -> dict:
+    def attribute(key, value):
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    spans = []
+    for s in trace_dict["spans"]:
+        otlp_span = {
+            "traceId": trace_dict["trace_id"],
+            "spanId": s["span_id"],
+            "name": s["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(s["start_ns"]),
+            "endTimeUnixNano": str(s["end_ns"] or s["start_ns"]),
+            "attributes": [attribute(k, v) for k, v in s["attributes"].items()]
+            + ([attribute("thread.name", s["thread"])] if s["thread"] else []),
+            "status": {"code": 2, "message": s["error"]} if s["error"] else {"code": 1},
+        }
+        if s["parent_id"]:
+            otlp_span["parentSpanId"] = s["parent_id"]
+        spans.append(otlp_span)
+
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [attribute("service.name", "scholarnet-api")]},
+            "scopeSpans": [{"scope": {"name": "app.utils.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+def _export(trace_dict: dict) -> None:
+    try:
+        if settings.TRACE_EXPORTER == "otlp":
+            request = urllib.request.Request(
+                settings.TRACE_OTLP_ENDPOINT,
+                data=json.dumps(_to_otlp(trace_dict)).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                method="POST"
+            )
+            urllib.request.urlopen(request, timeout=5).close()
+        else:
+            os.makedirs(settings.TRACE_DIR, exist_ok=True)
+            path = os.path.join(settings.TRACE_DIR, f"{trace_dict['trace_id']}.json")
+            with open(path, "w") as f:
+                json.dump(trace_dict, f, indent=2)
+            _rotate_trace_files()
+    except Exception as e:
+        print(f"Error exporting trace: {e}")
+
+
+def _rotate_trace_files() -> None:
+    """Keep at most TRACE_MAX_FILES JSON traces, deleting the oldest."""
+    if settings.TRACE_MAX_FILES <= 0:
+        return
+    with os.scandir(settings.TRACE_DIR) as entries:
+        files = [entry for entry in entries if entry.is_file() and entry.name.endswith(".json")]
+    if len(files) <= settings.TRACE_MAX_FILES:
+        return
+    files.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in files[:len(files) - settings.TRACE_MAX_FILES]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            # Another export thread got there first
+            pass
+
+
+def finish_trace(trace: Trace, attributes: Optional[Dict] = None) -> None:
+    """Export a finished trace on a background thread (never blocks the response)."""
+    trace_dict = trace.to_dict()
+    if attributes:
+        trace_dict.update(attributes)
+    threading.Thread(target=_export, args=(trace_dict,), name="trace-export", daemon=True).start()
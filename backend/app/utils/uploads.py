@@ -0,0 +1,203 @@
+# Streaming multipart uploads: size-limited while receiving, hashed, kept in memory or spooled to disk
+import hashlib
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple, Union
+from fastapi import HTTPException, Request
+from python_multipart import MultipartParser
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
+from app.config import settings
+from app.utils.executors import run_io
+from app.utils.metrics import counter
+
+# Multipart boundaries and small form fields on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+MAX_FIELD_SIZE = 64 * 1024
+
+UPLOADS_RECEIVED = counter("scholarnet_uploads_received_total", "Uploaded files by where they were buffered", ("storage",))
+UPLOADS_REJECTED = counter("scholarnet_uploads_rejected_total", "Uploads refused while receiving", ("reason",))
+
+# OpenAPI description for routes that parse the multipart body themselves
+PDF_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary"},
+                        "course_id": {"type": "string"},
+                        "document_id": {"type": "string", "description": "Re-upload a revised version of this stored document"}
+                    }
+                }
+            }
+        }
+    }
+}
+
+
+class ReceivedFile:
+    """
+    An uploaded file, received chunk by chunk.
+
+    Up to UPLOAD_MEMORY_LIMIT bytes stay in memory (PDF readers open them
+    directly); larger uploads are spooled to a temp file in UPLOAD_DIR.
+    Size and SHA-256 are computed while receiving. Call cleanup() when done.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.size = 0
+        self.path: Optional[str] = None
+        self._buffer = bytearray()
+        self._file = None
+        self._hash = hashlib.sha256()
+
+    async def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > settings.MAX_FILE_SIZE:
+            UPLOADS_REJECTED.inc(reason="too_large")
+            raise HTTPException(status_code=413, detail="File size exceeds limit")
+        self._hash.update(data)
+
+        if self._file is None and self.size > settings.UPLOAD_MEMORY_LIMIT:
+            await run_io(self._spill)
+        if self._file is None:
+            self._buffer += data
+        else:
+            await run_io(self._file.write, data)
+
+    def _spill(self) -> None:
+        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(suffix=".pdf", prefix="upload-", dir=settings.UPLOAD_DIR)
+        self._file = os.fdopen(fd, "wb")
+        self._file.write(self._buffer)
+        self._buffer = bytearray()
+
+    def finish(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        UPLOADS_RECEIVED.inc(storage="memory" if self.path is None else "disk")
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        """What the PDF readers open: the bytes, or the temp file path when spooled."""
+        return bytes(self._buffer) if self.path is None else self.path
+
+    def cleanup(self) -> None:
+        """Release the buffer and delete the temp file (safe to call more than once)."""
+        self._buffer = bytearray()
+        if self._file is not None:
+            self._file.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+async def receive_upload(request: Request, file_field: str = "file") -> Tuple[ReceivedFile, Dict[str, str]]:
+    """
+    Parse a multipart/form-data body as it arrives.
+
+    A Content-Length above the limit is refused before the body is read;
+    otherwise the upload is aborted as soon as the file passes
+    MAX_FILE_SIZE or turns out not to be an allowed file type.
+
+    Returns:
+        (received file, other form fields)
+
+    Raises:
+        HTTPException: 400 for a malformed request or wrong file type, 413 when too large
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD:
+        UPLOADS_REJECTED.inc(reason="too_large")
+        raise HTTPException(status_code=413, detail="File size exceeds limit")
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    fields: Dict[str, str] = {}
+    received: Optional[ReceivedFile] = None
+    # Parser callbacks are synchronous; file data is written after each feed
+    pending: List[bytes] = []
+    part = {}
+
+    def on_part_begin():
+        part.clear()
+        part.update(headers={}, header_name=b"", header_value=b"", data=bytearray(), is_file=False)
+
+    def on_header_field(data: bytes, start: int, end: int):
+        part["header_name"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        part["header_value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["header_name"].lower()] = part["header_value"]
+        part["header_name"], part["header_value"] = b"", b""
+
+    def on_headers_finished():
+        nonlocal received
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        part["name"] = options.get(b"name", b"").decode("utf-8", "replace")
+        if part["name"] == file_field and b"filename" in options:
+            if received is not None:
+                raise HTTPException(status_code=400, detail="Only one file per upload")
+            filename = os.path.basename(options[b"filename"].decode("utf-8", "replace"))
+            if os.path.splitext(filename)[1].lower() not in settings.ALLOWED_EXTENSIONS:
+                UPLOADS_REJECTED.inc(reason="file_type")
+                raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+            received = ReceivedFile(filename)
+            part["is_file"] = True
+
+    def on_part_data(data: bytes, start: int, end: int):
+        if part["is_file"]:
+            pending.append(data[start:end])
+            return
+        part["data"] += data[start:end]
+        if len(part["data"]) > MAX_FIELD_SIZE:
+            raise HTTPException(status_code=400, detail=f"Form field {part['name']} is too large")
+
+    def on_part_end():
+        if not part["is_file"]:
+            fields[part["name"]] = part["data"].decode("utf-8", "replace")
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for data in pending:
+                await received.write(data)
+            pending.clear()
+        parser.finalize()
+
+        if received is None:
+            raise HTTPException(status_code=400, detail=f"No file in form field '{file_field}'")
+        received.finish()
+        return received, fields
+
+    except MultipartParseError as e:
+        if received is not None:
+            await run_io(received.cleanup)
+        raise HTTPException(status_code=400, detail=f"Invalid upload: {e}")
+    except BaseException:
+        # Includes client disconnects and cancellation
+        if received is not None:
+            await run_io(received.cleanup)
+        raise
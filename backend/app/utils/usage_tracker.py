@@ -0,0 +1,343 @@
+# Token, latency and cost accounting for LLM and embedding calls
+import threading
+import time
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, List, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from langchain_core.outputs import LLMResult
+from app.utils.metrics import counter, histogram
+from app.utils.tracing import record_span
+
+# USD per 1M tokens (input, output); embedding models only have input
+MODEL_PRICING = {
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-5-nano": (0.05, 0.40),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+
+MODEL_LATENCY = histogram("scholarnet_model_call_duration_seconds", "LLM and embedding call latency", ("kind", "model"))
+MODEL_TOKENS = counter("scholarnet_model_tokens_total", "Tokens sent to and received from models", ("kind", "model"))
+
+_current_usage: ContextVar[Optional["RequestUsage"]] = ContextVar("request_usage", default=None)
+
+_stats_lock = threading.Lock()
+_rollups: Dict[str, Dict[str, dict]] = {"endpoint": {}, "document": {}, "model": {}}
+_totals: dict = {}
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int = 0) -> float:
+    # Versioned names ("gpt-3.5-turbo-0125") price like their base model
+    for name, (input_price, output_price) in MODEL_PRICING.items():
+        if model and model.startswith(name):
+            return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+    return 0.0
+
+
+def _empty_totals() -> dict:
+    return {
+        "requests": 0,
+        "llm_calls": 0,
+        "embedding_calls": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "embedding_tokens": 0,
+        "llm_ms": 0.0,
+        "embedding_ms": 0.0,
+        "cost_usd": 0.0,
+    }
+
+
+def _add(target: dict, totals: dict) -> None:
+    for key, value in totals.items():
+        target[key] = target.get(key, 0) + value
+
+
+class RequestUsage:
+    """Calls made while serving one request (shared by every task the request spawns)."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.document_ids: List[str] = []
+        self.calls: List[dict] = []
+        self._lock = threading.Lock()
+        # Streamed bodies outlive the handler; see defer_until_streamed
+        self.deferred = False
+        self.stream_done = False
+        self.rollup_endpoint: Optional[str] = None
+
+    def add_call(self, call: dict) -> None:
+        with self._lock:
+            self.calls.append(call)
+
+    def totals(self) -> dict:
+        totals = _empty_totals()
+        with self._lock:
+            calls = list(self.calls)
+        for call in calls:
+            if call["kind"] == "llm":
+                totals["llm_calls"] += 1
+                totals["prompt_tokens"] += call["prompt_tokens"]
+                totals["completion_tokens"] += call["completion_tokens"]
+                totals["llm_ms"] += call["latency_ms"]
+            else:
+                totals["embedding_calls"] += 1
+                totals["embedding_tokens"] += call["tokens"]
+                totals["embedding_ms"] += call["latency_ms"]
+            totals["cost_usd"] += call["cost_usd"]
+        totals["llm_ms"] = round(totals["llm_ms"], 1)
+        totals["embedding_ms"] = round(totals["embedding_ms"], 1)
+        totals["cost_usd"] = round(totals["cost_usd"], 6)
+        return totals
+
+    def summary(self) -> dict:
+        """Per-request usage as returned in API responses."""
+        totals = self.totals()
+        totals.pop("requests")
+        return totals
+
+
+def start_request_usage(endpoint: str) -> RequestUsage:
+    usage = RequestUsage(endpoint)
+    _current_usage.set(usage)
+    return usage
+
+
+def get_request_usage() -> Optional[RequestUsage]:
+    return _current_usage.get()
+
+
+def usage_summary() -> Optional[dict]:
+    """Usage of the request being served so far, or None outside a request."""
+    usage = _current_usage.get()
+    return usage.summary() if usage else None
+
+
+def tag_usage(document_id: Optional[str] = None) -> None:
+    """Attribute the current request's usage to a stored document."""
+    usage = _current_usage.get()
+    if usage and document_id and document_id not in usage.document_ids:
+        usage.document_ids.append(document_id)
+
+
+def defer_until_streamed(body: AsyncIterator) -> AsyncIterator:
+    """
+    Keep the current request's accounting open until a streamed body ends.
+
+    The middleware rolls a request up as soon as the handler returns, but a
+    StreamingResponse makes its LLM calls while the body is being sent.
+    Whichever of the two finishes last does the (single) rollup.
+
+    Args:
+        body: Async iterator passed to StreamingResponse
+    
+    Returns:
+        Wrapped iterator
+    """
+    usage = _current_usage.get()
+    if usage is None:
+        return body
+    usage.deferred = True
+    
+    async def wrapped():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            usage.stream_done = True
+            if usage.rollup_endpoint is not None:
+                finish_request_usage(usage, usage.rollup_endpoint)
+    
+    return wrapped()
+
+
+def close_request_usage(usage: RequestUsage, endpoint: str) -> None:
+    """Roll up a request once its handler returns, unless its streamed body is still running."""
+    if usage.deferred and not usage.stream_done:
+        usage.rollup_endpoint = endpoint
+        return
+    finish_request_usage(usage, endpoint)
+
+
+def finish_request_usage(usage: RequestUsage, endpoint: Optional[str] = None) -> None:
+    """Fold a finished request into the per-endpoint, per-document and per-model rollups."""
+    totals = usage.totals()
+    totals["requests"] = 1
+    endpoint = endpoint or usage.endpoint
+
+    by_model: Dict[str, dict] = {}
+    for call in usage.calls:
+        if call["model"] not in by_model:
+            by_model[call["model"]] = _empty_totals()
+            del by_model[call["model"]]["requests"]
+        model_totals = by_model[call["model"]]
+        model_totals["cost_usd"] += call["cost_usd"]
+        if call["kind"] == "llm":
+            model_totals["llm_calls"] += 1
+            model_totals["prompt_tokens"] += call["prompt_tokens"]
+            model_totals["completion_tokens"] += call["completion_tokens"]
+            model_totals["llm_ms"] += call["latency_ms"]
+        else:
+            model_totals["embedding_calls"] += 1
+            model_totals["embedding_tokens"] += call["tokens"]
+            model_totals["embedding_ms"] += call["latency_ms"]
+
+    with _stats_lock:
+        _add(_totals, totals)
+        _add(_rollups["endpoint"].setdefault(endpoint, {}), totals)
+        for document_id in usage.document_ids:
+            _add(_rollups["document"].setdefault(document_id, {}), totals)
+        for model, model_totals in by_model.items():
+            _add(_rollups["model"].setdefault(model, {}), model_totals)
+
+
+def _record(call: dict) -> None:
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.add_call(call)
+        return
+
+    # Outside a request (background work): count it under its own bucket
+    background = RequestUsage("background")
+    background.add_call(call)
+    finish_request_usage(background)
+
+
+def record_llm_call(model: str, prompt_tokens: int, completion_tokens: int, latency_ms: float) -> None:
+    MODEL_LATENCY.observe(latency_ms / 1000, kind="llm", model=model)
+    MODEL_TOKENS.inc(prompt_tokens, kind="prompt", model=model)
+    MODEL_TOKENS.inc(completion_tokens, kind="completion", model=model)
+    _record({
+        "kind": "llm",
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "latency_ms": latency_ms,
+        "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens)
+    })
+
+
+def record_embedding_call(model: str, tokens: int, num_texts: int, latency_ms: float) -> None:
+    MODEL_LATENCY.observe(latency_ms / 1000, kind="embedding", model=model)
+    MODEL_TOKENS.inc(tokens, kind="embedding", model=model)
+    _record({
+        "kind": "embedding",
+        "model": model,
+        "tokens": tokens,
+        "texts": num_texts,
+        "latency_ms": latency_ms,
+        "cost_usd": estimate_cost(model, tokens)
+    })
+
+
+def _rounded(totals: dict) -> dict:
+    return {key: round(value, 6) if isinstance(value, float) else value for key, value in totals.items()}
+
+
+def get_usage_stats() -> dict:
+    """Totals and rollups since startup (or the last reset)."""
+    with _stats_lock:
+        return {
+            "totals": _rounded(_totals),
+            "by_endpoint": {name: _rounded(t) for name, t in _rollups["endpoint"].items()},
+            "by_document": {name: _rounded(t) for name, t in _rollups["document"].items()},
+            "by_model": {name: _rounded(t) for name, t in _rollups["model"].items()},
+        }
+
+
+def reset_usage_stats() -> None:
+    with _stats_lock:
+        _totals.clear()
+        for rollup in _rollups.values():
+            rollup.clear()
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback that records token usage and latency of chat model calls.
+
+    Runs inline so the request context (and its RequestUsage) is visible.
+    """
+
+    run_inline = True
+
+    def __init__(self, model: str):
+        self.model = model
+        # run_id -> (perf_counter, wall-clock ns) at call start
+        self._started: Dict[UUID, tuple] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._started[run_id] = (time.perf_counter(), time.time_ns())
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._started[run_id] = (time.perf_counter(), time.time_ns())
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        started, started_ns = self._started.pop(run_id, (None, None))
+        latency_ms = (time.perf_counter() - started) * 1000 if started else 0.0
+
+        llm_output = response.llm_output or {}
+        token_usage = llm_output.get("token_usage") or {}
+        prompt_tokens = token_usage.get("prompt_tokens", 0)
+        completion_tokens = token_usage.get("completion_tokens", 0)
+
+        if not token_usage:
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    prompt_tokens += metadata.get("input_tokens", 0)
+                    completion_tokens += metadata.get("output_tokens", 0)
+
+        model = llm_output.get("model_name") or self.model
+        record_llm_call(model, prompt_tokens, completion_tokens, latency_ms)
+        if started_ns:
+            record_span(
+                "llm_call", started_ns, time.time_ns(),
+                model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+            )
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started:
+            record_span("llm_call", started[1], time.time_ns(), error=f"{type(error).__name__}: {error}", model=self.model)
+
+
+class TrackedEmbeddings(Embeddings):
+    """
+    Wraps an embedding backend to record texts, tokens and latency per call.
+
+    Tokens are counted with tiktoken only for billed (OpenAI) models; local
+    backends report zero tokens.
+    """
+
+    def __init__(self, inner: Embeddings, model: str, count_tokens: bool):
+        self.inner = inner
+        self.model = model
+        self.count_tokens = count_tokens
+
+    def _tokens(self, texts: List[str]) -> int:
+        if not self.count_tokens:
+            return 0
+        from app.utils.context_packer import count_tokens
+        return sum(count_tokens(text, self.model) for text in texts)
+
+    def _record(self, texts: List[str], start: float, start_ns: int) -> None:
+        tokens = self._tokens(texts)
+        record_embedding_call(self.model, tokens, len(texts), (time.perf_counter() - start) * 1000)
+        record_span("embed", start_ns, time.time_ns(), model=self.model, texts=len(texts), tokens=tokens)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        start, start_ns = time.perf_counter(), time.time_ns()
+        vectors = self.inner.embed_documents(texts)
+        self._record(texts, start, start_ns)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        start, start_ns = time.perf_counter(), time.time_ns()
+        vector = self.inner.embed_query(text)
+        self._record([text], start, start_ns)
+        return vector
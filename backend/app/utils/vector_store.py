@@ -1,80 +1,302 @@
 # ChromaDB initialization - FIXED for newer ChromaDB versions
-import chromadb
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
+# chromadb and langchain_community load on first use (they dominate app import time)
 from app.config import settings
-from typing import Optional
+from app.utils.embeddings import get_embeddings
+from app.utils.lexical_index import clear_lexical_cache, list_lexical_documents, delete_lexical_index
+from app.utils.local_index import get_local_index
+from app.utils.executors import get_fanout_executor
+from app.utils.helpers import chunk_hash
+from app.utils.metrics import counter, timed_stage
+from app.utils.partitions import (
+    partition_for,
+    register_document,
+    get_registered_document,
+    get_registered_documents,
+    list_registered_documents,
+    list_partitions,
+    count_documents_in_collection,
+    unregister_documents,
+    clear_registry
+)
+from langchain_core.documents import Document
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+import functools
 import os
-import shutil
+import re
+import threading
 import uuid
 
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+
 _vector_store = None
 _chroma_client = None
+_partition_stores = {}
+_partition_lock = threading.Lock()
+_client_lock = threading.RLock()
+
+REVISED_CHUNKS = counter(
+    "scholarnet_revised_chunks_total",
+    "Chunks of re-uploaded documents by outcome (added = embedded again)",
+    ("outcome",)
+)
+REVISION_BATCH_SIZE = 1000  # Ids per Chroma update/delete call
 
 
 def get_chroma_client():
-    """Get or create ChromaDB client with proper settings."""
+    """
+    Get or create the ChromaDB client (thread-safe).
+    
+    CHROMA_MODE=persistent opens CHROMA_DB_PATH in-process, which only one
+    worker process may do. CHROMA_MODE=http talks to a Chroma server over
+    a pooled keep-alive HTTP client, so any number of API workers and
+    nodes can share one index.
+    """
     global _chroma_client
     
     if _chroma_client is None:
-        os.makedirs(settings.CHROMA_DB_PATH, exist_ok=True)
-        
-        # Use PersistentClient for newer ChromaDB versions (0.4.0+)
-        _chroma_client = chromadb.PersistentClient(
-            path=settings.CHROMA_DB_PATH
-        )
+        with _client_lock:
+            if _chroma_client is None:
+                import chromadb
+                
+                if settings.CHROMA_MODE == "http":
+                    from chromadb.config import Settings as ChromaSettings
+                    headers = {"Authorization": f"Bearer {settings.CHROMA_AUTH_TOKEN}"} if settings.CHROMA_AUTH_TOKEN else None
+                    _chroma_client = chromadb.HttpClient(
+                        host=settings.CHROMA_HOST,
+                        port=settings.CHROMA_PORT,
+                        ssl=settings.CHROMA_SSL,
+                        headers=headers,
+                        settings=ChromaSettings(
+                            anonymized_telemetry=False,
+                            chroma_http_max_connections=settings.CHROMA_HTTP_MAX_CONNECTIONS,
+                            chroma_http_max_keepalive_connections=settings.CHROMA_HTTP_MAX_CONNECTIONS,
+                            chroma_http_keepalive_secs=settings.CHROMA_HTTP_KEEPALIVE_SECS
+                        )
+                    )
+                else:
+                    os.makedirs(settings.CHROMA_DB_PATH, exist_ok=True)
+                    
+                    # Use PersistentClient for newer ChromaDB versions (0.4.0+)
+                    _chroma_client = chromadb.PersistentClient(
+                        path=settings.CHROMA_DB_PATH
+                    )
     
     return _chroma_client
 
 
-def get_vector_store() -> Chroma:
+def reset_store_cache() -> None:
+    """Forget cached collection wrappers; they are recreated on next use."""
+    global _vector_store
+    with _partition_lock:
+        _partition_stores.clear()
+    with _client_lock:
+        _vector_store = None
+
+
+def _is_dropped_collection(error: Exception) -> bool:
+    """A cached wrapper points at a collection that was dropped (e.g. cleared by another worker)."""
+    return type(error).__name__ in ("NotFoundError", "InvalidCollectionException") or "does not exist" in str(error)
+
+
+def retry_on_dropped_collection(func):
+    """Run func again with fresh collection wrappers if its collection was dropped meanwhile."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if not _is_dropped_collection(e):
+                raise
+            reset_store_cache()
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def get_collection_name() -> str:
+    """
+    Collection for the configured embedding backend.
+    
+    Backends produce vectors of different sizes, so each gets its own
+    collection; the OpenAI backend keeps the original name.
+    """
+    if settings.EMBEDDING_BACKEND == "openai":
+        return "scholarnet_docs"
+    return f"scholarnet_docs_{settings.EMBEDDING_BACKEND}"
+
+
+def get_vector_store() -> "Chroma":
     """Get or initialize ChromaDB vector store with optimized settings."""
     global _vector_store
     
     if _vector_store is None:
-        embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            openai_api_key=settings.OPENAI_API_KEY
-        )
-        
-        os.makedirs(settings.CHROMA_DB_PATH, exist_ok=True)
+        from langchain_community.vectorstores import Chroma
+        embeddings = get_embeddings()
         
         # Get the client
         client = get_chroma_client()
         
-        _vector_store = Chroma(
-            client=client,
-            embedding_function=embeddings,
-            collection_name="scholarnet_docs"
-        )
+        with _client_lock:
+            if _vector_store is None:
+                _vector_store = Chroma(
+                    client=client,
+                    embedding_function=embeddings,
+                    collection_name=get_collection_name()
+                )
     
     return _vector_store
 
 
-def get_optimized_retriever(k: int = 2, search_type: str = "similarity"):
-    """Get optimized retriever for fast queries."""
-    vector_store = get_vector_store()
+def get_partition_store(collection_name: str) -> "Chroma":
+    """Get or create the Chroma wrapper for one partition collection."""
+    if collection_name == get_collection_name():
+        return get_vector_store()
     
-    if search_type == "mmr":
-        return vector_store.as_retriever(
-            search_type="mmr",
-            search_kwargs={
-                "k": k,
-                "lambda_mult": 0.5
-            }
-        )
+    store = _partition_stores.get(collection_name)
+    if store is None:
+        with _partition_lock:
+            store = _partition_stores.get(collection_name)
+            if store is None:
+                from langchain_community.vectorstores import Chroma
+                store = Chroma(
+                    client=get_chroma_client(),
+                    embedding_function=get_embeddings(),
+                    collection_name=collection_name
+                )
+                _partition_stores[collection_name] = store
+    return store
+
+
+def shared_store() -> bool:
+    """True when several nodes use one Chroma server (CHROMA_MODE=http), each with its own registry."""
+    return not use_local_index() and settings.CHROMA_MODE == "http"
+
+
+def partition_names() -> List[str]:
+    """
+    Partition collections holding documents.
+    
+    Taken from the registry, except with a shared Chroma server: other
+    nodes register their documents in their own registries, so the
+    server's collection list is authoritative.
+    """
+    if shared_store():
+        return [name for name in list_collection_names() if is_partition_collection(name)]
+    return list_partitions()
+
+
+def _server_entries(where: Optional[dict] = None, names: Optional[List[str]] = None, limit: Optional[int] = None) -> Dict[str, dict]:
+    """Documents found in partition collections on the Chroma server, as registry-style entries."""
+    entries = {}
+    for name in partition_names() if names is None else names:
+        results = get_partition_store(name)._collection.get(where=where, limit=limit, include=["metadatas"])
+        for metadata in results.get("metadatas") or []:
+            doc_id = (metadata or {}).get("document_id")
+            if doc_id and doc_id not in entries:
+                entries[doc_id] = {
+                    "document_id": doc_id,
+                    "collection": name,
+                    "tenant_id": metadata.get("tenant_id"),
+                    "filename": metadata.get("source"),
+                    "pages": metadata.get("pages", 0),
+                    "total_chunks": metadata.get("total_chunks", 1)
+                }
+    return entries
+
+
+def _document_entry(document_id: str) -> Optional[dict]:
+    """
+    Registry entry of a document, or None for unregistered (pre-partitioning) documents.
+    
+    With a shared Chroma server a document stored by another node is
+    looked up on the server: its partition follows from the id (document
+    and hash layouts) or is one of the tenant collections.
+    """
+    entry = get_registered_document(document_id)
+    if entry is not None or not shared_store():
+        return entry
+    
+    names = set(list_collection_names())
+    if settings.VECTOR_PARTITIONING in ("document", "hash"):
+        candidates = [partition_for(get_collection_name(), document_id)]
+    elif settings.VECTOR_PARTITIONING == "tenant":
+        candidates = [name for name in names if is_partition_collection(name)]
     else:
-        return vector_store.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k": k}
+        return None
+    found = _server_entries({"document_id": document_id}, [name for name in candidates if name in names], limit=1)
+    return found.get(document_id)
+
+
+def get_document_store(document_id: str) -> "Chroma":
+    """Partition holding a document (documents stored before partitioning live in the base collection)."""
+    entry = _document_entry(document_id)
+    return get_partition_store(entry["collection"] if entry else get_collection_name())
+
+
+def _search_partitions() -> List["Chroma"]:
+    """Every partition a cross-document query has to visit."""
+    base_name = get_collection_name()
+    names = [name for name in partition_names() if name != base_name]
+    stores = [get_partition_store(name) for name in names]
+    
+    base = get_vector_store()
+    if base._collection.count() > 0:
+        stores.append(base)
+    return stores
+
+
+def document_where(document_id: str, pages: Optional[Tuple[int, int]] = None) -> dict:
+    """
+    Chroma where clause selecting a document's chunks.
+    
+    With pages=(first, last), only chunks whose page span overlaps that
+    range match (documents stored before page tracking have no spans).
+    """
+    if not pages:
+        return {"document_id": document_id}
+    first, last = pages
+    return {"$and": [
+        {"document_id": document_id},
+        {"page_start": {"$lte": last}},
+        {"page_end": {"$gte": first}}
+    ]}
+
+
+def use_local_index() -> bool:
+    """True when VECTOR_BACKEND selects the in-process index instead of Chroma."""
+    return settings.VECTOR_BACKEND == "local"
+
+
+@retry_on_dropped_collection
+def _add_texts(collection_name: str, texts: list, metadatas: list) -> None:
+    vector_store = get_partition_store(collection_name)
+    
+    # Add texts in batches
+    batch_size = 50
+    for i in range(0, len(texts), batch_size):
+        batch_texts = texts[i:i + batch_size]
+        batch_metadatas = metadatas[i:i + batch_size]
+        
+        vector_store.add_texts(
+            texts=batch_texts,
+            metadatas=batch_metadatas
         )
 
 
-def add_documents_to_store(texts: list, metadatas: list = None, document_id: str = None) -> bool:
-    """Add documents to the vector store with document ID."""
+@timed_stage("vector_add")
+def add_documents_to_store(
+    texts: list,
+    metadatas: list = None,
+    document_id: str = None,
+    tenant_id: str = None
+) -> bool:
+    """
+    Add documents to the vector store with document ID.
+    
+    The target collection follows settings.VECTOR_PARTITIONING; tenant_id
+    (e.g. a course) groups documents that can later be dropped together.
+    """
     try:
-        vector_store = get_vector_store()
-        
         # Generate document ID if not provided
         if not document_id:
             document_id = str(uuid.uuid4())
@@ -86,16 +308,29 @@ def add_documents_to_store(texts: list, metadatas: list = None, document_id: str
         else:
             metadatas = [{'document_id': document_id} for _ in texts]
         
-        # Add texts in batches
-        batch_size = 50
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            batch_metadatas = metadatas[i:i + batch_size]
-            
-            vector_store.add_texts(
-                texts=batch_texts,
-                metadatas=batch_metadatas
+        if tenant_id:
+            for metadata in metadatas:
+                metadata['tenant_id'] = tenant_id
+        
+        first = metadatas[0] if metadatas else {}
+        
+        if use_local_index():
+            embeddings = get_embeddings().embed_documents(texts)
+            get_local_index().add(document_id, embeddings, texts, metadatas)
+            register_document(
+                document_id, "local", tenant_id,
+                first.get('source'), first.get('pages', 0), len(texts)
             )
+            print(f"✅ Successfully added {len(texts)} chunks for document {document_id}")
+            return True
+        
+        collection_name = partition_for(get_collection_name(), document_id, tenant_id)
+        _add_texts(collection_name, texts, metadatas)
+        
+        register_document(
+            document_id, collection_name, tenant_id,
+            first.get('source'), first.get('pages', 0), len(texts)
+        )
         
         # NOTE: persist() is no longer needed with PersistentClient
         # ChromaDB auto-persists with PersistentClient
@@ -109,19 +344,173 @@ def add_documents_to_store(texts: list, metadatas: list = None, document_id: str
         return False
 
 
-def get_document_by_id(document_id: str) -> Optional[dict]:
+def document_exists(document_id: str) -> bool:
+    """Whether a document has chunks in the store."""
+    if use_local_index():
+        return get_local_index().has_document(document_id)
+    if _document_entry(document_id):
+        return True
+    # Documents stored before the partition registry existed
+    results = _get_document_results(document_id, [])
+    return bool(results and results.get('ids'))
+
+
+def match_chunks(old_hashes: List[str], new_hashes: List[str]) -> Tuple[List[Tuple[int, int]], List[int], List[int]]:
+    """
+    Pair the chunks of a revised document with the stored ones by content hash.
+    
+    Returns:
+        (kept (old, new) index pairs, new indices to embed, stale old indices)
+    """
+    available: Dict[str, List[int]] = {}
+    for i, digest in enumerate(old_hashes):
+        available.setdefault(digest, []).append(i)
+    
+    kept, added = [], []
+    for j, digest in enumerate(new_hashes):
+        if available.get(digest):
+            kept.append((available[digest].pop(0), j))
+        else:
+            added.append(j)
+    
+    removed = sorted(i for indices in available.values() for i in indices)
+    return kept, added, removed
+
+
+def _stored_hashes(texts: List[str], metadatas: List[dict]) -> List[str]:
+    # Chunks stored before hashing existed are hashed from their text
+    return [(m or {}).get("chunk_hash") or chunk_hash(text) for text, m in zip(texts, metadatas)]
+
+
+def _revise_local(document_id: str, texts: List[str], metadatas: List[dict]) -> Optional[dict]:
+    existing = get_local_index().get(document_id)
+    if not existing:
+        return None
+    
+    kept, added, removed = match_chunks(
+        _stored_hashes(existing["texts"], existing["metadatas"]),
+        [m["chunk_hash"] for m in metadatas]
+    )
+    
+    # Unchanged chunks keep their stored vectors; the partition is rewritten in chunk order
+    embeddings = [None] * len(texts)
+    for old, new in kept:
+        embeddings[new] = existing["embeddings"][old]
+    if added:
+        for new, vector in zip(added, get_embeddings().embed_documents([texts[j] for j in added])):
+            embeddings[new] = vector
+    
+    get_local_index().replace(document_id, embeddings, texts, metadatas)
+    return {"added": len(added), "unchanged": len(kept), "removed": len(removed)}
+
+
+@retry_on_dropped_collection
+def _revise_chroma(collection_name: str, document_id: str, texts: List[str], metadatas: List[dict]) -> Optional[dict]:
+    collection = get_partition_store(collection_name)._collection
+    existing = collection.get(where={"document_id": document_id}, include=["documents", "metadatas"])
+    if not existing or not existing.get('ids'):
+        return None
+    
+    kept, added, removed = match_chunks(
+        _stored_hashes(existing['documents'], existing['metadatas']),
+        [m["chunk_hash"] for m in metadatas]
+    )
+    
+    # New chunks first, so readers never see the document with pieces missing
+    if added:
+        _add_texts(collection_name, [texts[j] for j in added], [metadatas[j] for j in added])
+    
+    # Unchanged chunks whose position (chunk_index, pages, offset) moved: metadata only, no embedding
+    moved = [(old, new) for old, new in kept if existing['metadatas'][old] != metadatas[new]]
+    for i in range(0, len(moved), REVISION_BATCH_SIZE):
+        batch = moved[i:i + REVISION_BATCH_SIZE]
+        collection.update(
+            ids=[existing['ids'][old] for old, _ in batch],
+            metadatas=[metadatas[new] for _, new in batch]
+        )
+    
+    for i in range(0, len(removed), REVISION_BATCH_SIZE):
+        collection.delete(ids=[existing['ids'][old] for old in removed[i:i + REVISION_BATCH_SIZE]])
+    
+    return {"added": len(added), "unchanged": len(kept), "removed": len(removed)}
+
+
+@timed_stage("vector_revise")
+def revise_document(document_id: str, texts: list, metadatas: list) -> Optional[dict]:
+    """
+    Replace a stored document's chunks with those of a revised version.
+    
+    Chunks are matched by content hash: only new chunks are embedded,
+    unchanged ones keep their vectors (their metadata is updated if they
+    moved) and chunks no longer present are deleted. The document keeps
+    its id, partition and tenant.
+    
+    Returns:
+        Dict with added / unchanged / removed chunk counts, or None if the
+        document does not exist
+    """
+    entry = _document_entry(document_id)
+    tenant_id = entry["tenant_id"] if entry else None
+    for metadata in metadatas:
+        metadata['document_id'] = document_id
+        if tenant_id:
+            metadata['tenant_id'] = tenant_id
+    
+    if use_local_index():
+        collection_name = "local"
+        changes = _revise_local(document_id, texts, metadatas)
+    else:
+        collection_name = entry["collection"] if entry else get_collection_name()
+        changes = _revise_chroma(collection_name, document_id, texts, metadatas)
+    
+    if changes is None:
+        return None
+    
+    first = metadatas[0] if metadatas else {}
+    register_document(
+        document_id, collection_name, tenant_id,
+        first.get('source'), first.get('pages', 0), len(texts)
+    )
+    for outcome, count in changes.items():
+        REVISED_CHUNKS.inc(count, outcome=outcome)
+    
+    print(
+        f"✅ Revised document {document_id}: {changes['added']} chunks embedded, "
+        f"{changes['unchanged']} unchanged, {changes['removed']} removed"
+    )
+    return changes
+
+
+@retry_on_dropped_collection
+def _get_document_results(document_id: str, include: list, pages: Optional[Tuple[int, int]] = None) -> dict:
+    return get_document_store(document_id)._collection.get(
+        where=document_where(document_id, pages),
+        include=include
+    )
+
+
+@timed_stage("vector_get")
+def get_document_by_id(document_id: str, pages: Optional[Tuple[int, int]] = None) -> Optional[dict]:
     """
     Retrieve all chunks of a document and reconstruct full text.
+    
+    With pages=(first, last) only the chunks overlapping that page range
+    are read (the filter runs inside the vector store).
     """
+    if use_local_index():
+        chunks = get_document_chunks(document_id, pages=pages)
+        if not chunks:
+            return None
+        return {
+            "text": "\n\n".join(chunks["texts"]),
+            "metadata": chunks["metadatas"][0],
+            "chunks_count": len(chunks["texts"]),
+            "document_id": document_id
+        }
+    
     try:
-        vector_store = get_vector_store()
-        collection = vector_store._collection
-        
         # Get all chunks with this document_id
-        results = collection.get(
-            where={"document_id": document_id},
-            include=["documents", "metadatas"]
-        )
+        results = _get_document_results(document_id, ["documents", "metadatas"], pages)
         
         if not results or not results.get('documents'):
             return None
@@ -156,20 +545,118 @@ def get_document_by_id(document_id: str) -> Optional[dict]:
         return None
 
 
-def list_all_documents() -> list:
-    """Get list of all unique documents in the store."""
+@timed_stage("vector_get")
+def get_document_chunks(
+    document_id: str,
+    include_embeddings: bool = False,
+    pages: Optional[Tuple[int, int]] = None
+) -> Optional[dict]:
+    """
+    Get a document's chunk texts (and optionally stored vectors) ordered by chunk_index.
+    
+    Vectors are read back from the collection, so no embedding calls are made.
+    pages=(first, last) limits the result to chunks overlapping that range.
+    """
+    if use_local_index():
+        chunks = get_local_index().get(document_id, pages)
+        if not chunks or not chunks["texts"]:
+            return None
+        if include_embeddings:
+            chunks["embeddings"] = chunks["embeddings"].tolist()
+        else:
+            del chunks["embeddings"]
+        return chunks
+    
+    try:
+        include = ["documents", "metadatas"]
+        if include_embeddings:
+            include.append("embeddings")
+        
+        results = _get_document_results(document_id, include, pages)
+        
+        if not results or not results.get('documents'):
+            return None
+        
+        order = sorted(
+            range(len(results['documents'])),
+            key=lambda i: (results['metadatas'][i] or {}).get('chunk_index', i)
+        )
+        
+        chunks = {
+            "texts": [results['documents'][i] for i in order],
+            "metadatas": [results['metadatas'][i] for i in order]
+        }
+        if include_embeddings:
+            chunks["embeddings"] = [results['embeddings'][i] for i in order]
+        
+        return chunks
+    
+    except Exception as e:
+        import traceback
+        print(f"Error retrieving document chunks: {e}")
+        traceback.print_exc()
+        return None
+
+
+def _registry_entry(entry: dict) -> dict:
+    return {
+        'document_id': entry['document_id'],
+        'filename': entry['filename'] or 'Unknown',
+        'pages': entry['pages'],
+        'total_chunks': entry['total_chunks'],
+        'tenant_id': entry['tenant_id']
+    }
+
+
+def list_all_documents(tenant_id: str = None) -> list:
+    """
+    Get list of all unique documents in the store.
+    
+    Partitioned documents come from the registry without touching Chroma;
+    only the base collection (documents stored before partitioning) is
+    scanned, and only when it is not empty. With a shared Chroma server
+    the partitions are scanned too, for documents other nodes stored.
+    """
     try:
-        vector_store = get_vector_store()
-        collection = vector_store._collection
+        if tenant_id:
+            entries = {entry['document_id']: entry for entry in list_registered_documents(tenant_id)}
+            if shared_store():
+                for doc_id, entry in _server_entries({"tenant_id": tenant_id}).items():
+                    entries.setdefault(doc_id, entry)
+            return [_registry_entry(entry) for entry in entries.values()]
+        
+        if use_local_index():
+            index = get_local_index()
+            documents = []
+            for doc_id in index.document_ids():
+                metadata = index.first_metadata(doc_id)
+                documents.append({
+                    'document_id': doc_id,
+                    'filename': metadata.get('source', 'Unknown'),
+                    'pages': metadata.get('pages', 0),
+                    'total_chunks': metadata.get('total_chunks', 1)
+                })
+            return documents
+        
+        documents = {
+            entry['document_id']: _registry_entry(entry)
+            for entry in list_registered_documents()
+        }
+        if shared_store():
+            for doc_id, entry in _server_entries().items():
+                documents.setdefault(doc_id, _registry_entry(entry))
+        
+        collection = get_vector_store()._collection
+        if collection.count() == 0:
+            return list(documents.values())
         
         # Get all items
         results = collection.get(include=["metadatas"])
         
         if not results or not results.get('metadatas'):
-            return []
+            return list(documents.values())
         
         # Extract unique documents
-        documents = {}
         for metadata in results['metadatas']:
             doc_id = metadata.get('document_id')
             if doc_id and doc_id not in documents:
@@ -189,38 +676,154 @@ def list_all_documents() -> list:
         return []
 
 
-def search_documents(query: str, k: int = 3, document_id: str = None) -> list:
-    """Search for similar documents, optionally filtered by document_id."""
+@retry_on_dropped_collection
+def _search_chroma(query: str, k: int, document_id: Optional[str], pages: Optional[Tuple[int, int]] = None) -> list:
+    if document_id:
+        # Search within specific document (and page range)
+        return get_document_store(document_id).similarity_search_with_score(
+            query, 
+            k=k,
+            filter=document_where(document_id, pages)
+        )
+    
+    stores = _search_partitions()
+    if len(stores) == 1:
+        return stores[0].similarity_search_with_score(query, k=k)
+    
+    # Embed once, query every partition concurrently, merge by distance
+    query_vector = get_embeddings().embed_query(query)
+    partial = get_fanout_executor().map(
+        lambda store: store.similarity_search_by_vector_with_relevance_scores(query_vector, k=k),
+        stores
+    )
+    results = [hit for hits in partial for hit in hits]
+    results.sort(key=lambda hit: hit[1])
+    return results[:k]
+
+
+@timed_stage("vector_search")
+def search_documents(
+    query: str,
+    k: int = 3,
+    document_id: str = None,
+    pages: Optional[Tuple[int, int]] = None
+) -> list:
+    """
+    Search for similar documents, optionally filtered by document_id.
+    
+    pages=(first, last) restricts a document search to chunks overlapping
+    that page range; it is ignored without a document_id.
+    """
     try:
-        vector_store = get_vector_store()
-        
-        if document_id:
-            # Search within specific document
-            results = vector_store.similarity_search_with_score(
-                query, 
-                k=k,
-                filter={"document_id": document_id}
-            )
-        else:
-            results = vector_store.similarity_search_with_score(query, k=k)
+        if use_local_index():
+            # Cosine distance, so lower is better as with Chroma
+            query_vector = get_embeddings().embed_query(query)
+            return [
+                (Document(page_content=text, metadata=metadata), 1.0 - similarity)
+                for text, _, metadata, similarity in get_local_index().search(query_vector, k, document_id, pages)
+            ]
         
-        return results
+        return _search_chroma(query, k, document_id, pages)
     except Exception as e:
         print(f"Error searching documents: {e}")
         return []
 
 
+@retry_on_dropped_collection
+def _search_chroma_batch(
+    query_vectors: List[List[float]],
+    k: int,
+    document_id: Optional[str],
+    pages: Optional[Tuple[int, int]] = None
+) -> List[list]:
+    if document_id:
+        stores, where = [get_document_store(document_id)], document_where(document_id, pages)
+    else:
+        stores, where = _search_partitions(), None
+    
+    def query(store) -> List[list]:
+        # One Chroma query carries every vector
+        results = store._collection.query(
+            query_embeddings=query_vectors,
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [
+                (Document(page_content=text or "", metadata=metadata or {}), distance)
+                for text, metadata, distance in zip(texts, metadatas, distances)
+            ]
+            for texts, metadatas, distances in zip(results["documents"], results["metadatas"], results["distances"])
+        ]
+    
+    if len(stores) == 1:
+        return query(stores[0])
+    
+    merged = [[] for _ in query_vectors]
+    for partial in get_fanout_executor().map(query, stores):
+        for hits, partition_hits in zip(merged, partial):
+            hits.extend(partition_hits)
+    for hits in merged:
+        hits.sort(key=lambda hit: hit[1])
+    return [hits[:k] for hits in merged]
+
+
+@timed_stage("vector_search_batch")
+def search_documents_batch(
+    queries: List[str],
+    k: int = 3,
+    document_id: str = None,
+    pages: Optional[Tuple[int, int]] = None
+) -> List[list]:
+    """
+    search_documents for several queries: one embedding request for all of
+    them and one vector query per partition.
+    
+    Returns:
+        One result list per query, in order
+    """
+    if not queries:
+        return []
+    try:
+        query_vectors = get_embeddings().embed_documents(list(queries))
+        if use_local_index():
+            index = get_local_index()
+            return [
+                [
+                    (Document(page_content=text, metadata=metadata), 1.0 - similarity)
+                    for text, _, metadata, similarity in index.search(query_vector, k, document_id, pages)
+                ]
+                for query_vector in query_vectors
+            ]
+        
+        return _search_chroma_batch(query_vectors, k, document_id, pages)
+    except Exception as e:
+        print(f"Error searching documents: {e}")
+        return [[] for _ in queries]
+
+
 def clear_vector_store() -> bool:
-    """Clear all documents from the vector store and reset."""
-    global _vector_store, _chroma_client
+    """
+    Clear all documents from the vector store.
     
+    Collections are dropped through the Chroma client instead of deleting
+    CHROMA_DB_PATH, so a Chroma server and other workers holding the store
+    open stay consistent; their cached wrappers are rebuilt on first use.
+    """
     try:
-        # Close existing connections
-        _vector_store = None
-        _chroma_client = None
+        if use_local_index():
+            get_local_index().clear()
+        else:
+            for name in list_collection_names():
+                if name.startswith("scholarnet_docs"):
+                    get_chroma_client().delete_collection(name)
         
-        if os.path.exists(settings.CHROMA_DB_PATH):
-            shutil.rmtree(settings.CHROMA_DB_PATH)
+        reset_store_cache()
+        for document_id in list_lexical_documents():
+            delete_lexical_index(document_id)
+        clear_lexical_cache()
+        clear_registry()
         
         print("✅ Vector store cleared successfully")
         return True
@@ -233,13 +836,29 @@ def clear_vector_store() -> bool:
 def get_collection_stats() -> dict:
     """Get statistics about the vector store."""
     try:
-        vector_store = get_vector_store()
-        collection = vector_store._collection
+        if use_local_index():
+            index = get_local_index()
+            return {
+                "count": index.count(),
+                "name": "local",
+                "metadata": {
+                    "documents": len(index.document_ids()),
+                    "quantization": settings.LOCAL_INDEX_QUANTIZATION
+                }
+            }
+        
+        collection = get_vector_store()._collection
+        partitions = [name for name in partition_names() if name != collection.name]
+        count = collection.count() + sum(
+            get_partition_store(name)._collection.count() for name in partitions
+        )
         
         return {
-            "count": collection.count(),
+            "count": count,
             "name": collection.name,
-            "metadata": collection.metadata if hasattr(collection, 'metadata') else {}
+            "metadata": collection.metadata if hasattr(collection, 'metadata') else {},
+            "partitioning": settings.VECTOR_PARTITIONING,
+            "partitions": len(partitions)
         }
     except Exception as e:
         print(f"Error getting collection stats: {e}")
@@ -247,16 +866,51 @@ def get_collection_stats() -> dict:
 
 
 def delete_documents_by_metadata(metadata_filter: dict) -> bool:
-    """Delete documents matching metadata filter."""
+    """
+    Delete documents matching metadata filter.
+    
+    document_id and tenant_id filters use the partition registry (whole
+    partitions are dropped where possible); other filters run inside
+    Chroma, one delete per partition, without fetching the chunks first.
+    """
     try:
-        vector_store = get_vector_store()
-        collection = vector_store._collection
+        keys = set(metadata_filter)
+        if keys == {"document_id"}:
+            value = metadata_filter["document_id"]
+            if isinstance(value, dict) and set(value) == {"$in"}:
+                return bool(delete_documents(value["$in"]))
+            if isinstance(value, str):
+                return delete_document_by_id(value)
+        if keys == {"tenant_id"} and isinstance(metadata_filter["tenant_id"], str):
+            return bool(delete_tenant_documents(metadata_filter["tenant_id"]))
+        
+        if use_local_index():
+            # Partitions are per document, so only document_id / tenant_id filters apply
+            print("Error deleting documents: the local index only filters by document_id or tenant_id")
+            return False
+        
+        deleted = 0
+        touched = set()
+        for store in _search_partitions():
+            collection = store._collection
+            before = collection.count()
+            collection.delete(where=metadata_filter)
+            removed = before - collection.count()
+            if removed:
+                deleted += removed
+                touched.add(collection.name)
         
-        results = collection.get(where=metadata_filter)
+        # Forget documents that no longer have any chunks (only partitions that changed are checked)
+        gone = [
+            entry['document_id'] for entry in list_registered_documents()
+            if entry['collection'] in touched and not get_document_store(entry['document_id'])._collection.get(
+                where={"document_id": entry['document_id']}, limit=1, include=[]
+            )['ids']
+        ]
+        unregister_documents(gone)
         
-        if results and results.get('ids'):
-            collection.delete(ids=results['ids'])
-            print(f"✅ Deleted {len(results['ids'])} chunks")
+        if deleted:
+            print(f"✅ Deleted {deleted} chunks")
             return True
         
         return False
@@ -266,6 +920,165 @@ def delete_documents_by_metadata(metadata_filter: dict) -> bool:
         return False
 
 
+@retry_on_dropped_collection
+def _drop_or_delete(collection_name: str, document_ids: List[str]) -> bool:
+    """
+    Remove documents from one partition.
+    
+    When they are the only documents in a partition collection the whole
+    collection is dropped (constant time); otherwise their chunks are
+    deleted with a where filter inside that (small) collection. With a
+    shared Chroma server the local registry does not know what other
+    nodes stored, so only per-document collections are dropped.
+    """
+    base_name = get_collection_name()
+    if shared_store():
+        sole = collection_name.startswith(f"{base_name}_d") and len(document_ids) == 1
+    else:
+        sole = collection_name != base_name and count_documents_in_collection(collection_name) == len(document_ids)
+    
+    if sole:
+        drop_collection(collection_name)
+        return True
+    
+    collection = get_partition_store(collection_name)._collection
+    where = (
+        {"document_id": document_ids[0]} if len(document_ids) == 1
+        else {"document_id": {"$in": document_ids}}
+    )
+    results = collection.get(where=where, include=[])
+    if results and results.get('ids'):
+        collection.delete(ids=results['ids'])
+        return True
+    return False
+
+
+@timed_stage("vector_delete")
 def delete_document_by_id(document_id: str) -> bool:
     """Delete all chunks of a specific document."""
-    return delete_documents_by_metadata({"document_id": document_id})
\ No newline at end of file
+    if use_local_index():
+        deleted = get_local_index().delete(document_id)
+        unregister_documents([document_id])
+        if deleted:
+            print(f"✅ Deleted document {document_id}")
+        return deleted
+    
+    try:
+        entry = _document_entry(document_id)
+        collection_name = entry["collection"] if entry else get_collection_name()
+        deleted = _drop_or_delete(collection_name, [document_id])
+        unregister_documents([document_id])
+        if deleted:
+            print(f"✅ Deleted document {document_id} from {collection_name}")
+        return deleted
+    
+    except Exception as e:
+        print(f"Error deleting documents: {e}")
+        return False
+
+
+def _delete_registered(entries: List[dict]) -> None:
+    """Delete registered documents with one drop or filtered delete per partition."""
+    by_collection = {}
+    for entry in entries:
+        by_collection.setdefault(entry['collection'], []).append(entry['document_id'])
+    
+    for collection_name, document_ids in by_collection.items():
+        if collection_name == "local":
+            for doc_id in document_ids:
+                get_local_index().delete(doc_id)
+        else:
+            _drop_or_delete(collection_name, document_ids)
+    
+    unregister_documents([entry['document_id'] for entry in entries])
+
+
+@timed_stage("vector_delete")
+def delete_documents(document_ids: List[str]) -> List[str]:
+    """
+    Delete many documents at once.
+    
+    Documents are grouped by partition: partitions they fill completely
+    are dropped, others get a single filtered delete each.
+    
+    Returns:
+        IDs of the documents that existed and were deleted
+    """
+    try:
+        document_ids = list(dict.fromkeys(document_ids))
+        entries = get_registered_documents(document_ids)
+        if shared_store():
+            # Documents other nodes stored
+            for doc_id in document_ids:
+                entry = entries.get(doc_id) or _document_entry(doc_id)
+                if entry:
+                    entries[doc_id] = entry
+        _delete_registered(list(entries.values()))
+        deleted = list(entries)
+        
+        # Documents stored before the partition registry live in the base collection
+        legacy = [doc_id for doc_id in document_ids if doc_id not in entries]
+        if legacy and not use_local_index():
+            base_name = get_collection_name()
+            deleted += [doc_id for doc_id in legacy if _drop_or_delete(base_name, [doc_id])]
+        elif legacy:
+            deleted += [doc_id for doc_id in legacy if get_local_index().delete(doc_id)]
+        
+        if deleted:
+            print(f"✅ Deleted {len(deleted)} documents")
+        return deleted
+    
+    except Exception as e:
+        print(f"Error deleting documents: {e}")
+        return []
+
+
+def delete_tenant_documents(tenant_id: str) -> List[str]:
+    """
+    Delete every document of a tenant (course).
+    
+    With tenant partitioning this is a single collection drop.
+    
+    Returns:
+        IDs of the deleted documents
+    """
+    try:
+        entries = list_registered_documents(tenant_id)
+        if shared_store():
+            # Documents of the tenant that other nodes stored
+            known = {entry['document_id'] for entry in entries}
+            entries += [entry for doc_id, entry in _server_entries({"tenant_id": tenant_id}).items() if doc_id not in known]
+        if not entries:
+            return []
+        
+        _delete_registered(entries)
+        deleted = [entry['document_id'] for entry in entries]
+        print(f"✅ Deleted {len(deleted)} documents of tenant {tenant_id}")
+        return deleted
+    
+    except Exception as e:
+        print(f"Error deleting tenant documents: {e}")
+        return []
+
+
+def is_partition_collection(name: str) -> bool:
+    """Whether a collection name is one of partition_for's (for the configured backend)."""
+    pattern = rf"{re.escape(get_collection_name())}_(d[0-9a-f]{{16}}|s\d{{3}}|t[0-9a-f]{{16}})"
+    return re.fullmatch(pattern, name) is not None
+
+
+def list_collection_names() -> List[str]:
+    """Names of every collection in the Chroma store."""
+    # Older clients return Collection objects, newer ones names
+    return [getattr(collection, "name", collection) for collection in get_chroma_client().list_collections()]
+
+
+def drop_collection(collection_name: str) -> None:
+    """Drop a whole collection (no-op if another worker already did)."""
+    with _partition_lock:
+        _partition_stores.pop(collection_name, None)
+    try:
+        get_chroma_client().delete_collection(collection_name)
+    except Exception as e:
+        if not _is_dropped_collection(e):
+            raise
\ No newline at end of file
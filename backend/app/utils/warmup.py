@@ -0,0 +1,183 @@
+# Startup warm-up: build lazily created clients before traffic arrives, gate /ready on it
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, List
+from app.config import settings
+from app.utils.executors import run_io
+from app.utils.metrics import gauge
+
+READY = gauge("scholarnet_ready", "1 once warm-up finished and the replica accepts traffic")
+
+_state = {"status": "cold", "started_at": None, "finished_at": None, "give_up_at": None, "steps": {}}
+_state_lock = threading.Lock()
+
+
+def _warm_vector_store() -> None:
+    from app.utils.vector_store import get_vector_store, use_local_index
+    from app.utils.local_index import get_local_index
+
+    if use_local_index():
+        get_local_index()
+    else:
+        # Chroma client + collection wrapper (also creates the embeddings client)
+        get_vector_store()._collection.count()
+
+
+def _warm_embeddings() -> None:
+    from app.utils.embeddings import get_embeddings
+    get_embeddings()
+
+
+def _warm_tokenizer() -> None:
+    from app.utils.context_packer import get_encoder
+    get_encoder("gpt-3.5-turbo")
+    if settings.EMBEDDING_BACKEND == "openai":
+        get_encoder(settings.DEFAULT_EMBEDDING_MODEL)
+
+
+def _warm_llm() -> None:
+    from app.services.llm_service import get_llm
+    # Imports langchain_openai and the prompt templates; no request is sent
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+    get_llm(model="gpt-3.5-turbo")
+
+
+def _warm_tts() -> None:
+    from app.services.tts_service import get_tts_engine
+    get_tts_engine()
+
+
+def hot_documents(limit: int) -> List[str]:
+    """Documents to preload: WARMUP_DOCUMENT_IDS, else the most recently registered ones."""
+    if settings.WARMUP_DOCUMENT_IDS:
+        return [doc_id.strip() for doc_id in settings.WARMUP_DOCUMENT_IDS.split(",") if doc_id.strip()][:limit]
+
+    from app.utils.partitions import list_registered_documents
+    from app.utils.local_index import get_local_index
+    from app.utils.vector_store import use_local_index
+
+    if use_local_index():
+        index = get_local_index()
+        document_ids = sorted(index.document_ids(), key=lambda doc_id: os.path.getmtime(index._path(doc_id)))
+        return document_ids[-limit:]
+    return [doc["document_id"] for doc in list_registered_documents()][-limit:]
+
+
+def _preload_documents() -> None:
+    """Load per-document caches (BM25 index, Chroma partition wrapper / local partition)."""
+    from app.utils.lexical_index import get_lexical_index
+    from app.utils.vector_store import get_document_store, use_local_index
+    from app.utils.local_index import get_local_index
+
+    for document_id in hot_documents(settings.WARMUP_PRELOAD_DOCUMENTS):
+        get_lexical_index(document_id)
+        if use_local_index():
+            get_local_index().partition(document_id)
+        else:
+            get_document_store(document_id)
+
+
+def warmup_steps() -> Dict[str, Callable[[], None]]:
+    """Independent warm-up steps for the configured backends."""
+    steps = {
+        "vector_store": _warm_vector_store,
+        "embeddings": _warm_embeddings,
+        "tokenizer": _warm_tokenizer,
+        "llm": _warm_llm,
+    }
+    if settings.TTS_ENGINE == "openai":
+        steps["tts"] = _warm_tts
+    if settings.WARMUP_PRELOAD_DOCUMENTS > 0:
+        steps["documents"] = _preload_documents
+    return steps
+
+
+async def _run_step(name: str, func: Callable[[], None], give_up_at: float) -> bool:
+    """
+    Run one step, retrying with exponential backoff until it succeeds or give_up_at passes.
+
+    Returns:
+        True if the step eventually succeeded
+    """
+    delay = settings.WARMUP_RETRY_BACKOFF
+    attempt = 0
+    while True:
+        attempt += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(run_io(func), timeout=settings.WARMUP_TIMEOUT)
+            result = {"status": "ok"}
+        except asyncio.TimeoutError:
+            result = {"status": "failed", "error": f"Timed out after {settings.WARMUP_TIMEOUT:.0f}s"}
+        except Exception as e:
+            result = {"status": "failed", "error": str(e)}
+        result["ms"] = round((time.perf_counter() - start) * 1000, 1)
+        result["attempts"] = attempt
+
+        if result["status"] == "failed" and time.time() + delay < give_up_at:
+            # e.g. Chroma still starting: try again instead of staying unready forever
+            print(f"⚠️ Warm-up step {name} failed (attempt {attempt}): {result['error']}; retrying in {delay:.1f}s")
+            result.update(status="retrying", retry_in_s=round(delay, 1))
+        elif result["status"] == "failed":
+            print(f"❌ Warm-up step {name} failed after {attempt} attempts: {result['error']}")
+
+        with _state_lock:
+            _state["steps"][name] = result
+        if result["status"] != "retrying":
+            return result["status"] == "ok"
+
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, settings.WARMUP_RETRY_MAX_BACKOFF)
+
+
+async def run_warmup() -> None:
+    """
+    Run every warm-up step concurrently on the IO pool, then mark the replica ready.
+
+    Failed steps (e.g. Chroma unavailable) are retried with backoff, each
+    attempt bounded by WARMUP_TIMEOUT; the replica stays not ready until
+    they succeed and is marked failed once WARMUP_GIVE_UP_AFTER passes.
+    """
+    steps = warmup_steps()
+    started_at = time.time()
+    give_up_at = started_at + settings.WARMUP_GIVE_UP_AFTER if settings.WARMUP_GIVE_UP_AFTER > 0 else float("inf")
+    with _state_lock:
+        _state.update(
+            status="warming",
+            started_at=started_at,
+            finished_at=None,
+            give_up_at=give_up_at if give_up_at != float("inf") else None,
+            steps={}
+        )
+    print(f"🔥 Warming up: {', '.join(steps)}")
+
+    results = await asyncio.gather(*(_run_step(name, func, give_up_at) for name, func in steps.items()))
+    status = "ready" if all(results) else "failed"
+
+    with _state_lock:
+        _state.update(status=status, finished_at=time.time())
+    READY.set(1 if status == "ready" else 0)
+    if status == "ready":
+        print(f"✅ Warm-up complete in {_state['finished_at'] - _state['started_at']:.2f}s")
+
+
+def mark_ready() -> None:
+    """Skip warm-up (WARMUP_ENABLED=false): ready as soon as the app starts."""
+    with _state_lock:
+        _state.update(status="ready", started_at=time.time(), finished_at=time.time())
+    READY.set(1)
+
+
+def is_ready() -> bool:
+    return _state["status"] == "ready"
+
+
+def get_warmup_state() -> dict:
+    with _state_lock:
+        state = dict(_state, steps=dict(_state["steps"]))
+    if state["started_at"] and state["finished_at"]:
+        state["duration_s"] = round(state["finished_at"] - state["started_at"], 3)
+    return state
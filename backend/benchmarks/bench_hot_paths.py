@@ -0,0 +1,319 @@
+# Microbenchmarks: CPU-bound hot paths vs document size (1 to 1000 pages)
+#
+# Usage (from backend/):
+#   python benchmarks/bench_hot_paths.py --output results/hot_paths.json
+#   python benchmarks/bench_hot_paths.py --sizes 1,10,100 --cases chunk_text,split_sentence_spans
+#   python benchmarks/bench_hot_paths.py --compare results/hot_paths.json
+#
+# Runs offline: PDFs and texts are generated, embeddings use the hashing
+# backend and all storage goes to a temp directory. For every case and size
+# it reports median/min time per call and peak traced memory (tracemalloc,
+# in a separate untimed run), then fits the log-log slope of time vs size:
+# ~1 is linear, >= 1.5 (flagged) points at quadratic behaviour.
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+WORKDIR = tempfile.mkdtemp(prefix="scholarnet-bench-")
+os.environ.update({
+    "EMBEDDING_BACKEND": "hashing",
+    "CHROMA_DB_PATH": os.path.join(WORKDIR, "chroma_db"),
+    "LOCAL_INDEX_DIR": os.path.join(WORKDIR, "local_index"),
+    "DOCUMENT_INDEX_DIR": os.path.join(WORKDIR, "document_index"),
+    "PARTITION_REGISTRY_PATH": os.path.join(WORKDIR, "vector_partitions.db"),
+    "MASTERY_DB_PATH": os.path.join(WORKDIR, "mastery.db"),
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_SIZES = "1,10,100,1000"
+CHARS_PER_PAGE = 3000  # A dense textbook page
+QUESTIONS_PER_PAGE = 2  # MCQ cases scale quiz length with the size parameter
+SUPERLINEAR_SLOPE = 1.5
+
+VOCABULARY = (
+    "energy cell membrane protein enzyme reaction gradient network layer weight model "
+    "market price demand supply equilibrium theorem proof function integral derivative "
+    "vector matrix entropy temperature pressure volume system process structure analysis"
+).split()
+
+
+def make_text(pages: int, seed: int = 0) -> str:
+    """Sentences of 8-25 words, paragraphs every few sentences, ~CHARS_PER_PAGE per page."""
+    rng = random.Random(seed)
+    parts, length, target = [], 0, pages * CHARS_PER_PAGE
+    while length < target:
+        words = rng.choices(VOCABULARY, k=rng.randint(8, 25))
+        sentence = " ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"])
+        parts.append(sentence)
+        parts.append("\n\n" if rng.random() < 0.15 else " ")
+        length += len(sentence) + 1
+    return "".join(parts)
+
+
+def make_pdf(path: str, pages: int) -> str:
+    import fitz
+    text = make_text(pages, seed=pages)
+    document = fitz.open()
+    for i in range(pages):
+        page = document.new_page()
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), text[i * CHARS_PER_PAGE:(i + 1) * CHARS_PER_PAGE], fontsize=8)
+    document.save(path)
+    document.close()
+    return path
+
+
+def make_questions(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    topics = [f"Topic {i}" for i in range(max(3, count // 8))]
+    questions = []
+    for i in range(count):
+        correct = rng.randrange(4)
+        questions.append({
+            "question": " ".join(rng.choices(VOCABULARY, k=14)) + "?",
+            "topic": rng.choice(topics),
+            "options": [{"option": " ".join(rng.choices(VOCABULARY, k=5)), "is_correct": j == correct} for j in range(4)],
+            "explanation": " ".join(rng.choices(VOCABULARY, k=20)),
+        })
+    answers = {i: rng.randrange(4) for i in range(count)}
+    return questions, answers
+
+
+# --- Cases: each takes the size (pages) and returns a zero-argument callable to time ---
+
+def case_chunk_text(pages):
+    from app.utils.helpers import chunk_text
+    from app.config import settings
+    text = make_text(pages)
+    return lambda: chunk_text(text, chunk_size=settings.CHUNK_SIZE, overlap=settings.CHUNK_OVERLAP)
+
+
+def case_reconstruct_text(pages):
+    from app.utils.helpers import chunk_text, reconstruct_text_from_chunks
+    chunks = chunk_text(make_text(pages))
+    return lambda: reconstruct_text_from_chunks(chunks)
+
+
+def case_split_sentence_spans(pages):
+    from app.utils.helpers import split_sentence_spans
+    text = make_text(pages)
+    return lambda: split_sentence_spans(text)
+
+
+def case_build_document_index(pages):
+    from app.utils.document_index import build_document_index
+    text = make_text(pages)
+    return lambda: build_document_index(f"bench-{pages}", text)
+
+
+def _pdf(pages):
+    path = os.path.join(WORKDIR, f"bench_{pages}.pdf")
+    return path if os.path.exists(path) else make_pdf(path, pages)
+
+
+def case_extract_pymupdf(pages):
+    from app.services.pdf_processor import extract_text_from_pdf_pymupdf
+    path = _pdf(pages)
+    return lambda: extract_text_from_pdf_pymupdf(path)
+
+
+def case_extract_pypdf2(pages):
+    from app.services.pdf_processor import extract_text_from_pdf_pypdf2
+    path = _pdf(pages)
+    return lambda: extract_text_from_pdf_pypdf2(path)
+
+
+def case_get_document_by_id(pages):
+    from app.utils.helpers import chunk_text
+    from app.utils.vector_store import add_documents_to_store, get_document_by_id
+    document_id = f"bench-doc-{pages}"
+    chunks = chunk_text(make_text(pages))
+    metadatas = [{"document_id": document_id, "chunk_index": i, "source": "bench.pdf"} for i in range(len(chunks))]
+    add_documents_to_store(chunks, metadatas, document_id=document_id)
+    return lambda: get_document_by_id(document_id)
+
+
+def _sentences_and_embeddings(pages):
+    from app.utils.helpers import split_sentence_spans
+    from app.utils.embeddings import HashingEmbeddings
+    text = make_text(pages)
+    sentences = [text[a:b] for a, b in split_sentence_spans(text)]
+    return sentences, HashingEmbeddings(384).embed_documents(sentences)
+
+
+def case_semantic_chunk_similarity(pages):
+    from app.services.read_aloud_service import semantic_chunk_sentences
+    sentences, embeddings = _sentences_and_embeddings(pages)
+    return lambda: semantic_chunk_sentences(sentences, embeddings, mode="similarity")
+
+
+def case_semantic_chunk_minibatch(pages):
+    from app.services.read_aloud_service import semantic_chunk_sentences
+    sentences, embeddings = _sentences_and_embeddings(pages)
+    return lambda: semantic_chunk_sentences(sentences, embeddings, mode="minibatch")
+
+
+def case_extract_topics(pages):
+    from app.services.mcq_generator import extract_topics
+    questions, _ = make_questions(pages * QUESTIONS_PER_PAGE)
+    return lambda: extract_topics(questions)
+
+
+def case_evaluate_mcq_answers(pages):
+    from app.services.mcq_generator import evaluate_mcq_answers
+    questions, answers = make_questions(pages * QUESTIONS_PER_PAGE)
+    loop = asyncio.new_event_loop()
+    # No user_id: measures scoring/analysis only, not the mastery write
+    return lambda: loop.run_until_complete(evaluate_mcq_answers(questions, answers))
+
+
+CASES = {
+    "chunk_text": case_chunk_text,
+    "reconstruct_text": case_reconstruct_text,
+    "split_sentence_spans": case_split_sentence_spans,
+    "build_document_index": case_build_document_index,
+    "extract_pymupdf": case_extract_pymupdf,
+    "extract_pypdf2": case_extract_pypdf2,
+    "get_document_by_id": case_get_document_by_id,
+    "semantic_chunk_similarity": case_semantic_chunk_similarity,
+    "semantic_chunk_minibatch": case_semantic_chunk_minibatch,
+    "extract_topics": case_extract_topics,
+    "evaluate_mcq_answers": case_evaluate_mcq_answers,
+}
+
+
+def measure(func, min_time: float, max_repeats: int) -> dict:
+    """Median/min seconds per call (repeating until min_time) and peak traced MB of one call."""
+    func()  # Warm-up (imports, caches, lazy init)
+    times = []
+    started = time.perf_counter()
+    while len(times) < max_repeats and (time.perf_counter() - started < min_time or len(times) < 3):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "median_ms": round(statistics.median(times) * 1000, 4),
+        "min_ms": round(min(times) * 1000, 4),
+        "repeats": len(times),
+        "peak_mb": round(peak / 2**20, 3),
+    }
+
+
+def scaling_slope(sizes, values) -> float:
+    """Least-squares slope of log(value) vs log(size)."""
+    points = [(math.log(s), math.log(v)) for s, v in zip(sizes, values) if v and v > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(p[0] for p in points) / len(points)
+    mean_y = sum(p[1] for p in points) / len(points)
+    var_x = sum((p[0] - mean_x) ** 2 for p in points)
+    if var_x == 0:
+        return None
+    return round(sum((p[0] - mean_x) * (p[1] - mean_y) for p in points) / var_x, 3)
+
+
+def run(cases, sizes, args) -> dict:
+    results = {}
+    for name in cases:
+        rows = []
+        for pages in sizes:
+            func = CASES[name](pages)
+            row = {"pages": pages, **measure(func, args.min_time, args.max_repeats)}
+            row["ms_per_page"] = round(row["median_ms"] / pages, 4)
+            rows.append(row)
+            print(f"  {name:28} {pages:>6} pages  {row['median_ms']:>11.3f} ms  "
+                  f"{row['ms_per_page']:>9.4f} ms/page  {row['peak_mb']:>9.2f} MB")
+        slope = scaling_slope([r["pages"] for r in rows], [r["median_ms"] for r in rows])
+        results[name] = {
+            "sizes": rows,
+            "time_slope": slope,
+            "memory_slope": scaling_slope([r["pages"] for r in rows], [r["peak_mb"] for r in rows]),
+            "superlinear": slope is not None and slope >= SUPERLINEAR_SLOPE,
+        }
+        flag = "  ⚠️ superlinear" if results[name]["superlinear"] else ""
+        print(f"  {name:28} time ~ pages^{slope}{flag}\n")
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Per case/size median-time deltas vs a baseline report; returns the regressions."""
+    regressions = []
+    print(f"COMPARISON vs {baseline['meta'].get('git_commit')} ({baseline['meta'].get('timestamp')})")
+    for name, current in results.items():
+        previous = {row["pages"]: row for row in baseline["cases"].get(name, {}).get("sizes", [])}
+        for row in current["sizes"]:
+            before = previous.get(row["pages"])
+            if not before or not before["median_ms"]:
+                continue
+            delta = (row["median_ms"] - before["median_ms"]) / before["median_ms"] * 100
+            marker = " ❌" if delta > threshold else ""
+            print(f"  {name:28} {row['pages']:>6} pages  {delta:>+8.1f}%{marker}")
+            if delta > threshold:
+                regressions.append(f"{name}@{row['pages']} {delta:+.1f}%")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-path microbenchmarks with scaling curves")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated page counts")
+    parser.add_argument("--cases", default=",".join(CASES), help="Comma-separated case names")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds of timed calls per case and size")
+    parser.add_argument("--max-repeats", type=int, default=200)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    parser.add_argument("--regression-threshold", type=float, default=20.0, help="Percent")
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    cases = [c.strip() for c in args.cases.split(",")]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"Unknown cases: {', '.join(unknown)} (choose from {', '.join(CASES)})")
+
+    print(f"Benchmarking {len(cases)} cases at {sizes} pages (workdir {WORKDIR})\n")
+    try:
+        results = run(cases, sizes, args)
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    from load_test import git_commit
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "chars_per_page": CHARS_PER_PAGE,
+            "questions_per_page": QUESTIONS_PER_PAGE,
+        },
+        "cases": results,
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.regression_threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
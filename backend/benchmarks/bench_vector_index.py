@@ -0,0 +1,214 @@
+# Benchmark: in-process vector index (float32 / int8) vs Chroma on synthetic corpora
+#
+# Usage (from backend/):
+#   python benchmarks/bench_vector_index.py --vectors 100000 --documents 200 --dim 384
+#
+# Each backend runs in its own subprocess so peak RSS is measured in
+# isolation. Ground truth is exact cosine top-k over the float32 corpus.
+#
+# Documents are small next to LOCAL_INDEX_EXACT_THRESHOLD, as in real
+# uploads, so "global" queries exercise the corpus-wide IVF; the
+# local-float32-exact backend disables it for comparison.
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+BACKENDS = ["local-float32", "local-int8", "local-float32-exact", "chroma"]
+
+
+def make_corpus(num_vectors: int, num_documents: int, dim: int, num_queries: int, seed: int = 0):
+    """Clustered unit vectors (topics shared across documents) plus held-out queries."""
+    rng = np.random.default_rng(seed)
+    num_topics = max(8, num_vectors // 500)
+    topics = rng.standard_normal((num_topics, dim)).astype(np.float32)
+
+    def sample(n):
+        X = topics[rng.integers(0, num_topics, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+        return X / np.linalg.norm(X, axis=1, keepdims=True)
+
+    vectors = sample(num_vectors)
+    queries = sample(num_queries)
+    doc_ids = np.sort(rng.integers(0, num_documents, num_vectors))
+    return vectors, doc_ids, queries
+
+
+def exact_top_k(vectors, doc_ids, queries, k, filter_doc=None):
+    results = []
+    for i, q in enumerate(queries):
+        scores = vectors @ q
+        if filter_doc is not None:
+            scores = np.where(doc_ids == filter_doc[i], scores, -np.inf)
+        top = np.argpartition(-scores, k)[:k]
+        results.append(set(top[np.isfinite(scores[top])].tolist()))
+    return results
+
+
+def recall(found, truth):
+    hits = sum(len(f & t) for f, t in zip(found, truth))
+    return hits / max(1, sum(len(t) for t in truth))
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_rss_mb() -> float:
+    """Resident set size right now (Linux); falls back to the peak elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+class LocalBackend:
+    def __init__(self, workdir: str, quantization: str, exact: bool = False):
+        os.environ["LOCAL_INDEX_DIR"] = os.path.join(workdir, "local_index")
+        os.environ["LOCAL_INDEX_QUANTIZATION"] = quantization
+        if exact:
+            os.environ["LOCAL_INDEX_EXACT_THRESHOLD"] = str(2**62)
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from app.utils.local_index import LocalVectorIndex
+        from app.config import settings
+        self.index = LocalVectorIndex(settings.LOCAL_INDEX_DIR)
+
+    def build(self, vectors, doc_ids):
+        for doc in np.unique(doc_ids):
+            rows = np.flatnonzero(doc_ids == doc)
+            self.index.add(
+                f"doc{doc}",
+                vectors[rows],
+                [f"chunk {r}" for r in rows],
+                [{"document_id": f"doc{doc}", "chunk_index": int(r)} for r in rows]
+            )
+
+    def query(self, q, k, document=None):
+        hits = self.index.search(q, k, f"doc{document}" if document is not None else None)
+        return {metadata["chunk_index"] for _, _, metadata, _ in hits}
+
+
+class ChromaBackend:
+    def __init__(self, workdir: str):
+        import chromadb
+        self.client = chromadb.PersistentClient(path=os.path.join(workdir, "chroma"))
+        self.collection = self.client.create_collection("bench", metadata={"hnsw:space": "cosine"})
+
+    def build(self, vectors, doc_ids):
+        batch = 5000
+        for i in range(0, len(vectors), batch):
+            self.collection.add(
+                ids=[str(r) for r in range(i, min(i + batch, len(vectors)))],
+                embeddings=vectors[i:i + batch].tolist(),
+                documents=[f"chunk {r}" for r in range(i, min(i + batch, len(vectors)))],
+                metadatas=[{"document_id": f"doc{d}"} for d in doc_ids[i:i + batch]]
+            )
+
+    def query(self, q, k, document=None):
+        where = {"document_id": f"doc{document}"} if document is not None else None
+        result = self.collection.query(query_embeddings=[q.tolist()], n_results=k, where=where)
+        return {int(i) for i in result["ids"][0]}
+
+
+def run_backend(args) -> dict:
+    vectors, doc_ids, queries = make_corpus(args.vectors, args.documents, args.dim, args.queries)
+    rng = np.random.default_rng(1)
+    filter_docs = doc_ids[rng.integers(0, len(doc_ids), len(queries))]
+    rss_before = current_rss_mb()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.backend == "chroma":
+            backend = ChromaBackend(workdir)
+        else:
+            _, quantization, *mode = args.backend.split("-")
+            backend = LocalBackend(workdir, quantization, exact=mode == ["exact"])
+
+        start = time.perf_counter()
+        backend.build(vectors, doc_ids)
+        build_seconds = time.perf_counter() - start
+
+        report = {"backend": args.backend, "build_seconds": round(build_seconds, 2)}
+        if args.backend != "chroma":
+            report["corpus_ivf_lists"] = len(backend.index._corpus[2]) if backend.index._corpus else 0
+        for label, filters in (("global", None), ("per_document", filter_docs)):
+            truth = exact_top_k(vectors, doc_ids, queries, args.k, filters)
+            start = time.perf_counter()
+            found = [
+                backend.query(q, args.k, None if filters is None else int(filters[i]))
+                for i, q in enumerate(queries)
+            ]
+            elapsed = time.perf_counter() - start
+
+            # Per-query latency on a second (warm) pass
+            latencies = []
+            for i, q in enumerate(queries[:200]):
+                t = time.perf_counter()
+                backend.query(q, args.k, None if filters is None else int(filters[i]))
+                latencies.append((time.perf_counter() - t) * 1000)
+
+            report[label] = {
+                f"recall@{args.k}": round(recall(found, truth), 4),
+                "qps": round(len(queries) / elapsed, 1),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 3)
+            }
+
+        report["rss_mb"] = round(current_rss_mb(), 1)
+        report["rss_over_corpus_mb"] = round(current_rss_mb() - rss_before, 1)
+        report["peak_rss_mb"] = round(peak_rss_mb(), 1)
+        report["disk_mb"] = round(
+            sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, files in os.walk(workdir) for name in files
+            ) / 1e6, 1
+        )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local vector index vs Chroma benchmark")
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--backend", choices=BACKENDS)
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run_backend(args)))
+        return
+
+    reports = []
+    for backend in BACKENDS:
+        command = [
+            sys.executable, os.path.abspath(__file__),
+            "--backend", backend,
+            "--vectors", str(args.vectors), "--documents", str(args.documents),
+            "--dim", str(args.dim), "--queries", str(args.queries), "--k", str(args.k)
+        ]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"❌ {backend} failed:\n{result.stderr[-2000:]}")
+            continue
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        reports.append(report)
+        print(json.dumps(report, indent=2))
+
+    summary = {
+        "corpus": {"vectors": args.vectors, "documents": args.documents, "dim": args.dim, "queries": args.queries},
+        "results": reports
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
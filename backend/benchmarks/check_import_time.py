@@ -0,0 +1,164 @@
+# Cold-start budget: import time, deferred heavy modules, time to first /health and baseline RSS
+#
+# Usage (from backend/):
+#   python benchmarks/check_import_time.py                 # check against the default budget
+#   python benchmarks/check_import_time.py --budget-ms 800 --runs 5 --output results/cold_start.json
+#
+# Every measurement runs in a fresh interpreter. Exits 1 when importing
+# app.main exceeds the budget (median of --runs) or pulls in a module that
+# should only load on first use (chromadb, langchain_openai, PyMuPDF, ...).
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded by the subsystem that needs them, never by app startup
+DEFERRED_MODULES = [
+    "chromadb",
+    "langchain_community",
+    "langchain_openai",
+    "openai",
+    "fitz",
+    "PyPDF2",
+    "sklearn",
+    "onnxruntime",
+    "tiktoken",
+]
+
+DEFAULT_BUDGET_MS = 1500
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+with open("/proc/self/status") as f:
+    rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+print(json.dumps({
+    "import_ms": elapsed * 1000,
+    "rss_mb": rss_kb / 1024,
+    "modules": len(sys.modules),
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def probe_env(workdir: str) -> dict:
+    """Environment for a probe: the caller's, with every on-disk store under workdir."""
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": BACKEND_DIR,
+        "CHROMA_DB_PATH": os.path.join(workdir, "chroma_db"),
+        "PARTITION_REGISTRY_PATH": os.path.join(workdir, "vector_partitions.db"),
+        "MASTERY_DB_PATH": os.path.join(workdir, "mastery.db"),
+    })
+    return env
+
+
+def probe_import(env: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE % (DEFERRED_MODULES,)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing app.main failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def top_imports(env: dict, count: int = 10) -> list:
+    """Packages with the most import time (self time summed per top-level package, python -X importtime)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120
+    )
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if not self_us.isdigit():
+            continue
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1000
+    return [(name, round(ms, 1)) for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:count]]
+
+
+def time_to_health(env: dict, port: int) -> float:
+    """Seconds from spawning uvicorn until GET /health answers."""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    try:
+        while time.perf_counter() - start < 120:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.02)
+        raise RuntimeError("App did not answer /health within 120s")
+    finally:
+        process.terminate()
+        process.wait(timeout=15)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import budget for app.main")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Max median import time of app.main")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8909)
+    parser.add_argument("--skip-server", action="store_true", help="Only measure the import")
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="scholarnet-coldstart-") as workdir:
+        env = probe_env(workdir)
+
+        probes = [probe_import(env) for _ in range(args.runs)]
+        report = {
+            "import_ms": round(statistics.median(p["import_ms"] for p in probes), 1),
+            "rss_mb": round(statistics.median(p["rss_mb"] for p in probes), 1),
+            "modules": probes[0]["modules"],
+            "loaded_deferred_modules": probes[0]["loaded"],
+            "slowest_imports_ms": top_imports(env),
+        }
+        if not args.skip_server:
+            report["time_to_health_s"] = round(
+                statistics.median(time_to_health(env, args.port) for _ in range(args.runs)), 3
+            )
+
+    print(f"import app.main: {report['import_ms']:.0f} ms (budget {args.budget_ms:.0f} ms), "
+          f"RSS {report['rss_mb']:.0f} MB, {report['modules']} modules")
+    if "time_to_health_s" in report:
+        print(f"spawn -> /health: {report['time_to_health_s']:.2f} s")
+    print("slowest packages (self time):")
+    for name, ms in report["slowest_imports_ms"]:
+        print(f"  {name:40} {ms:>8.1f} ms")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if report["import_ms"] > args.budget_ms:
+        failures.append(f"import took {report['import_ms']:.0f} ms > {args.budget_ms:.0f} ms")
+    if report["loaded_deferred_modules"]:
+        failures.append(f"loaded at startup: {', '.join(report['loaded_deferred_modules'])}")
+    if failures:
+        print("❌ " + "; ".join(failures))
+        sys.exit(1)
+    print("✅ Within cold-start budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,448 @@
+# End-to-end load test: mixed user workloads against the API, backed by the OpenAI mock
+#
+# Usage (from backend/):
+#   python benchmarks/load_test.py --users 16 --duration 120 --output results/load_main.json
+#   python benchmarks/load_test.py --users 16 --duration 120 --compare results/load_main.json
+#
+# Starts benchmarks/mock_openai.py and the app (uvicorn) in subprocesses with
+# OPENAI_BASE_URL pointed at the mock and all storage in a temp directory,
+# uploads a seed corpus, then runs virtual users that pick weighted scenarios
+# (uploads, Q&A sessions, summaries, quizzes, read-aloud) until the duration
+# is over. Reports throughput and p50/p95/p99 per route and per scenario; the
+# JSON report can be compared against an earlier run to catch regressions.
+# Use --app-url / --mock-url to target already running servers instead.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+import httpx
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = "upload=1,qa=6,summarize=1,quiz=2,read_aloud=1"
+
+TOPICS = {
+    "Photosynthesis": "chlorophyll light reactions glucose carbon dioxide stomata chloroplast energy oxygen",
+    "Neural Networks": "neurons layers weights activation backpropagation gradient loss training",
+    "Plate Tectonics": "crust mantle subduction earthquakes continental drift magma boundaries",
+    "Supply and Demand": "price equilibrium elasticity market surplus shortage consumers producers",
+    "Cell Division": "mitosis meiosis chromosomes spindle cytokinesis replication phases",
+    "Thermodynamics": "entropy heat work temperature equilibrium energy conservation engines",
+}
+
+QUESTIONS = [
+    "What is {topic}?",
+    "Explain how {term} relates to {topic}.",
+    "Why does {term} matter?",
+    "Give an example of {term}.",
+    "Tell me more about that.",
+    "Compare {term} and {other}.",
+]
+
+
+def make_pdf(seed: int, pages: int) -> bytes:
+    """A lecture-notes style PDF mixing a few topics, different per seed."""
+    import fitz
+    rng = random.Random(seed)
+    document = fitz.open()
+    topics = rng.sample(sorted(TOPICS), 3)
+    for page_number in range(pages):
+        topic = topics[page_number % len(topics)]
+        terms = TOPICS[topic].split()
+        lines = [f"{topic} - part {page_number + 1}", ""]
+        for _ in range(35):
+            words = rng.choices(terms, k=rng.randint(6, 12))
+            lines.append(f"The {words[0]} of {topic.lower()} involves {' '.join(words[1:])}.")
+        page = document.new_page()
+        page.insert_textbox(fitz.Rect(40, 40, 560, 800), "\n".join(lines), fontsize=9)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+class Recorder:
+    """Latency samples per route and per scenario."""
+
+    def __init__(self):
+        self.routes = defaultdict(list)  # route -> [(latency_s, status)]
+        self.scenarios = defaultdict(list)  # scenario -> [(latency_s, ok)]
+
+    def request(self, route: str, latency: float, status: int):
+        self.routes[route].append((latency, status))
+
+    def scenario(self, name: str, latency: float, ok: bool):
+        self.scenarios[name].append((latency, ok))
+
+
+def summarize_samples(samples, elapsed: float, ok) -> dict:
+    latencies = np.array([s[0] for s in samples]) * 1000
+    errors = sum(1 for s in samples if not ok(s[1]))
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / max(1, len(samples)), 4),
+        "throughput_per_s": round(len(samples) / elapsed, 3),
+        "mean_ms": round(float(latencies.mean()), 1) if len(latencies) else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1) if len(latencies) else None,
+        "p95_ms": round(float(np.percentile(latencies, 95)), 1) if len(latencies) else None,
+        "p99_ms": round(float(np.percentile(latencies, 99)), 1) if len(latencies) else None,
+        "max_ms": round(float(latencies.max()), 1) if len(latencies) else None,
+    }
+
+
+class VirtualUser:
+    def __init__(self, user_id: int, client: httpx.AsyncClient, recorder: Recorder, documents: list, args, rng):
+        self.user_id = f"loadtest-user-{user_id}"
+        self.client = client
+        self.recorder = recorder
+        self.documents = documents
+        self.args = args
+        self.rng = rng
+
+    async def call(self, method: str, route: str, url: str, **kwargs) -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, 599  # Transport error / timeout
+        self.recorder.request(f"{method} {route}", time.perf_counter() - start, status)
+        return response
+
+    def pick_document(self):
+        return self.rng.choice(self.documents)
+
+    async def upload(self) -> bool:
+        pdf = make_pdf(self.rng.randrange(1 << 30), self.args.pdf_pages)
+        response = await self.call(
+            "POST", "/api/pdf-upload", "/api/pdf-upload",
+            files={"file": (f"notes-{self.rng.randrange(1 << 20)}.pdf", pdf, "application/pdf")}
+        )
+        if response is None or response.status_code != 200:
+            return False
+        self.documents.append(response.json()["document_id"])
+        return True
+
+    async def qa(self) -> bool:
+        document_id = self.pick_document()
+        topic = self.rng.choice(sorted(TOPICS))
+        terms = TOPICS[topic].split()
+        session_id = None
+        ok = True
+        for _ in range(self.args.qa_turns):
+            question = self.rng.choice(QUESTIONS).format(
+                topic=topic, term=self.rng.choice(terms), other=self.rng.choice(terms)
+            )
+            response = await self.call("POST", "/api/qa", "/api/qa", json={
+                "question": question, "document_id": document_id, "session_id": session_id
+            })
+            if response is None or response.status_code != 200:
+                ok = False
+                break
+            session_id = response.json().get("session_id")
+        if session_id:
+            await self.call("DELETE", "/api/qa/history/{session_id}", f"/api/qa/history/{session_id}")
+        return ok
+
+    async def summarize(self) -> bool:
+        response = await self.call("POST", "/api/summarize", "/api/summarize", json={
+            "document_id": self.pick_document(),
+            "summary_type": self.rng.choice(["concise", "explanatory"])
+        })
+        return response is not None and response.status_code == 200
+
+    async def quiz(self) -> bool:
+        document_id = self.pick_document()
+        response = await self.call("POST", "/api/mcq", "/api/mcq", json={
+            "document_id": document_id, "num_questions": self.args.quiz_questions
+        })
+        if response is None or response.status_code != 200:
+            return False
+        questions = response.json()["questions"]
+        if not questions:
+            return True
+        answers = {i: self.rng.randrange(len(q["options"])) for i, q in enumerate(questions)}
+        response = await self.call("POST", "/api/mcq/evaluate", "/api/mcq/evaluate", json={
+            "questions": questions, "user_answers": answers,
+            "user_id": self.user_id, "document_id": document_id
+        })
+        return response is not None and response.status_code == 200
+
+    async def read_aloud(self) -> bool:
+        response = await self.call("POST", "/api/read-aloud", "/api/read-aloud", json={
+            "document_id": self.pick_document(), "with_audio": self.args.with_audio
+        })
+        if response is None or response.status_code != 200:
+            return False
+        chunks = response.json()["chunks"]
+        audio_url = chunks[0].get("audio_url") if chunks else None
+        # Play the first segment: poll while it renders (202), like the frontend player
+        for _ in range(30 if audio_url else 0):
+            audio = await self.call("GET", "/api/read-aloud/audio/{audio_id}", audio_url)
+            if audio is None or audio.status_code != 202:
+                return audio is not None and audio.status_code == 200
+            await asyncio.sleep(float(audio.headers.get("retry-after", "1")))
+        return True
+
+    async def run(self, mix, deadline: float):
+        names, weights = zip(*mix.items())
+        while time.perf_counter() < deadline:
+            name = self.rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                ok = await getattr(self, name)()
+            except Exception as e:
+                print(f"⚠️ {name} failed: {e}")
+                ok = False
+            self.recorder.scenario(name, time.perf_counter() - start, ok)
+            if self.args.think_time:
+                await asyncio.sleep(self.rng.expovariate(1 / self.args.think_time))
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("upload", "qa", "summarize", "quiz", "read_aloud"):
+            raise ValueError(f"Unknown scenario: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def wait_until_up(url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def start_servers(args, workdir: str, processes: list):
+    """Start the mock (and Chroma server) and the app unless URLs were given (appending to `processes`); returns (app_url, mock_url)."""
+    mock_url = args.mock_url
+    if not mock_url and not args.app_url:
+        mock_url = f"http://127.0.0.1:{args.mock_port}"
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "mock_openai.py"),
+             "--port", str(args.mock_port), "--seed", str(args.seed)] + args.mock_args,
+            cwd=BACKEND_DIR
+        ))
+        wait_until_up(f"{mock_url}/v1/models")
+
+    chroma_env = {}
+    if args.chroma_server and not args.app_url:
+        # Shared Chroma server so several app workers can use one index
+        processes.append(subprocess.Popen(
+            ["chroma", "run", "--path", os.path.join(workdir, "chroma_server"),
+             "--host", "127.0.0.1", "--port", str(args.chroma_port)],
+            cwd=workdir, stdout=subprocess.DEVNULL
+        ))
+        wait_until_up(f"http://127.0.0.1:{args.chroma_port}/api/v2/heartbeat")
+        chroma_env = {"CHROMA_MODE": "http", "CHROMA_HOST": "127.0.0.1", "CHROMA_PORT": str(args.chroma_port)}
+
+    app_url = args.app_url
+    if not app_url:
+        app_url = f"http://127.0.0.1:{args.app_port}"
+        env = dict(os.environ)
+        env.update({
+            "OPENAI_BASE_URL": f"{mock_url}/v1",
+            "OPENAI_API_KEY": env.get("OPENAI_API_KEY") or "mock-key",
+            "EMBEDDING_BACKEND": "openai",
+            "TTS_ENGINE": "openai",
+            "CHROMA_DB_PATH": os.path.join(workdir, "chroma_db"),
+            "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+            "LOCAL_INDEX_DIR": os.path.join(workdir, "local_index"),
+            "DOCUMENT_INDEX_DIR": os.path.join(workdir, "document_index"),
+            "AUDIO_CACHE_DIR": os.path.join(workdir, "audio_cache"),
+            "PARTITION_REGISTRY_PATH": os.path.join(workdir, "vector_partitions.db"),
+            "MASTERY_DB_PATH": os.path.join(workdir, "mastery.db"),
+            "TRACE_DIR": os.path.join(workdir, "traces"),
+            "PROFILE_DIR": os.path.join(workdir, "profiles"),
+        })
+        env.update(chroma_env)
+        env.update(dict(item.split("=", 1) for item in args.app_env))
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+             "--port", str(args.app_port), "--workers", str(args.app_workers), "--log-level", "warning"],
+            cwd=workdir, env={**env, "PYTHONPATH": BACKEND_DIR}
+        ))
+        wait_until_up(f"{app_url}/health")
+    return app_url, mock_url
+
+
+async def run_load(args, app_url: str, mock_url: str) -> dict:
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=limits) as client:
+        # Seed corpus (not part of the measured window)
+        print(f"📄 Uploading {args.seed_documents} seed documents...")
+        documents = []
+        seeder = VirtualUser(-1, client, Recorder(), documents, args, random.Random(args.seed))
+        for _ in range(args.seed_documents):
+            if not await seeder.upload():
+                raise RuntimeError("Seed upload failed; is the app healthy?")
+
+        mix = parse_mix(args.mix)
+        users = [VirtualUser(i, client, recorder, documents, args, random.Random(rng.random())) for i in range(args.users)]
+        print(f"🚀 {args.users} users for {args.duration:.0f}s, mix {args.mix}")
+        start = time.perf_counter()
+        await asyncio.gather(*(user.run(mix, start + args.duration) for user in users))
+        elapsed = time.perf_counter() - start
+
+        usage = (await client.get("/api/usage/stats")).json()
+        mock_stats = None
+        if mock_url:
+            try:
+                mock_stats = httpx.get(f"{mock_url}/mock/stats", timeout=5).json()
+            except httpx.HTTPError:
+                pass
+
+    all_requests = [s for samples in recorder.routes.values() for s in samples]
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            "elapsed_s": round(elapsed, 2),
+        },
+        "totals": summarize_samples(all_requests, elapsed, lambda status: status < 400),
+        "routes": {
+            route: summarize_samples(samples, elapsed, lambda status: status < 400)
+            for route, samples in sorted(recorder.routes.items())
+        },
+        "scenarios": {
+            name: summarize_samples(samples, elapsed, bool)
+            for name, samples in sorted(recorder.scenarios.items())
+        },
+        "usage": usage.get("totals"),
+        "mock": mock_stats,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_report(report: dict):
+    header = f"{'':40} {'count':>7} {'err%':>6} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+    for section in ("routes", "scenarios"):
+        print(f"\n{section.upper()}\n{header}")
+        rows = list(report[section].items())
+        if section == "routes":
+            rows.append(("TOTAL", report["totals"]))
+        for name, s in rows:
+            print(f"{name:40} {s['count']:>7} {s['error_rate'] * 100:>5.1f}% {s['throughput_per_s']:>8.2f} "
+                  f"{s['p50_ms'] or 0:>8.0f} {s['p95_ms'] or 0:>8.0f} {s['p99_ms'] or 0:>8.0f}")
+    if report.get("usage"):
+        u = report["usage"]
+        print(f"\nModel calls: {u.get('llm_calls', 0)} LLM, {u.get('embedding_calls', 0)} embedding, "
+              f"{u.get('prompt_tokens', 0) + u.get('completion_tokens', 0)} chat tokens")
+
+
+def compare_reports(report: dict, baseline: dict, threshold: float) -> list:
+    """Print per-route deltas vs a baseline report; returns the regressions found."""
+    regressions = []
+    print(f"\nCOMPARISON vs {baseline['meta'].get('git_commit')} ({baseline['meta'].get('timestamp')})")
+    print(f"{'':40} {'p50':>9} {'p95':>9} {'p99':>9} {'rps':>9}")
+    for section in ("routes", "scenarios"):
+        for name, current in report[section].items():
+            previous = baseline[section].get(name)
+            if not previous or not current["count"]:
+                continue
+            cells = []
+            for key, higher_is_worse in (("p50_ms", True), ("p95_ms", True), ("p99_ms", True), ("throughput_per_s", False)):
+                if not previous[key]:
+                    cells.append(f"{'n/a':>9}")
+                    continue
+                delta = (current[key] - previous[key]) / previous[key] * 100
+                cells.append(f"{delta:>+8.1f}%")
+                if (delta if higher_is_worse else -delta) > threshold and key != "p99_ms":
+                    regressions.append(f"{section}/{name} {key} {delta:+.1f}%")
+            print(f"{name:40} {' '.join(cells)}")
+    if regressions:
+        print(f"\n❌ Regressions over {threshold:.0f}%:\n  " + "\n  ".join(regressions))
+    else:
+        print(f"\n✅ No p50/p95/throughput regressions over {threshold:.0f}%")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed-workload load test against a mock OpenAI backend")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="Measured window in seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights, e.g. upload=1,qa=6")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Mean pause between scenarios (s)")
+    parser.add_argument("--seed-documents", type=int, default=4)
+    parser.add_argument("--pdf-pages", type=int, default=5)
+    parser.add_argument("--qa-turns", type=int, default=3, help="Questions per Q&A session")
+    parser.add_argument("--quiz-questions", type=int, default=5)
+    parser.add_argument("--with-audio", action="store_true", help="Read-aloud renders speech (via the mock)")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--app-url", help="Use a running app instead of starting one")
+    parser.add_argument("--mock-url", help="Use a running mock instead of starting one")
+    parser.add_argument("--app-port", type=int, default=8900)
+    parser.add_argument("--mock-port", type=int, default=8901)
+    parser.add_argument("--app-workers", type=int, default=1)
+    parser.add_argument("--chroma-server", action="store_true", help="Run a Chroma server (CHROMA_MODE=http) for the app")
+    parser.add_argument("--chroma-port", type=int, default=8902)
+    parser.add_argument("--app-env", action="append", default=[], help="Extra app setting, e.g. VECTOR_BACKEND=local")
+    parser.add_argument("--mock-args", default="", help="Extra mock_openai.py flags, e.g. '--rate-limit 0.05'")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    parser.add_argument("--regression-threshold", type=float, default=10.0, help="Percent")
+    args = parser.parse_args()
+    args.mock_args = args.mock_args.split()
+
+    # Make `timeout`/kill run the cleanup below so the servers don't outlive the harness
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(1))
+    processes = []
+    with tempfile.TemporaryDirectory(prefix="scholarnet-load-") as workdir:
+        try:
+            app_url, mock_url = start_servers(args, workdir, processes)
+            report = asyncio.run(run_load(args, app_url, mock_url))
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                try:
+                    process.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_reports(report, json.load(f), args.regression_threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
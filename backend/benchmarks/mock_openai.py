@@ -0,0 +1,320 @@
+# Local OpenAI-compatible mock server for load tests (chat, embeddings, speech)
+#
+# Usage (from backend/):
+#   python benchmarks/mock_openai.py --port 8901 --ttft-ms 400 --tokens-per-second 60 --rate-limit 0.02
+#
+# Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8901/v1 (any
+# OPENAI_API_KEY). Latencies are drawn from log-normal distributions, chat
+# replies are paced at a fixed token rate, a fraction of calls (or calls over
+# the concurrency cap) get 429s with Retry-After, and embeddings are
+# deterministic (feature hashing), so retrieval behaves like a real model.
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.utils.embeddings import HashingEmbeddings  # noqa: E402
+
+MCQ_PATTERN = re.compile(r"generate (\d+) multiple choice", re.IGNORECASE)
+# Source text in the MCQ prompt runs until the next upper-case heading ("CRITICAL INSTRUCTIONS:")
+MCQ_TEXT_PATTERN = re.compile(r"Text:(.*?)(?:\n\n[A-Z][A-Z ]{5,}:|$)", re.DOTALL)
+WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z'-]{2,}")
+
+
+class MockConfig:
+    def __init__(self, args):
+        self.ttft_ms = args.ttft_ms
+        self.ttft_sigma = args.ttft_sigma
+        self.tokens_per_second = args.tokens_per_second
+        self.completion_tokens = args.completion_tokens
+        self.embedding_ms = args.embedding_ms
+        self.embedding_ms_per_input = args.embedding_ms_per_input
+        self.speech_ms_per_word = args.speech_ms_per_word
+        self.rate_limit = args.rate_limit
+        self.error_rate = args.error_rate
+        self.max_concurrency = args.max_concurrency
+        self.retry_after_ms = args.retry_after_ms
+        self.dimensions = args.dimensions
+        self.time_scale = args.time_scale
+        self.seed = args.seed
+
+
+class MockState:
+    """Request counters exposed on /mock/stats."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+
+    def enter(self, kind: str) -> int:
+        with self.lock:
+            self.counts[f"{kind}_requests"] += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return self.in_flight
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.counts[key] += amount
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {**self.counts, "in_flight": self.in_flight, "peak_in_flight": self.peak_in_flight}
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / 4))
+
+
+def lognormal_ms(rng: random.Random, median_ms: float, sigma: float) -> float:
+    return median_ms * math.exp(rng.gauss(0, sigma)) if median_ms > 0 else 0.0
+
+
+def fake_mcqs(prompt: str, count: int, rng: random.Random) -> str:
+    """Valid MCQ JSON in the shape mcq_generator expects, built from prompt vocabulary."""
+    match = MCQ_TEXT_PATTERN.search(prompt)
+    text = match.group(1) if match else prompt
+    words = WORD_PATTERN.findall(text) or ["concept"]
+    topics = sorted({w.capitalize() for w in words if len(w) > 6})[:5] or ["General"]
+    questions = []
+    for i in range(count):
+        correct = rng.randrange(4)
+        term = rng.choice(words)
+        questions.append({
+            "question": f"Which statement about {term} is supported by the text?",
+            "topic": topics[i % len(topics)],
+            "options": [
+                {"option": " ".join(rng.choices(words, k=6)), "is_correct": j == correct}
+                for j in range(4)
+            ],
+            "explanation": " ".join(rng.choices(words, k=12))
+        })
+    return json.dumps(questions)
+
+
+def fake_completion(prompt: str, body: dict, config: MockConfig, rng: random.Random) -> str:
+    mcq = MCQ_PATTERN.search(prompt)
+    if mcq:
+        return fake_mcqs(prompt, int(mcq.group(1)), rng)
+
+    words = WORD_PATTERN.findall(prompt) or ["lorem", "ipsum"]
+    limit = body.get("max_completion_tokens") or body.get("max_tokens") or 4096
+    target = int(min(limit, max(8, lognormal_ms(rng, config.completion_tokens, 0.4))))
+    # ~0.75 words per token
+    num_words = max(4, int(target * 0.75))
+    sentences, sentence = [], []
+    for word in rng.choices(words, k=num_words):
+        sentence.append(word)
+        if len(sentence) >= rng.randint(8, 18):
+            sentences.append(" ".join(sentence).capitalize() + ".")
+            sentence = []
+    if sentence:
+        sentences.append(" ".join(sentence).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    app = FastAPI(title="Mock OpenAI")
+    state = MockState()
+    embedder = HashingEmbeddings(config.dimensions)
+    global_rng = random.Random(config.seed)
+
+    async def sleep_ms(ms: float):
+        if ms > 0 and config.time_scale > 0:
+            await asyncio.sleep(ms * config.time_scale / 1000)
+
+    def rejection(kind: str, in_flight: int):
+        """429 (rate limit / over capacity) or 500, or None to serve the call."""
+        roll = global_rng.random()
+        if (config.max_concurrency and in_flight > config.max_concurrency) or roll < config.rate_limit:
+            state.count(f"{kind}_rate_limited")
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}},
+                headers={"retry-after-ms": str(config.retry_after_ms), "retry-after": str(max(1, config.retry_after_ms // 1000))}
+            )
+        if roll < config.rate_limit + config.error_rate:
+            state.count(f"{kind}_server_errors")
+            return JSONResponse(status_code=500, content={"error": {"message": "Internal error (mock)", "type": "server_error"}})
+        return None
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]}
+
+    @app.get("/mock/stats")
+    async def stats():
+        return state.snapshot()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        in_flight = state.enter("chat")
+        try:
+            rejected = rejection("chat", in_flight)
+            if rejected is not None:
+                return rejected
+
+            prompt = "\n".join(
+                m["content"] if isinstance(m.get("content"), str) else json.dumps(m.get("content"))
+                for m in body.get("messages", [])
+            )
+            # Same prompt + seed -> same reply; latency still varies per call
+            rng = random.Random(f"{config.seed}:{hashlib.sha1(prompt.encode()).hexdigest()}")
+            content = fake_completion(prompt, body, config, rng)
+            prompt_tokens = estimate_tokens(prompt)
+            completion_tokens = estimate_tokens(content)
+            model = body.get("model", "mock")
+            ttft = lognormal_ms(global_rng, config.ttft_ms, config.ttft_sigma)
+            generation_ms = completion_tokens / config.tokens_per_second * 1000 if config.tokens_per_second else 0
+            state.count("prompt_tokens", prompt_tokens)
+            state.count("completion_tokens", completion_tokens)
+            completion_id = f"chatcmpl-mock{global_rng.getrandbits(48):012x}"
+            created = int(time.time())
+
+            if body.get("stream"):
+                pieces = re.findall(r"\S+\s*", content)
+
+                async def events():
+                    await sleep_ms(ttft)
+                    for piece in pieces:
+                        await sleep_ms(generation_ms / max(1, len(pieces)))
+                        chunk = {
+                            "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+                        }
+                        yield f"data: {json.dumps(chunk)}\n\n"
+                    final = {
+                        "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                                  "total_tokens": prompt_tokens + completion_tokens}
+                    }
+                    yield f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n"
+
+                return StreamingResponse(events(), media_type="text/event-stream")
+
+            await sleep_ms(ttft + generation_ms)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens}
+            }
+        finally:
+            state.leave()
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        in_flight = state.enter("embedding")
+        try:
+            rejected = rejection("embedding", in_flight)
+            if rejected is not None:
+                return rejected
+
+            inputs = body.get("input", [])
+            if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+                inputs = [inputs]
+            # Token-id inputs are hashed by their ids
+            texts = [text if isinstance(text, str) else " ".join(f"t{t}" for t in text) for text in inputs]
+
+            dimensions = body.get("dimensions") or config.dimensions
+            if dimensions != embedder.dimensions:
+                vectors = HashingEmbeddings(dimensions).embed_documents(texts)
+            else:
+                vectors = embedder.embed_documents(texts)
+            tokens = sum(estimate_tokens(text) for text in texts)
+            state.count("embedding_inputs", len(texts))
+
+            await sleep_ms(lognormal_ms(global_rng, config.embedding_ms, 0.3) + config.embedding_ms_per_input * len(texts))
+
+            base64_encoded = body.get("encoding_format") == "base64"
+            data = [
+                {
+                    "object": "embedding",
+                    "index": i,
+                    "embedding": (
+                        base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode("ascii")
+                        if base64_encoded else vector
+                    )
+                }
+                for i, vector in enumerate(vectors)
+            ]
+            return {"object": "list", "data": data, "model": body.get("model", "mock"),
+                    "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+        finally:
+            state.leave()
+
+    @app.post("/v1/audio/speech")
+    async def speech(request: Request):
+        body = await request.json()
+        in_flight = state.enter("speech")
+        try:
+            rejected = rejection("speech", in_flight)
+            if rejected is not None:
+                return rejected
+
+            words = len(str(body.get("input", "")).split())
+            await sleep_ms(lognormal_ms(global_rng, config.ttft_ms, config.ttft_sigma) + config.speech_ms_per_word * words)
+            # ID3 header plus deterministic filler, ~1 KB per 10 words
+            seed = hashlib.sha256(str(body.get("input", "")).encode()).digest()
+            return Response(content=b"ID3\x04\x00\x00\x00\x00\x00\x00" + seed * max(1, words * 3), media_type="audio/mpeg")
+        finally:
+            state.leave()
+
+    return app
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--ttft-ms", type=float, default=400, help="Median time to first token (log-normal)")
+    parser.add_argument("--ttft-sigma", type=float, default=0.5, help="Log-normal sigma of the first-token latency")
+    parser.add_argument("--tokens-per-second", type=float, default=60, help="Completion token rate (0 = instant)")
+    parser.add_argument("--completion-tokens", type=float, default=200, help="Median completion length in tokens")
+    parser.add_argument("--embedding-ms", type=float, default=60, help="Median embedding request latency")
+    parser.add_argument("--embedding-ms-per-input", type=float, default=0.5)
+    parser.add_argument("--speech-ms-per-word", type=float, default=5)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fraction of calls rejected with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls failing with 500")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="429 above this many in-flight calls (0 = unlimited)")
+    parser.add_argument("--retry-after-ms", type=int, default=500)
+    parser.add_argument("--dimensions", type=int, default=1536, help="Default embedding dimensions")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply all simulated latencies (0 = no sleeping)")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    print(f"🤖 Mock OpenAI on http://{args.host}:{args.port}/v1")
+    uvicorn.run(create_app(MockConfig(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
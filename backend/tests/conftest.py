@@ -0,0 +1,30 @@
+# Test environment: every store under a throwaway directory, no network backends
+#
+# Settings are read from the environment when app.config is first imported,
+# so this runs before any test module imports the app.
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_store_dir = tempfile.mkdtemp(prefix="scholarnet-tests-")
+os.environ.update({
+    "CHROMA_DB_PATH": os.path.join(_store_dir, "chroma_db"),
+    "CHROMA_MODE": "persistent",
+    "PARTITION_REGISTRY_PATH": os.path.join(_store_dir, "vector_partitions.db"),
+    "LEXICAL_INDEX_DIR": os.path.join(_store_dir, "lexical"),
+    "DOCUMENT_INDEX_DIR": os.path.join(_store_dir, "document_index"),
+    "LOCAL_INDEX_DIR": os.path.join(_store_dir, "local_index"),
+    "UPLOAD_DIR": os.path.join(_store_dir, "uploads"),
+    "AUDIO_CACHE_DIR": os.path.join(_store_dir, "audio_cache"),
+    "MASTERY_DB_PATH": os.path.join(_store_dir, "mastery.db"),
+    "TRACE_DIR": os.path.join(_store_dir, "traces"),
+    "EMBEDDING_BACKEND": "hashing",
+    "TTS_ENGINE": "offline",
+    "VECTOR_BACKEND": "chroma",
+    "WARMUP_ENABLED": "false",
+    "MAINTENANCE_INTERVAL_HOURS": "0",
+})
+os.environ.setdefault("OPENAI_API_KEY", "test")
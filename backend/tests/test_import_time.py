@@ -0,0 +1,32 @@
+# Cold-start regression test: importing app.main stays within budget and defers heavy modules
+#
+# Usage (from backend/):
+#   python -m pytest tests
+#   IMPORT_BUDGET_MS=800 python -m pytest tests/test_import_time.py
+import os
+import statistics
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import check_import_time  # noqa: E402
+
+PROBE_RUNS = 3
+
+
+@pytest.fixture(scope="module")
+def probes(tmp_path_factory):
+    """Import app.main in fresh interpreters, exactly as check_import_time.py does."""
+    env = check_import_time.probe_env(str(tmp_path_factory.mktemp("coldstart")))
+    return [check_import_time.probe_import(env) for _ in range(PROBE_RUNS)]
+
+
+def test_heavy_modules_are_deferred(probes):
+    for probe in probes:
+        assert probe["loaded"] == [], f"loaded at startup: {', '.join(probe['loaded'])}"
+
+
+def test_import_within_budget(probes):
+    budget_ms = float(os.getenv("IMPORT_BUDGET_MS", check_import_time.DEFAULT_BUDGET_MS))
+    import_ms = statistics.median(probe["import_ms"] for probe in probes)
+    assert import_ms <= budget_ms, f"import app.main took {import_ms:.0f} ms > {budget_ms:.0f} ms"
@@ -0,0 +1,104 @@
+# Local vector index: cross-document search through the corpus-wide IVF
+import numpy as np
+import pytest
+from app.config import settings
+from app.utils import local_index
+from app.utils.local_index import LocalVectorIndex
+
+DIM = 32
+TOPICS = 12
+DOCS_PER_TOPIC = 3
+CHUNKS_PER_DOC = 40
+
+
+@pytest.fixture
+def corpus_settings(monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_INDEX_EXACT_THRESHOLD", 500)
+    monkeypatch.setattr(settings, "LOCAL_INDEX_NPROBE", 2)
+    monkeypatch.setattr(settings, "LOCAL_INDEX_QUANTIZATION", "float32")
+
+
+def make_documents(seed: int = 0):
+    """Topic-coherent documents: each one's chunks sit near a single topic."""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((TOPICS, DIM)).astype(np.float32) * 4
+    documents = {}
+    for topic in range(TOPICS):
+        for copy in range(DOCS_PER_TOPIC):
+            vectors = topics[topic] + rng.standard_normal((CHUNKS_PER_DOC, DIM)).astype(np.float32)
+            documents[f"t{topic}_{copy}"] = vectors
+    return topics, documents
+
+
+def add_all(index: LocalVectorIndex, documents: dict) -> None:
+    for doc_id, vectors in documents.items():
+        index.add(
+            doc_id,
+            vectors,
+            [f"{doc_id} chunk {i}" for i in range(len(vectors))],
+            [{"document_id": doc_id, "chunk_index": i} for i in range(len(vectors))]
+        )
+
+
+def exact_top_k(documents: dict, query: np.ndarray, k: int):
+    scored = []
+    for doc_id, vectors in documents.items():
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        scored.extend((float(score), doc_id, i) for i, score in enumerate(normalized @ query))
+    scored.sort(key=lambda hit: -hit[0])
+    return {(doc_id, i) for _, doc_id, i in scored[:k]}
+
+
+def test_global_search_opens_only_probed_partitions(tmp_path, corpus_settings, monkeypatch):
+    topics, documents = make_documents()
+    add_all(LocalVectorIndex(str(tmp_path)), documents)
+
+    index = LocalVectorIndex(str(tmp_path))  # fresh worker: nothing open yet
+    assert index._corpus is not None
+
+    opened = []
+    original = LocalVectorIndex.partition
+    monkeypatch.setattr(LocalVectorIndex, "partition", lambda self, doc_id: opened.append(doc_id) or original(self, doc_id))
+
+    query = topics[3] / np.linalg.norm(topics[3])
+    hits = index.search(query, k=10)
+
+    found = {(doc_id, metadata["chunk_index"]) for _, doc_id, metadata, _ in hits}
+    assert found == exact_top_k(documents, query, 10)
+    assert set(opened) < set(documents)
+    assert all(doc_id.startswith("t3_") for doc_id, _ in found)
+
+
+def test_other_worker_retrain_is_picked_up(tmp_path, corpus_settings, monkeypatch):
+    _, documents = make_documents()
+    names = list(documents)
+    reader, writer = LocalVectorIndex(str(tmp_path)), LocalVectorIndex(str(tmp_path))
+
+    add_all(writer, {name: documents[name] for name in names[:15]})
+    reader.search(documents[names[0]][0], k=3)
+    first_version = reader._corpus[0]
+
+    # The writer doubles the corpus and retrains; old list files are deleted
+    add_all(writer, {name: documents[name] for name in names[15:]})
+    assert writer._corpus[0] != first_version
+
+    assigned = []
+    original = local_index.assign_lists
+    monkeypatch.setattr(local_index, "assign_lists", lambda X, c, **kw: assigned.append(len(X)) or original(X, c, **kw))
+
+    query = documents[names[-1]][5]
+    hits = reader.search(query, k=1)
+    assert reader._corpus[0] == writer._corpus[0]
+    assert hits[0][1] == names[-1] and hits[0][2]["chunk_index"] == 5
+    assert assigned == []  # list files written by the writer are reused, not recomputed
+
+
+def test_deleted_document_leaves_global_results(tmp_path, corpus_settings):
+    _, documents = make_documents()
+    index = LocalVectorIndex(str(tmp_path))
+    add_all(index, documents)
+
+    query = documents["t5_1"][0]
+    assert index.search(query, k=1)[0][1] == "t5_1"
+    index.delete("t5_1")
+    assert all(doc_id != "t5_1" for _, doc_id, _, _ in index.search(query, k=20))
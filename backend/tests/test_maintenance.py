@@ -0,0 +1,159 @@
+# Storage maintenance: what a run deletes, what it must keep, dry runs and the single-runner lease
+import os
+import time
+import pymupdf
+import pytest
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.main import app
+from app.utils import vector_store
+from app.utils.document_index import get_index_dir
+from app.utils.lexical_index import get_lexical_index_path
+from app.utils.maintenance import LEASE_NAME, run_maintenance
+from app.utils.partitions import acquire_lease, get_document_collection, release_lease
+
+OLD = time.time() - 7 * 24 * 3600
+
+
+def make_pdf(topic: str, pages: int = 2) -> bytes:
+    document = pymupdf.open()
+    for page in range(pages):
+        document.new_page().insert_textbox(
+            pymupdf.Rect(36, 36, 576, 806),
+            " ".join(f"{topic} page {page} sentence {i} about photosynthesis." for i in range(30)),
+            fontsize=8
+        )
+    return document.tobytes()
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def document_id(client):
+    """A registered document with chunks, a lexical index and a document index."""
+    response = client.post("/api/pdf-upload", files={"file": ("kept.pdf", make_pdf("kept"), "application/pdf")})
+    assert response.status_code == 200, response.text
+    document_id = response.json()["document_id"]
+    assert client.get(f"/api/documents/{document_id}/text").status_code == 200
+    return document_id
+
+
+@pytest.fixture(autouse=True)
+def fast_maintenance(monkeypatch):
+    monkeypatch.setattr(settings, "MAINTENANCE_VACUUM", False)
+
+
+def chunk_count(collection: str, document_id: str) -> int:
+    results = vector_store.get_partition_store(collection)._collection.get(where={"document_id": document_id})
+    return len(results["ids"])
+
+
+def make_orphans(tag: str, collection: str, age: float = OLD) -> dict:
+    """One orphan of every kind maintenance collects; file mtimes set to `age`."""
+    upload = os.path.join(settings.UPLOAD_DIR, f"upload-{tag}.pdf")
+    lexical = get_lexical_index_path(f"ghost-{tag}")
+    index_dir = get_index_dir(f"ghost-{tag}")
+    for path in (upload, lexical):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"x" * 4096)
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, "sentences.bin"), "wb") as f:
+        f.write(b"x" * 4096)
+    for path in (upload, lexical, index_dir):
+        os.utime(path, (age, age))
+
+    # A per-document collection nobody registered, and stray chunks in a registered shard
+    orphan_collection = f"{vector_store.get_collection_name()}_d{tag.encode().hex()[:16]:0<16}"
+    vector_store.get_partition_store(orphan_collection).add_texts(
+        ["orphan chunk"] * 3, metadatas=[{"document_id": f"ghost-{tag}"}] * 3
+    )
+    vector_store.get_partition_store(collection).add_texts(
+        ["stray chunk"] * 2, metadatas=[{"document_id": f"ghost-{tag}"}] * 2
+    )
+    return {
+        "files": [upload, lexical, index_dir],
+        "collection": orphan_collection,
+        "shard": collection,
+        "document_id": f"ghost-{tag}",
+    }
+
+
+def orphans_present(orphans: dict) -> dict:
+    return {
+        "files": [os.path.exists(path) for path in orphans["files"]],
+        "collection": orphans["collection"] in vector_store.list_collection_names(),
+        "chunks": chunk_count(orphans["shard"], orphans["document_id"]),
+    }
+
+
+def test_registered_document_survives(client, document_id, monkeypatch):
+    monkeypatch.setattr(settings, "MAINTENANCE_GRACE_SECONDS", 0)
+    collection = get_document_collection(document_id)
+    chunks = chunk_count(collection, document_id)
+    assert chunks > 0
+    for path in (get_lexical_index_path(document_id), get_index_dir(document_id)):
+        os.utime(path, (OLD, OLD))
+
+    for _ in range(2):
+        assert run_maintenance() is not None
+
+    assert vector_store.document_exists(document_id)
+    assert collection in vector_store.list_collection_names()
+    assert chunk_count(collection, document_id) == chunks
+    assert os.path.exists(get_lexical_index_path(document_id))
+    assert os.path.isdir(get_index_dir(document_id))
+    assert get_document_collection(document_id) == collection
+
+
+def test_young_orphans_survive(document_id, monkeypatch):
+    monkeypatch.setattr(settings, "MAINTENANCE_GRACE_SECONDS", 3600)
+    orphans = make_orphans("young", get_document_collection(document_id), age=time.time())
+
+    for _ in range(2):
+        run_maintenance()
+
+    assert orphans_present(orphans) == {"files": [True, True, True], "collection": True, "chunks": 2}
+
+
+def test_orphans_seen_twice_past_grace_are_removed(document_id, monkeypatch):
+    monkeypatch.setattr(settings, "MAINTENANCE_GRACE_SECONDS", 0.5)
+    orphans = make_orphans("expired", get_document_collection(document_id))
+
+    # First sighting only records the vector orphans; old files already qualify
+    run_maintenance()
+    assert orphans_present(orphans) == {"files": [False, False, False], "collection": True, "chunks": 2}
+
+    time.sleep(0.6)
+    report = run_maintenance()
+    assert orphans_present(orphans) == {"files": [False, False, False], "collection": False, "chunks": 0}
+    assert report["actions"]["stale_chunks"]["collections"] >= 1
+    assert vector_store.document_exists(document_id)
+
+
+def test_dry_run_removes_nothing(document_id, monkeypatch):
+    monkeypatch.setattr(settings, "MAINTENANCE_GRACE_SECONDS", 0)
+    orphans = make_orphans("dry", get_document_collection(document_id))
+
+    for _ in range(2):
+        report = run_maintenance(dry_run=True)
+
+    assert report["dry_run"] is True
+    assert report["reclaimable_bytes"] > 0
+    assert report["actions"]["stale_chunks"]["chunks"] >= 5
+    assert orphans_present(orphans) == {"files": [True, True, True], "collection": True, "chunks": 2}
+    assert report["after"]["total_bytes"] >= report["before"]["total_bytes"]
+
+
+def test_concurrent_run_is_refused(client):
+    assert acquire_lease(LEASE_NAME, 60)
+    try:
+        assert run_maintenance() is None
+        assert client.post("/api/maintenance/run").status_code == 409
+    finally:
+        release_lease(LEASE_NAME)
+    assert client.post("/api/maintenance/run?dry_run=true").status_code == 200
@@ -0,0 +1,56 @@
+# Read-aloud audio jobs: a first-segment timeout must not cancel the job or poison _pending
+import asyncio
+import threading
+from concurrent.futures import Future
+import pytest
+from app.config import settings
+from app.services import tts_service
+from app.services.read_aloud_service import attach_audio
+
+
+@pytest.fixture
+def tts(tmp_path, monkeypatch):
+    """Offline engine, a single worker and an empty audio cache."""
+    monkeypatch.setattr(settings, "TTS_ENGINE", "offline")
+    monkeypatch.setattr(settings, "TTS_WORKERS", 1)
+    monkeypatch.setattr(settings, "TTS_FIRST_SEGMENT_TIMEOUT", 0.2)
+    monkeypatch.setattr(settings, "AUDIO_CACHE_DIR", str(tmp_path / "audio"))
+    monkeypatch.setattr(tts_service, "_engine", None)
+    monkeypatch.setattr(tts_service, "_executor", None)
+    monkeypatch.setattr(tts_service, "_pending", {})
+    yield tts_service
+    if tts_service._executor is not None:
+        tts_service._executor.shutdown(wait=True)
+
+
+def test_first_segment_timeout_keeps_job_running(tts):
+    # Another request's segment occupies the only worker, so ours stays queued past the timeout
+    release = threading.Event()
+    tts.get_tts_executor().submit(release.wait, 10)
+
+    chunks = asyncio.run(attach_audio([{"text": "hello world first"}, {"text": "second"}]))
+    assert [chunk["audio_status"] for chunk in chunks] == ["pending", "pending"]
+
+    audio_id = chunks[0]["audio_url"].rsplit("/", 1)[1]
+    future = tts._pending[audio_id]
+    assert not future.cancelled()
+
+    release.set()
+    future.result(timeout=10)
+    assert tts.get_audio_status(audio_id) == "ready"
+    assert tts.submit_segment("hello world first")["status"] == "ready"
+
+
+def test_cancelled_job_reports_failed_and_is_resubmitted(tts):
+    engine = tts.get_tts_engine()
+    audio_id = tts.get_audio_id("cancelled text", settings.TTS_VOICE, engine)
+    cancelled = Future()
+    cancelled.cancel()
+    tts._pending[audio_id] = cancelled
+
+    assert tts.get_audio_status(audio_id) == "failed"
+
+    job = tts.submit_segment("cancelled text")
+    assert job["future"] is not cancelled
+    job["future"].result(timeout=10)
+    assert tts.get_audio_status(audio_id) == "ready"
@@ -51,21 +51,18 @@ function ReadAloud({ documentId, readAloudData, setReadAloudData }) {
   const fetchChunks = async () => {
     setLoading(true);
     try {
-      // First get the document text and sentences
-      const docData = await api.getDocumentText(documentId);
+      // Chunks are built from the embeddings stored at upload
+      const result = await api.getDocumentReadAloudChunks(documentId, 8);
       
-      if (!docData.sentences || docData.sentences.length < 5) {
+      if (!result.chunks || result.chunks.length === 0) {
         alert('Document is too short for read aloud feature');
         return;
       }
-
-      // Then get semantic chunks
-      const result = await api.getReadAloudChunks(docData.sentences, 8);
       
       setReadAloudData({
-        chunks: result.chunks || [],
-        sentences: docData.sentences,
-        text: docData.text
+        chunks: result.chunks,
+        sentences: [],
+        text: result.chunks.map((chunk) => chunk.text).join(' ')
       });
     } catch (error) {
       alert('❌ Failed to process document: ' + error.message);
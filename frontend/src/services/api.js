@@ -149,9 +149,31 @@ class ScholarNetAPI {
     return response.json();
   }
 
-  // Get document text for read aloud
-  async getDocumentText(documentId) {
-    const response = await fetch(`${this.baseURL}/api/documents/${documentId}/text`);
+  // Read Aloud - Semantic chunks for an uploaded document (uses stored embeddings)
+  async getDocumentReadAloudChunks(documentId, numClusters = null) {
+    const response = await fetch(`${this.baseURL}/api/read-aloud`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        document_id: documentId,
+        num_clusters: numClusters,
+      }),
+    });
+
+    if (!response.ok) {
+      throw new Error('Failed to process document for read aloud');
+    }
+
+    return response.json();
+  }
+
+  // Get a page of document sentences (follow next_cursor for the rest)
+  async getDocumentText(documentId, cursor = 0, limit = 100) {
+    const response = await fetch(
+      `${this.baseURL}/api/documents/${documentId}/text?cursor=${cursor}&limit=${limit}`
+    );
     
     if (!response.ok) {
       throw new Error('Failed to get document text');